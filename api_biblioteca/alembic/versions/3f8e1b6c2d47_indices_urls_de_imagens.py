@@ -0,0 +1,28 @@
+"""indices das urls de imagens
+
+Revision ID: 3f8e1b6c2d47
+Revises: 7d41c2a9e3b5
+Create Date: 2026-10-19 12:48:05.214377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f8e1b6c2d47'
+down_revision: Union[str, None] = '7d41c2a9e3b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_livro_image_url', 'livro', ['image_url'], unique=False)
+    op.create_index('ix_usuario_profile_picture_url', 'usuario', ['profile_picture_url'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_usuario_profile_picture_url', table_name='usuario')
+    op.drop_index('ix_livro_image_url', table_name='livro')
@@ -0,0 +1,33 @@
+"""tickets de upload usados
+
+Revision ID: 5b2e9d7c1a84
+Revises: 3f8e1b6c2d47
+Create Date: 2026-10-19 16:05:42.731904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2e9d7c1a84'
+down_revision: Union[str, None] = '3f8e1b6c2d47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'ticket_upload_usado',
+        sa.Column('jti', sa.String(length=32), nullable=False),
+        sa.Column('expira_em', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('jti'),
+    )
+    op.create_index('ix_ticket_upload_usado_expira_em', 'ticket_upload_usado', ['expira_em'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ticket_upload_usado_expira_em', table_name='ticket_upload_usado')
+    op.drop_table('ticket_upload_usado')
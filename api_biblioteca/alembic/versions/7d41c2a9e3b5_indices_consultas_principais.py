@@ -0,0 +1,44 @@
+"""indices das consultas principais
+
+Revision ID: 7d41c2a9e3b5
+Revises: 150834edeb0e
+Create Date: 2026-10-19 10:12:31.482917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d41c2a9e3b5'
+down_revision: Union[str, None] = '150834edeb0e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('ix_emprestimo_usuario_id', 'emprestimo', ['usuario_id'], unique=False)
+    op.create_index('ix_emprestimo_livro_id', 'emprestimo', ['livro_id'], unique=False)
+    op.create_index(
+        'ix_emprestimo_ativo_data_devolucao', 'emprestimo', ['data_devolucao'], unique=False,
+        postgresql_where=sa.text("status = 'Ativo'"),
+    )
+    op.create_index(
+        'ix_livro_titulo_trgm', 'livro', ['titulo'], unique=False,
+        postgresql_using='gin', postgresql_ops={'titulo': 'gin_trgm_ops'},
+    )
+    op.create_index(
+        'ix_livro_autor_trgm', 'livro', ['autor'], unique=False,
+        postgresql_using='gin', postgresql_ops={'autor': 'gin_trgm_ops'},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_livro_autor_trgm', table_name='livro')
+    op.drop_index('ix_livro_titulo_trgm', table_name='livro')
+    op.drop_index('ix_emprestimo_ativo_data_devolucao', table_name='emprestimo')
+    op.drop_index('ix_emprestimo_livro_id', table_name='emprestimo')
+    op.drop_index('ix_emprestimo_usuario_id', table_name='emprestimo')
@@ -1,21 +1,312 @@
+from sqlalchemy import create_engine, event, text, Delete, Insert, Update
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError, InterfaceError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool
 from dotenv import load_dotenv
+import asyncio
 import os
+import time
+
+from app.services import metrics
+from app.services.slow_query import registro_consultas_lentas
 
 load_dotenv()  # Carrega as variáveis do .env
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Configurações do engine (os valores padrão são voltados para produção)
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"  # Loga todo o SQL executado
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))  # Segundos aguardando uma conexão livre
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # Segundos até reciclar uma conexão
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))  # asyncpg (use 0 com PgBouncer)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))  # 0 = sem limite
+
+# Réplicas de leitura (opcional): URLs separadas por vírgula
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+DB_REPLICA_MAX_LAG_SECONDS = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", "0"))  # 0 = não verifica o atraso
+DB_REPLICA_HEALTH_INTERVAL_SECONDS = float(os.getenv("DB_REPLICA_HEALTH_INTERVAL_SECONDS", "10"))
+
+
+class EstatisticasPool:
+    """Contadores de uso do pool de conexões."""
+
+    def __init__(self, nome: str = "api"):
+        self.nome = nome  # Rótulo "pool" nas métricas Prometheus
+        self.checkouts = 0  # Conexões retiradas do pool
+        self.esperas = 0  # Obtenções de conexão medidas
+        self.espera_total = 0.0  # Segundos aguardando uma conexão
+        self.espera_max = 0.0
+        self.pool = None
+
+    def registrar_espera(self, segundos: float):
+        self.esperas += 1
+        self.espera_total += segundos
+        self.espera_max = max(self.espera_max, segundos)
+        metrics.ESPERA_POOL.labels(self.nome).observe(segundos)
+
+    def atualizar_metricas(self):
+        if isinstance(self.pool, QueuePool):
+            metrics.CONEXOES_EM_USO.labels(self.nome).set(self.pool.checkedout())
+            metrics.CONEXOES_OVERFLOW.labels(self.nome).set(max(self.pool.overflow(), 0))
+
+    def snapshot(self) -> dict:
+        """Estado atual do pool e tempos acumulados de espera por conexão."""
+        dados = {
+            "checkouts": self.checkouts,
+            "espera_media_ms": round(self.espera_total / self.esperas * 1000, 3) if self.esperas else 0.0,
+            "espera_max_ms": round(self.espera_max * 1000, 3),
+        }
+        if isinstance(self.pool, QueuePool):
+            dados.update({
+                "tamanho": self.pool.size(),
+                "em_uso": self.pool.checkedout(),
+                "ociosas": self.pool.checkedin(),
+                "overflow": max(self.pool.overflow(), 0),
+            })
+        return dados
+
+
+class _MedicaoEspera:
+    """Mede o tempo gasto para obter uma conexão do pool (inclui a espera por uma conexão livre)."""
+
+    estatisticas: EstatisticasPool
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.estatisticas.registrar_espera(time.perf_counter() - inicio)
+
+
+def argumentos_conexao(driver: str, statement_timeout_ms: int) -> dict:
+    """connect_args do driver: cache de prepared statements (asyncpg) e statement_timeout."""
+    connect_args = {}
+    if driver == "asyncpg":
+        connect_args["statement_cache_size"] = DB_STATEMENT_CACHE_SIZE
+        if statement_timeout_ms:
+            connect_args["server_settings"] = {"statement_timeout": str(statement_timeout_ms)}
+    elif driver == "psycopg2" and statement_timeout_ms:
+        connect_args["options"] = f"-c statement_timeout={statement_timeout_ms}"
+    return connect_args
+
+
+def criar_engine(url: str, estatisticas: EstatisticasPool = None, **kwargs):
+    """Cria o engine (assíncrono ou síncrono, conforme o driver da URL) a partir das configurações."""
+    url = make_url(url)
+    dialeto = url.get_dialect()
+    estatisticas = estatisticas or EstatisticasPool()
+    opcoes = {"echo": DB_ECHO, "pool_pre_ping": DB_POOL_PRE_PING}
+
+    # Apenas pools com fila aceitam tamanho/overflow (ex.: SQLite em memória usa StaticPool)
+    classe_pool = dialeto.get_pool_class(url)
+    if issubclass(classe_pool, QueuePool):
+        # A subclasse é preservada quando o pool é recriado (engine.dispose())
+        opcoes["poolclass"] = type(
+            f"{classe_pool.__name__}Instrumentado", (_MedicaoEspera, classe_pool), {"estatisticas": estatisticas}
+        )
+        opcoes.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+
+    connect_args = argumentos_conexao(dialeto.driver, DB_STATEMENT_TIMEOUT_MS)
+    if connect_args:
+        opcoes["connect_args"] = connect_args
+
+    opcoes.update(kwargs)
+    if dialeto.is_async:
+        novo_engine = create_async_engine(url, **opcoes)
+        engine_sincrono = novo_engine.sync_engine
+    else:
+        novo_engine = engine_sincrono = create_engine(url, **opcoes)
+
+    estatisticas.pool = engine_sincrono.pool
+
+    @event.listens_for(engine_sincrono, "checkout")
+    def _registrar_checkout(dbapi_connection, connection_record, connection_proxy):
+        estatisticas.checkouts += 1
+        estatisticas.pool = engine_sincrono.pool
+        estatisticas.atualizar_metricas()
+
+    @event.listens_for(engine_sincrono, "checkin")
+    def _registrar_checkin(dbapi_connection, connection_record):
+        estatisticas.atualizar_metricas()
+
+    # Registro de consultas lentas (DB_SLOW_QUERY_MS); o EXPLAIN usa as mesmas opções de conexão
+    if registro_consultas_lentas.ativo:
+        timeout_explain = registro_consultas_lentas.timeout_explain_ms or DB_STATEMENT_TIMEOUT_MS
+        registro_consultas_lentas.instalar(novo_engine, argumentos_conexao(dialeto.driver, timeout_explain))
+
+    return novo_engine
+
+
+class RoteadorReplicas:
+    """Distribui as leituras entre as réplicas saudáveis em round-robin.
+
+    A saúde das réplicas é verificada por uma tarefa em segundo plano (iniciar_verificacao);
+    as requisições só leem o resultado guardado em `saudaveis`.
+    """
+
+    def __init__(self, urls: list, max_lag: float = 0, intervalo_verificacao: float = 10):
+        self.replicas = [
+            criar_engine(url, EstatisticasPool(nome=f"replica{indice}")) for indice, url in enumerate(urls, start=1)
+        ]
+        self.saudaveis = list(self.replicas)
+        for replica in self.replicas:
+            event.listen(replica.sync_engine, "handle_error", self._ao_falhar(replica))
+        self.max_lag = max_lag
+        self.intervalo_verificacao = intervalo_verificacao
+        self._tarefa = None
+        self._indice = 0
+
+    async def _verificar_replica(self, replica: AsyncEngine) -> bool:
+        try:
+            async with replica.connect() as conn:
+                if replica.dialect.name == "postgresql" and self.max_lag:
+                    # Sem WAL recebido pendente de aplicação a réplica está em dia, mesmo que a
+                    # última transação aplicada seja antiga (primário ocioso)
+                    atraso = await conn.scalar(text(
+                        "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+                        " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+                    ))
+                    return float(atraso) <= self.max_lag
+                await conn.execute(text("SELECT 1"))
+                return True
+        except (DBAPIError, OSError) as e:
+            print(f"Réplica indisponível ({replica.url.render_as_string()}): {e}")
+            return False
+
+    async def verificar(self):
+        """Atualiza a lista de réplicas saudáveis (conexão e atraso de replicação)."""
+        resultados = await asyncio.gather(*(self._verificar_replica(replica) for replica in self.replicas))
+        self.saudaveis = [replica for replica, saudavel in zip(self.replicas, resultados) if saudavel]
+
+    def iniciar_verificacao(self):
+        """Inicia a verificação periódica em segundo plano (uma por worker)."""
+        if self.replicas and self._tarefa is None:
+            self._tarefa = asyncio.create_task(self._verificar_periodicamente())
+
+    async def _verificar_periodicamente(self):
+        while True:
+            await asyncio.sleep(self.intervalo_verificacao)
+            try:
+                await self.verificar()
+            except Exception as e:
+                print(f"Falha ao verificar as réplicas: {e}")
+
+    def proxima(self):
+        """Próxima réplica saudável, ou None para usar o primário."""
+        if not self.saudaveis:
+            return None
+        self._indice = (self._indice + 1) % len(self.saudaveis)
+        return self.saudaveis[self._indice]
+
+    def _ao_falhar(self, replica: AsyncEngine):
+        # Só falhas de conexão tiram a réplica do round-robin: um statement_timeout ou um erro do
+        # próprio comando não dizem nada sobre a saúde dela. O evento é do engine da réplica, então
+        # comandos enviados ao primário pela SessaoRoteada não passam por aqui
+        def ao_falhar(contexto):
+            erro = contexto.original_exception
+            if contexto.is_disconnect or isinstance(erro, OSError) or isinstance(contexto.sqlalchemy_exception, InterfaceError):
+                self.marcar_falha(replica)
+
+        return ao_falhar
+
+    def marcar_falha(self, replica: AsyncEngine):
+        if replica in self.saudaveis:
+            self.saudaveis.remove(replica)
+
+    async def dispose(self):
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            self._tarefa = None
+        for replica in self.replicas:
+            await replica.dispose()
+
+
+class SessaoRoteada(Session):
+    """Sessão que envia leituras para a réplica escolhida e escritas para o primário.
+
+    Depois da primeira escrita, todas as consultas seguintes da sessão voltam ao
+    primário para que a própria requisição enxergue o que acabou de gravar.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if isinstance(clause, (Insert, Update, Delete)):
+            self.info["escreveu"] = True
+        replica = self.info.get("replica")
+        if replica is not None and not self._flushing and not self.info.get("escreveu"):
+            return replica.sync_engine
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+
+@event.listens_for(SessaoRoteada, "before_flush")
+def _marcar_escrita(session, flush_context, instances):
+    session.info["escreveu"] = True
+
+
+estatisticas_pool = EstatisticasPool()
+
 # Criação do async engine
-engine: AsyncEngine = create_async_engine(DATABASE_URL, echo=True)
+engine: AsyncEngine = criar_engine(DATABASE_URL, estatisticas_pool)
+
+roteador_replicas = RoteadorReplicas(
+    DATABASE_REPLICA_URLS,
+    max_lag=DB_REPLICA_MAX_LAG_SECONDS,
+    intervalo_verificacao=DB_REPLICA_HEALTH_INTERVAL_SECONDS,
+)
 
 # Criação do async session factory
-AsyncSessionLocal: AsyncSession = sessionmaker(autocommit=False, bind=engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
+AsyncSessionLocal: AsyncSession = sessionmaker(
+    autocommit=False,
+    bind=engine,
+    class_=AsyncSession,
+    sync_session_class=SessaoRoteada,
+    expire_on_commit=False,
+    autoflush=False
+)
 
 Base = declarative_base()
 
-# Função para obter sessão do banco de dados
+
+# Função para obter sessão do banco de dados.
+# A AsyncSession só retira uma conexão do pool na primeira consulta; como as rotas
+# declaram a verificação de permissão (exige_permissao) antes desta dependência,
+# requisições negadas nem chegam a criar a sessão.
 async def get_db():
     async with AsyncSessionLocal() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+
+# Sessão para leituras seguras: usa uma réplica saudável quando houver réplicas configuradas.
+# Escritas feitas pela mesma sessão continuam indo para o primário.
+async def get_db_leitura():
+    async with AsyncSessionLocal() as session:
+        if roteador_replicas.replicas:
+            session.info["replica"] = roteador_replicas.proxima()
+        yield session
+
+
+# Ciclo de vida do banco em cada worker (chamado pelo lifespan da aplicação)
+async def iniciar_banco():
+    """Valida a conexão com o primário e verifica as réplicas antes de aceitar requisições."""
+    async with engine.connect():
+        pass
+    if roteador_replicas.replicas:
+        await roteador_replicas.verificar()
+        roteador_replicas.iniciar_verificacao()
+
+
+async def encerrar_banco():
+    """Fecha as conexões dos pools do worker (primário, réplicas e EXPLAIN das consultas lentas)."""
+    await engine.dispose()
+    await roteador_replicas.dispose()
+    await registro_consultas_lentas.dispose()
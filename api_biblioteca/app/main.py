@@ -1,10 +1,34 @@
-from fastapi import FastAPI
-from app.routers import books, permissions, users, loans, policy_group, policy_group_permissions, auth, files
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
+from app.routers import books, permissions, users, loans, policy_group, policy_group_permissions, auth, files, diagnostics
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.database import encerrar_banco, iniciar_banco
+from app.services.compression import CompressaoMiddleware
+from app.services.images_client import cliente_imagens
+from app.services.metrics import MetricasMiddleware, descartar_metricas_processo, gerar_metricas
+from app.services.security import cache_permissoes
+from app.services.warmup import aquecer_worker
+
+
+# Executado uma vez por worker: abre e aquece os pools (banco e images_service) ao iniciar e os
+# fecha ao encerrar, depois que as requisições em andamento terminaram (desligamento gracioso)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await iniciar_banco()
+    await cliente_imagens.iniciar()
+    await aquecer_worker()
+    cache_permissoes.iniciar_escuta()
+    yield
+    await cache_permissoes.encerrar_escuta()
+    await cliente_imagens.encerrar()
+    await encerrar_banco()
+    descartar_metricas_processo()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 origins = [
     "http://localhost:3000",  # URL do front-end
@@ -18,11 +42,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compressão gzip/Brotli/zstd negociada pelo Accept-Encoding
+app.add_middleware(CompressaoMiddleware)
+
+# Latência, status e consultas SQL por rota (expostos em /metrics)
+app.add_middleware(MetricasMiddleware)
+
 
 @app.get('/healthy')
 def health_check():
     return{'status': 'Healthy'}
 
+
+@app.get('/metrics', include_in_schema=False)
+def metrics():
+    conteudo, content_type = gerar_metricas()
+    return Response(content=conteudo, media_type=content_type)
+
 app.include_router(files.router)
 app.include_router(auth.router)
 app.include_router(books.router)
@@ -31,5 +67,6 @@ app.include_router(loans.router)
 app.include_router(policy_group.router)
 app.include_router(permissions.router)
 app.include_router(policy_group_permissions.router)
+app.include_router(diagnostics.router)
 
 # app.mount("/images", StaticFiles(directory="images"), name="images")
\ No newline at end of file
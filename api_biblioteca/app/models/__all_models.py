@@ -4,4 +4,5 @@ from app.models.loan import Emprestimo
 from app.models.permission import Permissao
 from app.models.policy_group_permission import grupo_politica_permissao
 from app.models.policy_group import GrupoPolitica
+from app.models.upload_ticket import TicketUploadUsado
 from app.models.user import Usuario
\ No newline at end of file
@@ -1,5 +1,5 @@
 from app.database import Base
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Table, Index, DDL, event
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -20,4 +20,20 @@ class Livro(Base):
     data_criacao = Column(DateTime, default=func.now())
     data_atualizacao = Column(DateTime, default=func.now(), onupdate=func.now())
     emprestimos = relationship("Emprestimo", back_populates="livro")
-    image_url = Column(String, nullable=True) # Caminho da imagem
\ No newline at end of file
+    image_url = Column(String, nullable=True) # Caminho da imagem
+
+    __table_args__ = (
+        # Índices trigram para as buscas parciais (ILIKE '%termo%') da listagem de livros
+        Index("ix_livro_titulo_trgm", "titulo", postgresql_using="gin", postgresql_ops={"titulo": "gin_trgm_ops"}),
+        Index("ix_livro_autor_trgm", "autor", postgresql_using="gin", postgresql_ops={"autor": "gin_trgm_ops"}),
+        # Busca das capas referenciadas, em lotes, pela limpeza de imagens órfãs
+        Index("ix_livro_image_url", "image_url"),
+    )
+
+
+# A extensão pg_trgm precisa existir antes dos índices trigram (create_all dos testes)
+event.listen(
+    Livro.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
\ No newline at end of file
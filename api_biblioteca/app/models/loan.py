@@ -1,6 +1,6 @@
 # Tabelas
 from app.database import Base
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Table, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -8,11 +8,19 @@ from sqlalchemy.sql import func
 class Emprestimo(Base):
     __tablename__ = 'emprestimo'
     id = Column(Integer, primary_key=True, autoincrement=True)
-    usuario_id = Column(Integer, ForeignKey('usuario.id'), nullable=False)
-    livro_id = Column(Integer, ForeignKey('livro.id'), nullable=False)
+    usuario_id = Column(Integer, ForeignKey('usuario.id'), nullable=False, index=True)
+    livro_id = Column(Integer, ForeignKey('livro.id'), nullable=False, index=True)
     data_emprestimo = Column(DateTime, default=func.now())
     data_devolucao = Column(DateTime)
     numero_renovacoes = Column(Integer, default=0)
     status = Column(String(20), nullable=False)
     usuario = relationship("Usuario", back_populates="emprestimos")
-    livro = relationship("Livro", back_populates="emprestimos")
\ No newline at end of file
+    livro = relationship("Livro", back_populates="emprestimos")
+
+    __table_args__ = (
+        # Varredura diária de vencidos: apenas os empréstimos ativos entram no índice
+        Index(
+            "ix_emprestimo_ativo_data_devolucao", "data_devolucao",
+            postgresql_where=text("status = 'Ativo'"),
+        ),
+    )
\ No newline at end of file
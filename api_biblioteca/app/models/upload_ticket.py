@@ -0,0 +1,10 @@
+from app.database import Base
+from sqlalchemy import Column, Integer, String
+
+
+class TicketUploadUsado(Base):
+    # Tickets de upload direto já usados no callback: cada ticket (jti) grava uma única imagem
+    __tablename__ = 'ticket_upload_usado'
+    jti = Column(String(32), primary_key=True)
+    # Timestamp Unix a partir do qual o ticket é recusado pela validade e a linha pode ser apagada
+    expira_em = Column(Integer, nullable=False, index=True)
@@ -1,5 +1,5 @@
 from app.database import Base
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship, column_property
 from sqlalchemy.sql import func
 
@@ -21,3 +21,8 @@ class Usuario(Base):
 
     grupo_politica_rel = relationship("GrupoPolitica", back_populates="usuarios")
     emprestimos = relationship("Emprestimo", back_populates="usuario")
+
+    __table_args__ = (
+        # Busca das fotos referenciadas, em lotes, pela limpeza de imagens órfãs
+        Index("ix_usuario_profile_picture_url", "profile_picture_url"),
+    )
@@ -1,9 +1,9 @@
 import os
 from datetime import timedelta
 from typing import Annotated
-from fastapi import APIRouter, Depends, status, HTTPException
-from psycopg2 import IntegrityError
+from fastapi import APIRouter, BackgroundTasks, Depends, status, HTTPException
 from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from fastapi.security import OAuth2PasswordRequestForm
@@ -13,9 +13,7 @@ from app.models.user import Usuario as UsuarioModel
 from app.schemas.user import UsuarioCreate
 from app.database import AsyncSessionLocal, get_db
 from app.services.security import authenticate_user, create_access_token, bcrypt_context, oauth2_bearer
-
-from sqlalchemy.exc import IntegrityError
-from asyncpg.exceptions import UniqueViolationError
+from app.services.rate_limit import limitador_login, limitar_tentativas_login
 
 router = APIRouter(
     prefix='/auth',
@@ -29,6 +27,10 @@ class Token(BaseModel):
 # Carrega o tempo de expiração a partir do .env (valor padrão: 20 minutos)
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "20"))
 
+# SQLSTATE de violação de unicidade no Postgres. O SQLAlchemy expõe o código no erro
+# adaptado do driver, sem precisar importar o asyncpg (ou o psycopg2) só para a checagem
+UNIQUE_VIOLATION = "23505"
+
 # Criar usuário
 @router.post("/", status_code=status.HTTP_201_CREATED)
 async def create_user(create_user_request: UsuarioCreate, db: AsyncSession = Depends(get_db)):
@@ -46,7 +48,7 @@ async def create_user(create_user_request: UsuarioCreate, db: AsyncSession = Dep
         await db.refresh(novo_usuario)
     except IntegrityError as e:
         await db.rollback()
-        if isinstance(e.orig, UniqueViolationError):
+        if getattr(e.orig, "sqlstate", None) == UNIQUE_VIOLATION:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Email '{create_user_request.email}' já está cadastrado."
@@ -58,14 +60,16 @@ async def create_user(create_user_request: UsuarioCreate, db: AsyncSession = Dep
 
     return novo_usuario
 
-# Login
+# Login (as tentativas são limitadas por IP e as falhas por conta, antes da verificação bcrypt)
 @router.post("/token", status_code=status.HTTP_200_OK, response_model=Token)
 async def login_for_access_token(
-    form_data: Annotated[OAuth2PasswordRequestForm, Depends()], 
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends(limitar_tentativas_login)],
+    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db)
 ):
-    user = await authenticate_user(form_data.username, form_data.password, db)
+    user = await authenticate_user(form_data.username, form_data.password, db, background_tasks)
     if not user:
+       await limitador_login.registrar_falha(form_data.username)
        raise HTTPException(
            status_code=status.HTTP_401_UNAUTHORIZED, 
            detail='Não foi possível validar o email.'
@@ -7,12 +7,26 @@ from sqlalchemy import func
 
 from app.models.book import Livro as LivroModel
 from app.schemas.book import LivroCreate, LivroRead, LivroUpdate, LivroOut, LivroListResponse
-from app.database import get_db
-from app.services.security import get_current_user
+from app.database import get_db, get_db_leitura
+from app.services.security import get_current_user, exige_permissao
+from app.services.serialization import colunas_do_schema, linhas_como_dicts, resposta_json
 
 router = APIRouter(prefix="/livros", tags=["Livros"])
 
 
+def montar_consulta_livros(titulo: Optional[str] = None, autor: Optional[str] = None, genero: Optional[str] = None):
+    """Consulta base da listagem de livros (sem paginação), usada também pelo harness de planos."""
+    query = select(LivroModel)
+    # As buscas parciais em título e autor usam os índices trigram (pg_trgm) no Postgres
+    if titulo:
+        query = query.where(LivroModel.titulo.ilike(f"%{titulo}%"))
+    if autor:
+        query = query.where(LivroModel.autor.ilike(f"%{autor}%"))
+    if genero:
+        query = query.where(LivroModel.genero.ilike(f"%{genero}%"))
+    return query
+
+
 # Listar livros com filtros por título, autor e gênero
 # @router.get("/", response_model=List[LivroOut])
 # async def listar_livros(
@@ -57,17 +71,10 @@ async def listar_livros(
     genero: Optional[str] = Query(None, description="Filtrar por gênero"),
     skip: int = Query(0, ge=0, description="Número de registros para pular (paginação)"),
     limit: int = Query(10, ge=1, le=100, description="Número máximo de livros por página"),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db_leitura),
 ):
     # Cria a query base sem paginação
-    base_query = select(LivroModel)
-    
-    if titulo:
-        base_query = base_query.where(LivroModel.titulo.ilike(f"%{titulo}%"))
-    if autor:
-        base_query = base_query.where(LivroModel.autor.ilike(f"%{autor}%"))
-    if genero:
-        base_query = base_query.where(LivroModel.genero.ilike(f"%{genero}%"))
+    base_query = montar_consulta_livros(titulo, autor, genero)
 
     # Executa a contagem total utilizando um subquery para garantir que offset/limit não interfiram
     subquery = base_query.subquery()
@@ -75,12 +82,13 @@ async def listar_livros(
     total_result = await db.execute(count_query)
     total = total_result.scalar() or 0
 
-    # Aplica paginação na query original
-    paginated_query = base_query.offset(skip).limit(limit)
+    # Aplica paginação na query original, buscando apenas as colunas de LivroOut
+    paginated_query = base_query.with_only_columns(*colunas_do_schema(LivroModel, LivroOut)).offset(skip).limit(limit)
     result = await db.execute(paginated_query)
-    livros = result.scalars().all()
+    livros = linhas_como_dicts(result)
 
-    return {"livros": livros, "total": total}
+    # Linhas do banco são serializadas direto (sem validar de novo no response_model)
+    return resposta_json({"livros": livros, "total": total})
 
 
 
@@ -89,7 +97,7 @@ async def listar_livros(
 @router.get("/{livro_id}", response_model=LivroOut)
 async def obter_livro(
     livro_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db_leitura),
     # current_user: dict = Depends(get_current_user)
 ):
     result = await db.execute(select(LivroModel).where(LivroModel.id == livro_id))
@@ -105,12 +113,9 @@ async def obter_livro(
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=LivroRead)
 async def criar_livro(
     livro_data: LivroCreate,
-    db: AsyncSession = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(exige_permissao("book.create", "Você não tem permissão para adicionar livros.")),
+    db: AsyncSession = Depends(get_db)
 ):
-    if "book.create" not in current_user.get("permissoes", []):
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Você não tem permissão para adicionar livros.")
-
     novo_livro = LivroModel(**livro_data.model_dump())
 
     db.add(novo_livro)
@@ -128,12 +133,9 @@ async def criar_livro(
 async def atualizar_livro(
     livro_id: int,
     livro_data: LivroUpdate,
-    db: AsyncSession = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(exige_permissao("book.update", "Você não tem permissão para atualizar livros.")),
+    db: AsyncSession = Depends(get_db)
 ):
-    if "book.update" not in current_user.get("permissoes", []):
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Você não tem permissão para atualizar livros.")
-
     result = await db.execute(select(LivroModel).where(LivroModel.id == livro_id))
     livro = result.scalar_one_or_none()
 
@@ -152,12 +154,9 @@ async def atualizar_livro(
 @router.delete("/{livro_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def deletar_livro(
     livro_id: int,
-    db: AsyncSession = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(exige_permissao("book.delete", "Você não tem permissão para excluir livros.")),
+    db: AsyncSession = Depends(get_db)
 ):
-    if "book.delete" not in current_user.get("permissoes", []):
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Você não tem permissão para excluir livros.")
-
     result = await db.execute(select(LivroModel).where(LivroModel.id == livro_id))
     livro = result.scalar_one_or_none()
 
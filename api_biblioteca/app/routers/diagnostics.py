@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends
+
+from app.database import estatisticas_pool
+from app.services.slow_query import registro_consultas_lentas
+from app.services.security import exige_permissao
+
+router = APIRouter(prefix="/diagnostico", tags=["Diagnostico"])
+
+
+# Estatísticas em tempo real do pool de conexões (apenas usuários com "admin.read")
+@router.get("/pool")
+async def obter_estatisticas_pool(current_user: dict = Depends(exige_permissao("admin.read"))):
+    return estatisticas_pool.snapshot()
+
+
+# Consultas lentas recentes, com o plano do EXPLAIN ANALYZE quando amostrado (apenas "admin.read")
+@router.get("/consultas-lentas")
+async def listar_consultas_lentas(current_user: dict = Depends(exige_permissao("admin.read"))):
+    return registro_consultas_lentas.snapshot()
@@ -1,29 +1,49 @@
-from fastapi import APIRouter, HTTPException, Depends, status, UploadFile, File, Form
+import time
+from urllib.parse import urlsplit
+
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Header, status, UploadFile, File, Form
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 import httpx
-import os
 
 from app.models.user import Usuario as UsuarioModel
 from app.models.book import Livro as LivroModel
+from app.models.upload_ticket import TicketUploadUsado
 from app.schemas.book import LivroOut
 from app.schemas.user import UsuarioOut
+from app.schemas.image import CallbackUploadIn, TicketUploadOut
 from app.database import get_db
-from app.services.security import get_current_user
+from app.services.security import cache_permissoes, get_current_user, exige_permissao
+from app.services.images_client import API_KEY, cliente_imagens
+from app.services.upload_tickets import TOLERANCIA_CALLBACK_SECONDS, emitir_ticket, verificar_ticket
 
 router = APIRouter(prefix="/images", tags=["Images"])
 
-# Carrega a API key a partir da variável de ambiente
-API_KEY = os.getenv("API_KEY", "CHAVE_SECRETA_PADRAO")
-
 async def upload_imagem(file: UploadFile, image_category: str):
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            "http://images_service:8000/upload",  # Usando o nome do serviço definido no docker-compose
-            files={"file": (file.filename, file.file, file.content_type)},
-            headers={"X-API-KEY": API_KEY, "image-category": image_category}
-        )
-    return response
+    # Reaproveita as conexões do pool do worker com o images_service
+    try:
+        return await cliente_imagens.enviar(file, image_category)
+    except httpx.HTTPError:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Serviço de imagens indisponível")
+
+def imagem_enviada(response) -> dict:
+    # Imagem recusada pelo images_service (tipo, dimensões ou tamanho): o erro é do cliente
+    if response.status_code == status.HTTP_400_BAD_REQUEST:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=response.json().get("detail", "Imagem inválida"))
+    if response.status_code != 200:
+        raise HTTPException(status_code=500, detail="Erro ao enviar imagem para o serviço de imagens")
+    return response.json()
+
+async def liberar_imagem_antiga(url_antiga: str, url_nova: str):
+    # A imagem substituída perde uma referência no images_service (a limpeza de órfãos cobre as falhas)
+    if not url_antiga or url_antiga == url_nova:
+        return
+    try:
+        await cliente_imagens.liberar(url_antiga)
+    except httpx.HTTPError as e:
+        print(f"Erro ao liberar a imagem {url_antiga}: {e}")
 
 # # Adicionar imagem de perfil e atualizar o campo profile_picture_url do usuário
 # @router.post("/profile", response_model=UsuarioOut, status_code=status.HTTP_200_OK)
@@ -69,13 +89,13 @@ async def upload_profile_picture_for_user(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Usuário não encontrado")
         
     response = await upload_imagem(file, "profile")
-    if response.status_code != 200:
-        raise HTTPException(status_code=500, detail="Erro ao enviar imagem para o serviço de imagens")
-    imagem_info = response.json()
+    imagem_info = imagem_enviada(response)
     
+    url_antiga = user.profile_picture_url
     user.profile_picture_url = imagem_info["file_url"]
     await db.commit()
     await db.refresh(user)
+    await liberar_imagem_antiga(url_antiga, user.profile_picture_url)
     
     return user
 
@@ -86,7 +106,8 @@ async def upload_book_cover_image(
     # book_id: int,
     book_id: int = Form(...),  # utilizando Form(...) para receber o valor do formData
     file: UploadFile = File(...),
-    current_user: dict = Depends(get_current_user),
+    # Verifica se o usuário atual tem permissão para atualizar o livro (antes de consultar o banco)
+    current_user: dict = Depends(exige_permissao("book.create")),
     db: AsyncSession = Depends(get_db)
 ):
     # Verifica se o livro existe
@@ -96,20 +117,100 @@ async def upload_book_cover_image(
     if not book:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Livro não encontrado")
     
-    # Verifica se o usuário atual tem permissão para atualizar o livro
-    if "book.create" not in current_user.get("permissoes", []):
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Permissão negada.")
-    
     response = await upload_imagem(file, "book_cover")
-    if response.status_code != 200:
-        raise HTTPException(status_code=500, detail="Erro ao enviar imagem para o serviço de imagens")
-    imagem_info = response.json()
+    imagem_info = imagem_enviada(response)
     
     # Atualiza a coluna image_url do livro
+    url_antiga = book.image_url
     book.image_url = imagem_info["file_url"]
     await db.commit()
     await db.refresh(book)
+    await liberar_imagem_antiga(url_antiga, book.image_url)
     
     return book
 
 
+
+
+# ------------------------------------------------------------------
+# Upload direto: o navegador envia a imagem ao images_service com um ticket
+# emitido aqui, e o images_service chama o callback com a URL gerada.
+# ------------------------------------------------------------------
+def pode_enviar_imagem(tipo: str, alvo_id: int, usuario_id: int, permissoes: list) -> bool:
+    # Mesmas regras do upload pela API: capa exige book.create; foto, o próprio usuário ou admin.update
+    if tipo == "livro":
+        return "book.create" in permissoes
+    return usuario_id == alvo_id or "admin.update" in permissoes
+
+
+@router.post("/profile/{user_id}/upload-ticket", response_model=TicketUploadOut, status_code=status.HTTP_200_OK)
+async def ticket_upload_profile_picture(
+    user_id: int,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if not pode_enviar_imagem("usuario", user_id, current_user["id"], current_user.get("permissoes", [])):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Você não tem permissão para atualizar este usuário.")
+    if await db.get(UsuarioModel, user_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Usuário não encontrado")
+    return emitir_ticket(current_user["id"], "usuario", user_id)
+
+
+@router.post("/book_cover/{book_id}/upload-ticket", response_model=TicketUploadOut, status_code=status.HTTP_200_OK)
+async def ticket_upload_book_cover(
+    book_id: int,
+    current_user: dict = Depends(exige_permissao("book.create")),
+    db: AsyncSession = Depends(get_db)
+):
+    if await db.get(LivroModel, book_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Livro não encontrado")
+    return emitir_ticket(current_user["id"], "livro", book_id)
+
+
+@router.post("/callback", include_in_schema=False)
+async def callback_upload(
+    dados: CallbackUploadIn,
+    background_tasks: BackgroundTasks,
+    x_api_key: str = Header(..., alias="X-API-KEY"),
+    db: AsyncSession = Depends(get_db)
+):
+    # Só o images_service conhece a API key; o destino vem do ticket assinado, não do corpo
+    if x_api_key != API_KEY:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="API Key inválida")
+    try:
+        ticket = verificar_ticket(dados.ticket, tolerancia=TOLERANCIA_CALLBACK_SECONDS)
+    except (ValueError, KeyError):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Ticket de upload inválido ou expirado")
+    if not urlsplit(dados.file_url).path.startswith(f"/files/{ticket['cat']}/"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Imagem de outra categoria")
+
+    # Cada ticket grava uma única imagem: um callback repetido (replay) não troca a imagem de novo
+    if await db.get(TicketUploadUsado, ticket["jti"]) is not None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Ticket de upload já utilizado")
+
+    # A permissão de quem pediu o ticket é conferida de novo: pode ter sido retirada depois da emissão
+    usuario = await db.get(UsuarioModel, ticket["sub"])
+    permissoes = await cache_permissoes.obter(usuario.grupo_politica, db) if usuario else []
+    if usuario is None or not pode_enviar_imagem(ticket["tipo"], ticket["id"], usuario.id, permissoes):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Sem permissão para enviar esta imagem")
+
+    modelo, coluna = (UsuarioModel, "profile_picture_url") if ticket["tipo"] == "usuario" else (LivroModel, "image_url")
+    entidade = await db.get(modelo, ticket["id"])
+    if entidade is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Destino da imagem não encontrado")
+
+    # O jti é registrado na mesma transação da URL; os tickets já vencidos saem da tabela
+    await db.execute(delete(TicketUploadUsado).where(TicketUploadUsado.expira_em < int(time.time())))
+    db.add(TicketUploadUsado(jti=ticket["jti"], expira_em=ticket["exp"] + TOLERANCIA_CALLBACK_SECONDS))
+    url_antiga = getattr(entidade, coluna)
+    setattr(entidade, coluna, dados.file_url)
+    try:
+        await db.commit()
+    except IntegrityError:  # O mesmo ticket em dois callbacks simultâneos
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Ticket de upload já utilizado")
+    # Depois da resposta: o DELETE no images_service pode esperar pelo lock das referências, e o
+    # images_service aguarda este callback para responder ao upload
+    background_tasks.add_task(liberar_imagem_antiga, url_antiga, dados.file_url)
+
+    return {"tipo": ticket["tipo"], "id": ticket["id"], "file_url": dados.file_url}
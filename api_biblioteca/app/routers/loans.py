@@ -8,17 +8,25 @@ from app.models.loan import Emprestimo as EmprestimoModel
 from app.models.user import Usuario as UsuarioModel
 from app.models.book import Livro as LivroModel
 from app.schemas.loan import EmprestimoCreate, EmprestimoOut, EmprestimoUpdate, EmprestimoLivroOut
-from app.database import get_db
-from app.services.security import get_current_user
+from app.database import get_db, get_db_leitura
+from app.services.security import exige_permissao
+from app.services.serialization import colunas_do_schema, linhas_como_dicts, resposta_json
 
 
 router = APIRouter(prefix="/emprestimos", tags=["Emprestimos"])
 
+
+def consulta_emprestimos_usuario(usuario_id: int):
+    """Empréstimos de um usuário com o livro carregado (usa o índice ix_emprestimo_usuario_id)."""
+    return (
+        select(EmprestimoModel)
+        .options(selectinload(EmprestimoModel.livro))  # carrega a relação com Livro
+        .where(EmprestimoModel.usuario_id == usuario_id)
+    )
+
 # Criar um novo emprestimo (apenas usuários com "loan.create" podem criar empréstimos)
 @router.post("/", response_model=EmprestimoOut, status_code=status.HTTP_201_CREATED)
-async def criar_emprestimo(emprestimo: EmprestimoCreate, current_user: UsuarioModel = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    if "loan.create" not in current_user.get("permissoes", []):
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Você não tem permissão para criar empréstimos.")
+async def criar_emprestimo(emprestimo: EmprestimoCreate, current_user: dict = Depends(exige_permissao("loan.create", "Você não tem permissão para criar empréstimos.")), db: AsyncSession = Depends(get_db)):
     # Verificar se o usuario existe
     usuario = await db.get(UsuarioModel, emprestimo.usuario_id)
     if not usuario:
@@ -57,20 +65,10 @@ from sqlalchemy.future import select
 # Listar todos os empréstimos de um determinado usuário (permitido apenas a usuários com o namespace "loan.read_by_client")
 @router.get("/", response_model=list[EmprestimoLivroOut])
 async def listar_emprestimos(
-    current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    current_user: dict = Depends(exige_permissao("loan.read_by_client")),
+    db: AsyncSession = Depends(get_db_leitura)
 ):
-    if "loan.read_by_client" not in current_user.get("permissoes", []):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Permissão negada."
-        )
-
-    query = (
-        select(EmprestimoModel)
-        .options(selectinload(EmprestimoModel.livro))  # carrega a relação com Livro
-        .where(EmprestimoModel.usuario_id == current_user["id"])
-    )
+    query = consulta_emprestimos_usuario(current_user["id"])
     result = await db.execute(query)
     emprestimos = result.scalars().all()
     return emprestimos
@@ -78,33 +76,20 @@ async def listar_emprestimos(
 # Rota para ler todos os emprestimos
 @router.get("/all", response_model=list[EmprestimoOut])
 async def listar_todos_emprestimos(
-    current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
-):
     # Verifica se o usuário possui a permissão para listar todos os empréstimos
-    if "admin.read" not in current_user.get("permissoes", []):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Permissão negada."
-        )
-
-    # Consulta todos os empréstimos, sem filtrar pelo usuário
-    query = select(EmprestimoModel)
+    current_user: dict = Depends(exige_permissao("admin.read")),
+    db: AsyncSession = Depends(get_db_leitura)
+):
+    # Consulta todos os empréstimos, sem filtrar pelo usuário (apenas as colunas de EmprestimoOut)
+    query = select(*colunas_do_schema(EmprestimoModel, EmprestimoOut))
     result = await db.execute(query)
-    emprestimos = result.scalars().all()
 
-    return emprestimos
+    return resposta_json(linhas_como_dicts(result))
 
 
 # Obter emprestimo por ID (permitido apenas a usuários com o namespace "admin.read")
 @router.get("/{emprestimo_id}", response_model=EmprestimoOut)
-async def obter_emprestimo(emprestimo_id: int, current_user: UsuarioModel = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    # Verificar se o usuário tem a permissão necessária
-    if "admin.read" not in current_user.get("permissoes", []):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Permissão negada."
-        )
+async def obter_emprestimo(emprestimo_id: int, current_user: dict = Depends(exige_permissao("admin.read")), db: AsyncSession = Depends(get_db)):
     emprestimo = await db.get(EmprestimoModel, emprestimo_id)
     if not emprestimo:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Empréstimo não encontrado")
@@ -116,15 +101,9 @@ async def obter_emprestimo(emprestimo_id: int, current_user: UsuarioModel = Depe
 async def atualizar_emprestimo(
     emprestimo_id: int, 
     emprestimo_update: EmprestimoUpdate, 
-    db: AsyncSession = Depends(get_db),
-    current_user: UsuarioModel = Depends(get_current_user)
+    current_user: dict = Depends(exige_permissao("loan.renew")),
+    db: AsyncSession = Depends(get_db)
 ):
-    # Verificar se o usuário tem a permissão necessária
-    if "loan.renew" not in current_user.get("permissoes", []):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Permissão negada."
-        )
     emprestimo = await db.get(EmprestimoModel, emprestimo_id)
     if not emprestimo:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Empréstimo não encontrado")
@@ -155,13 +134,7 @@ async def atualizar_emprestimo(
 
 # Deletar emprestimo (permitido apenas a usuários com o namespace "admin.delete")
 @router.delete("/{emprestimo_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def deletar_emprestimo(emprestimo_id: int, db: AsyncSession = Depends(get_db), current_user: UsuarioModel = Depends(get_current_user)):
-    # Verificar se o usuário tem a permissão necessária
-    if "loan.renew" not in current_user.get("permissoes", []):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Permissão negada."
-        )
+async def deletar_emprestimo(emprestimo_id: int, current_user: dict = Depends(exige_permissao("loan.renew")), db: AsyncSession = Depends(get_db)):
     emprestimo = await db.get(EmprestimoModel, emprestimo_id)
     if not emprestimo:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Empréstimo não encontrado")
@@ -6,18 +6,17 @@ from app.models.permission import Permissao as PermissaoModel
 from app.models.user import Usuario as UsuarioModel
 from app.schemas.permission import PermissaoCreate, PermissaoOut, PermissaoUpdate
 from app.database import get_db
-from app.services.security import get_current_user
+from app.services.security import cache_permissoes, get_current_user, exige_permissao
 from datetime import datetime
 
 router = APIRouter(prefix="/permissoes", tags=["Permissoes"])
 
+# As rotas administrativas deste módulo respondem 401 quando falta a permissão
+ACESSO_NAO_AUTORIZADO = 'Acesso não autorizado. Falha de autenticação.'
+
 # Criar uma nova permissão
 @router.post("/", response_model=PermissaoOut, status_code=status.HTTP_201_CREATED)
-async def criar_permissao(permissao: PermissaoCreate, db: AsyncSession = Depends(get_db), current_user: UsuarioModel = Depends(get_current_user)):
-    # Validação de permissão
-    if "admin.create" not in current_user.get("permissoes", []):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Acesso não autorizado. Falha de autenticação.')
-    
+async def criar_permissao(permissao: PermissaoCreate, current_user: dict = Depends(exige_permissao("admin.create", ACESSO_NAO_AUTORIZADO, status.HTTP_401_UNAUTHORIZED)), db: AsyncSession = Depends(get_db)):
     nova_permissao = PermissaoModel(
         nome=permissao.nome,
         descricao=permissao.descricao,
@@ -34,22 +33,14 @@ async def criar_permissao(permissao: PermissaoCreate, db: AsyncSession = Depends
 
 # Listar permissões
 @router.get("/", response_model=list[PermissaoOut])
-async def listar_permissoes(db: AsyncSession = Depends(get_db), current_user: UsuarioModel = Depends(get_current_user)):
-    # Validação de permissão
-    if "admin.read" not in current_user.get("permissoes", []):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Acesso não autorizado. Falha de autenticação.')
-    
+async def listar_permissoes(current_user: dict = Depends(exige_permissao("admin.read", ACESSO_NAO_AUTORIZADO, status.HTTP_401_UNAUTHORIZED)), db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(PermissaoModel))
     permissoes = result.scalars().all()
     return permissoes
 
 # Listar permissão por id
 @router.get("/{permissao_id}", response_model=PermissaoOut)
-async def obter_permissao(permissao_id: int, db: AsyncSession = Depends(get_db), current_user: UsuarioModel = Depends(get_current_user)):
-    # Validação de permissão
-    if "admin.read" not in current_user.get("permissoes", []):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Acesso não autorizado. Falha de autenticação.')
-    
+async def obter_permissao(permissao_id: int, current_user: dict = Depends(exige_permissao("admin.read", ACESSO_NAO_AUTORIZADO, status.HTTP_401_UNAUTHORIZED)), db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(PermissaoModel).filter(PermissaoModel.id == permissao_id))
     permissao = result.scalars().first()
     if not permissao:
@@ -58,11 +49,7 @@ async def obter_permissao(permissao_id: int, db: AsyncSession = Depends(get_db),
 
 # Atualizar uma permissão
 @router.put("/{permissao_id}", response_model=PermissaoOut)
-async def atualizar_permissao(permissao_id: int, permissao_update: PermissaoUpdate, db: AsyncSession = Depends(get_db), current_user: UsuarioModel = Depends(get_current_user)):
-    # Validação de permissão
-    if "admin.update" not in current_user.get("permissoes", []):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Acesso não autorizado. Falha de autenticação.')
-    
+async def atualizar_permissao(permissao_id: int, permissao_update: PermissaoUpdate, current_user: dict = Depends(exige_permissao("admin.update", ACESSO_NAO_AUTORIZADO, status.HTTP_401_UNAUTHORIZED)), db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(PermissaoModel).filter(PermissaoModel.id == permissao_id))
     permissao = result.scalars().first()
     if not permissao:
@@ -76,6 +63,7 @@ async def atualizar_permissao(permissao_id: int, permissao_update: PermissaoUpda
     try:
         await db.commit()
         await db.refresh(permissao)
+        await cache_permissoes.invalidar_global()  # O namespace pode ter mudado
         return permissao
     except IntegrityError:
         await db.rollback()
@@ -83,11 +71,7 @@ async def atualizar_permissao(permissao_id: int, permissao_update: PermissaoUpda
 
 # Deletar permissão
 @router.delete("/{permissao_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def deletar_permissao(permissao_id: int, db: AsyncSession = Depends(get_db), current_user: UsuarioModel = Depends(get_current_user)):
-    # Validação de permissão
-    if "admin.delete" not in current_user.get("permissoes", []):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Acesso não autorizado. Falha de autenticação.')
-    
+async def deletar_permissao(permissao_id: int, current_user: dict = Depends(exige_permissao("admin.delete", ACESSO_NAO_AUTORIZADO, status.HTTP_401_UNAUTHORIZED)), db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(PermissaoModel).filter(PermissaoModel.id == permissao_id))
     permissao = result.scalars().first()
     if not permissao:
@@ -95,4 +79,5 @@ async def deletar_permissao(permissao_id: int, db: AsyncSession = Depends(get_db
 
     await db.delete(permissao)
     await db.commit()
+    await cache_permissoes.invalidar_global()
     return None
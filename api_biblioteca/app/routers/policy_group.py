@@ -8,18 +8,17 @@ from app.models.policy_group import GrupoPolitica as GrupoPoliticaModel
 from app.models.user import Usuario as UsuarioModel
 from app.schemas.policy_group import GrupoPoliticaCreate, GrupoPoliticaOut, GrupoPoliticaUpdate
 from app.database import get_db
-from app.services.security import get_current_user
+from app.services.security import cache_permissoes, get_current_user, exige_permissao
 
 
 router = APIRouter(prefix="/grupos_politica", tags=["Grupos Politica"])
 
+# As rotas administrativas deste módulo respondem 401 quando falta a permissão
+ACESSO_NAO_AUTORIZADO = 'Acesso não autorizado. Falha de autenticação.'
+
 # Criar um novo grupo de políticas (apenas usuários com "policy_group.create" podem criar grupos de política)
 @router.post("/", response_model=GrupoPoliticaOut, status_code=status.HTTP_201_CREATED)
-async def criar_grupo_politica(grupo: GrupoPoliticaCreate, db: AsyncSession = Depends(get_db), current_user: UsuarioModel = Depends(get_current_user)):
-    # Validação de permissão
-    if "policy_group.create" not in current_user.get("permissoes", []):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Acesso não autorizado. Falha de autenticação.')
-    
+async def criar_grupo_politica(grupo: GrupoPoliticaCreate, current_user: dict = Depends(exige_permissao("policy_group.create", ACESSO_NAO_AUTORIZADO, status.HTTP_401_UNAUTHORIZED)), db: AsyncSession = Depends(get_db)):
     novo_grupo = GrupoPoliticaModel(nome=grupo.nome)
     db.add(novo_grupo)
     try:
@@ -32,22 +31,14 @@ async def criar_grupo_politica(grupo: GrupoPoliticaCreate, db: AsyncSession = De
 
 # Listar grupos de política (permitido apenas a usuarios com a permissão "policy_group.read")
 @router.get("/", response_model=list[GrupoPoliticaOut])
-async def listar_grupos_politica(db: AsyncSession = Depends(get_db), current_user: UsuarioModel = Depends(get_current_user)):
-    # Validação de permissão
-    if "policy_group.read" not in current_user.get("permissoes", []):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Acesso não autorizado. Falha de autenticação.')
-    
+async def listar_grupos_politica(current_user: dict = Depends(exige_permissao("policy_group.read", ACESSO_NAO_AUTORIZADO, status.HTTP_401_UNAUTHORIZED)), db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(GrupoPoliticaModel))
     grupos = result.scalars().all()
     return grupos
 
 # Exibir grupo de política por id (permitido apenas a usuarios com a permissão "policy_group.read")
 @router.get("/{grupo_id}", response_model=GrupoPoliticaOut)
-async def obter_grupo_politica(grupo_id: int, db: AsyncSession = Depends(get_db), current_user: UsuarioModel = Depends(get_current_user)):
-    # Validação de permissão
-    if "policy_group.read" not in current_user.get("permissoes", []):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Acesso não autorizado. Falha de autenticação.')
-    
+async def obter_grupo_politica(grupo_id: int, current_user: dict = Depends(exige_permissao("policy_group.read", ACESSO_NAO_AUTORIZADO, status.HTTP_401_UNAUTHORIZED)), db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(GrupoPoliticaModel).filter(GrupoPoliticaModel.id == grupo_id))
     grupo = result.scalars().first()
     if not grupo:
@@ -56,11 +47,7 @@ async def obter_grupo_politica(grupo_id: int, db: AsyncSession = Depends(get_db)
 
 # Atualizar grupo de política (permitido apenas a usuarios com a permissão "policy_group.update")
 @router.put("/update/{grupo_id}", response_model=GrupoPoliticaOut)
-async def atualizar_grupo_politica(grupo_id: int, grupo_update: GrupoPoliticaUpdate, db: AsyncSession = Depends(get_db), current_user: UsuarioModel = Depends(get_current_user)):
-    # Validação de permissão
-    if "policy_group.update" not in current_user.get("permissoes", []):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Acesso não autorizado. Falha de autenticação.')
-    
+async def atualizar_grupo_politica(grupo_id: int, grupo_update: GrupoPoliticaUpdate, current_user: dict = Depends(exige_permissao("policy_group.update", ACESSO_NAO_AUTORIZADO, status.HTTP_401_UNAUTHORIZED)), db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(GrupoPoliticaModel).filter(GrupoPoliticaModel.id == grupo_id))
     grupo = result.scalars().first()
     if not grupo:
@@ -72,6 +59,7 @@ async def atualizar_grupo_politica(grupo_id: int, grupo_update: GrupoPoliticaUpd
     try:
         await db.commit()
         await db.refresh(grupo)
+        await cache_permissoes.invalidar_global()  # O cache é indexado pelo nome do grupo
         return grupo
     except IntegrityError:
         await db.rollback()
@@ -79,11 +67,7 @@ async def atualizar_grupo_politica(grupo_id: int, grupo_update: GrupoPoliticaUpd
 
 # Deletar grupo de política (permitido apenas a usuarios com a permissão "policy_group.delete")
 @router.delete("/{grupo_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def deletar_grupo_politica(grupo_id: int, db: AsyncSession = Depends(get_db), current_user: UsuarioModel = Depends(get_current_user)):
-    # Validação de permissão
-    if "policy_group.delete" not in current_user.get("permissoes", []):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Acesso não autorizado. Falha de autenticação.')
-    
+async def deletar_grupo_politica(grupo_id: int, current_user: dict = Depends(exige_permissao("policy_group.delete", ACESSO_NAO_AUTORIZADO, status.HTTP_401_UNAUTHORIZED)), db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(GrupoPoliticaModel).filter(GrupoPoliticaModel.id == grupo_id))
     grupo = result.scalars().first()
     if not grupo:
@@ -91,4 +75,5 @@ async def deletar_grupo_politica(grupo_id: int, db: AsyncSession = Depends(get_d
 
     await db.delete(grupo)
     await db.commit()
+    await cache_permissoes.invalidar_global()
     return None
@@ -6,18 +6,17 @@ from app.models.policy_group_permission import grupo_politica_permissao
 from app.models.user import Usuario as UsuarioModel
 from app.schemas.policy_group_permission import GrupoPoliticaPermissaoCreate, GrupoPoliticaPermissaoOut
 from app.database import get_db
-from app.services.security import get_current_user
+from app.services.security import cache_permissoes, get_current_user, exige_permissao
 
 router = APIRouter(prefix="/grupo_politica_permissoes", tags=["Grupo Politica Permissoes"])
 
+# As rotas administrativas deste módulo respondem 401 quando falta a permissão
+ACESSO_NAO_AUTORIZADO = 'Acesso não autorizado. Falha de autenticação.'
+
 
 # Criar uma novo relacionamento entre Grupo de política e Permissão (apenas usuários com "admin.create" podem criar grupos de política)
 @router.post("/", response_model=GrupoPoliticaPermissaoOut, status_code=status.HTTP_201_CREATED)
-async def adicionar_permissao_ao_grupo(relacao: GrupoPoliticaPermissaoCreate, db: AsyncSession = Depends(get_db), current_user: UsuarioModel = Depends(get_current_user)):
-    # Validação de permissão
-    if "admin.create" not in current_user.get("permissoes", []):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Acesso não autorizado. Falha de autenticação.')
-    
+async def adicionar_permissao_ao_grupo(relacao: GrupoPoliticaPermissaoCreate, current_user: dict = Depends(exige_permissao("admin.create", ACESSO_NAO_AUTORIZADO, status.HTTP_401_UNAUTHORIZED)), db: AsyncSession = Depends(get_db)):
     stmt = insert(grupo_politica_permissao).values(
         grupo_politica_nome=relacao.grupo_politica_nome,
         permissao_namespace=relacao.permissao_namespace
@@ -25,6 +24,7 @@ async def adicionar_permissao_ao_grupo(relacao: GrupoPoliticaPermissaoCreate, db
     try:
         await db.execute(stmt)
         await db.commit()
+        await cache_permissoes.invalidar_global()
         return relacao
     except Exception as e:
         await db.rollback()
@@ -32,22 +32,14 @@ async def adicionar_permissao_ao_grupo(relacao: GrupoPoliticaPermissaoCreate, db
 
 # Criar uma novo relacionamento entre Grupo de política e Permissão (apenas usuários com "admin.read" podem criar grupos de política)
 @router.get("/", response_model=list[GrupoPoliticaPermissaoOut])
-async def listar_permissoes_grupo(db: AsyncSession = Depends(get_db), current_user: UsuarioModel = Depends(get_current_user)):
-    # Validação de permissão
-    if "admin.read" not in current_user.get("permissoes", []):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Acesso não autorizado. Falha de autenticação.')
-    
+async def listar_permissoes_grupo(current_user: dict = Depends(exige_permissao("admin.read", ACESSO_NAO_AUTORIZADO, status.HTTP_401_UNAUTHORIZED)), db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(grupo_politica_permissao))
     permissoes_grupos = result.fetchall()
     return [{"grupo_politica_nome": row.grupo_politica_nome, "permissao_namespace": row.permissao_namespace} for row in permissoes_grupos]
 
 # Excluir relacionamento entre Grupo de política e Permissão (permitido apenas a usuários com namespace "admin.delete")
 @router.delete("/", status_code=status.HTTP_204_NO_CONTENT)
-async def remover_permissao_do_grupo(grupo_politica_nome: str, permissao_namespace: str, db: AsyncSession = Depends(get_db), current_user: UsuarioModel = Depends(get_current_user)):
-    # Validação de permissão
-    if "admin.delete" not in current_user.get("permissoes", []):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Acesso não autorizado. Falha de autenticação.')
-    
+async def remover_permissao_do_grupo(grupo_politica_nome: str, permissao_namespace: str, current_user: dict = Depends(exige_permissao("admin.delete", ACESSO_NAO_AUTORIZADO, status.HTTP_401_UNAUTHORIZED)), db: AsyncSession = Depends(get_db)):
     stmt = delete(grupo_politica_permissao).where(
         grupo_politica_permissao.c.grupo_politica_nome == grupo_politica_nome,
         grupo_politica_permissao.c.permissao_namespace == permissao_namespace
@@ -57,4 +49,5 @@ async def remover_permissao_do_grupo(grupo_politica_nome: str, permissao_namespa
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Relacionamento não encontrado.")
 
     await db.commit()
+    await cache_permissoes.invalidar_global()
     return None
\ No newline at end of file
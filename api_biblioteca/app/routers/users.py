@@ -5,23 +5,20 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.user import Usuario as UsuarioModel
 from app.schemas.user import UsuarioCreate, UsuarioOut, UsuarioUpdate, UsuarioCreateAdmin, UsuarioAdminUpdate
-from app.database import get_db
-from app.services.security import get_current_user, bcrypt_context
+from app.database import get_db, get_db_leitura
+from app.services.security import get_current_user, bcrypt_context, exige_permissao
+from app.services.serialization import colunas_do_schema, linhas_como_dicts, resposta_json
 
 router = APIRouter(prefix="/usuarios", tags=["Usuarios"])
 
 # Listar usuários (apenas "admin.read" pode listar todos os usuários)
 @router.get("/", response_model=list[UsuarioOut])
 async def list_users(
-    db: AsyncSession = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(exige_permissao("admin.read", "Você não tem permissão para visualizar usuários.")),
+    db: AsyncSession = Depends(get_db_leitura)
 ):
-    if "admin.read" not in current_user.get("permissoes", []):
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Você não tem permissão para visualizar usuários.")
-
-    result = await db.execute(select(UsuarioModel))
-    usuarios = result.scalars().all()
-    return usuarios
+    result = await db.execute(select(*colunas_do_schema(UsuarioModel, UsuarioOut)))
+    return resposta_json(linhas_como_dicts(result))
 
 # Obter usuário pelo ID (admin pode acessar qualquer um, clientes só acessam seus próprios dados)
 @router.get("/{usuario_id}", response_model=UsuarioOut)
@@ -45,12 +42,9 @@ async def get_user(
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=UsuarioOut)
 async def create_user(
     create_user_request: UsuarioCreateAdmin,
-    db: AsyncSession = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(exige_permissao("admin.create", "Você não tem permissão para criar usuários.")),
+    db: AsyncSession = Depends(get_db)
 ):
-    if "admin.create" not in current_user.get("permissoes", []):
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Você não tem permissão para criar usuários.")
-
     hashed_password = bcrypt_context.hash(create_user_request.senha_hash)
 
     novo_usuario = UsuarioModel(
@@ -122,12 +116,9 @@ async def update_user(
 @router.delete("/{usuario_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_user(
     usuario_id: int,
-    db: AsyncSession = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(exige_permissao("admin.delete", "Você não tem permissão para excluir usuários.")),
+    db: AsyncSession = Depends(get_db)
 ):
-    if "admin.delete" not in current_user.get("permissoes", []):
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Você não tem permissão para excluir usuários.")
-
     result = await db.execute(select(UsuarioModel).where(UsuarioModel.id == usuario_id))
     usuario = result.scalar_one_or_none()
 
@@ -0,0 +1,15 @@
+from pydantic import BaseModel, Field
+
+
+# Ticket de upload direto ao images_service (emitido pela API)
+class TicketUploadOut(BaseModel):
+    ticket: str = Field(..., description="Enviar no cabeçalho X-Upload-Ticket do upload")
+    upload_url: str = Field(..., description="Endpoint do images_service que recebe o arquivo (multipart, campo file)")
+    category: str
+    expires_at: int = Field(..., description="Validade do ticket (timestamp Unix)")
+
+
+# Chamado pelo images_service depois de armazenar a imagem enviada com um ticket
+class CallbackUploadIn(BaseModel):
+    ticket: str
+    file_url: str
@@ -0,0 +1,115 @@
+"""-----------------------------------------------------------
+Ponto de entrada de produção da API (vários workers do uvicorn).
+
+O número de workers é calculado a partir dos núcleos e da memória
+disponíveis para o container (cgroups), ou fixado por WEB_CONCURRENCY.
+Cada worker abre e fecha os próprios pools de conexão no lifespan da
+aplicação (app/main.py).
+
+Sinais aceitos pelo processo principal:
+    SIGTERM/SIGINT  encerra aguardando as requisições em andamento (GRACEFUL_TIMEOUT)
+    SIGHUP          reinicia os workers um a um (ex.: após um deploy)
+    SIGTTIN/SIGTTOU adiciona/remove um worker
+
+Uso:
+    python -m app.server
+-----------------------------------------------------------"""
+import importlib.util
+import math
+import os
+import tempfile
+
+import uvicorn
+from dotenv import load_dotenv
+
+# O processo supervisor não importa a aplicação (nem o SQLAlchemy): cada worker
+# importa app.main do zero ao ser criado, então nada daqui seria reaproveitado
+load_dotenv()
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "0"))  # 0 = calcula pelos recursos disponíveis
+WORKER_MEMORY_MB = int(os.getenv("WORKER_MEMORY_MB", "200"))  # Memória estimada por worker
+WORKER_MAX = int(os.getenv("WORKER_MAX", "16"))
+KEEPALIVE_TIMEOUT = int(os.getenv("KEEPALIVE_TIMEOUT", "75"))  # Maior que o timeout ocioso do balanceador
+BACKLOG = int(os.getenv("BACKLOG", "2048"))
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "30"))  # Segundos para drenar as requisições
+LIMIT_MAX_REQUESTS = int(os.getenv("LIMIT_MAX_REQUESTS", "0"))  # Recicla o worker após N requisições (0 = nunca)
+FORWARDED_ALLOW_IPS = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+# Mesmos padrões de app/database.py, lidos aqui apenas para o resumo de conexões
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+
+
+def _ler_arquivo(caminho: str):
+    try:
+        with open(caminho) as arquivo:
+            return arquivo.read().strip()
+    except OSError:
+        return None
+
+
+def nucleos_disponiveis() -> float:
+    """Núcleos utilizáveis pelo processo, respeitando a afinidade e a cota de CPU do cgroup."""
+    nucleos = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    cota = _ler_arquivo("/sys/fs/cgroup/cpu.max")  # cgroup v2: "<cota> <período>" ou "max <período>"
+    if cota and not cota.startswith("max"):
+        limite, periodo = (int(valor) for valor in cota.split())
+        nucleos = min(nucleos, limite / periodo)
+    return nucleos
+
+
+def memoria_disponivel_mb():
+    """Memória disponível em MB (limite do cgroup ou MemAvailable do host); None se desconhecida."""
+    limite = _ler_arquivo("/sys/fs/cgroup/memory.max")
+    if limite and limite != "max":
+        return int(limite) // (1024 * 1024)
+    meminfo = _ler_arquivo("/proc/meminfo") or ""
+    for linha in meminfo.splitlines():
+        if linha.startswith("MemAvailable:"):
+            return int(linha.split()[1]) // 1024
+    return None
+
+
+def calcular_workers(nucleos: float, memoria_mb, memoria_por_worker: int = WORKER_MEMORY_MB, maximo: int = WORKER_MAX) -> int:
+    """Um worker por núcleo (o trabalho é assíncrono), limitado pela memória disponível."""
+    workers = max(1, math.ceil(nucleos))
+    if memoria_mb:
+        workers = min(workers, max(1, int(memoria_mb * 0.8) // memoria_por_worker))  # Reserva 20% ao sistema
+    return min(workers, maximo)
+
+
+def main():
+    workers = WEB_CONCURRENCY or calcular_workers(nucleos_disponiveis(), memoria_disponivel_mb())
+    loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+    # Com vários workers, as métricas do Prometheus precisam ser agregadas entre os processos
+    if workers > 1 and not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="prometheus-")
+
+    print(
+        f"----> Iniciando {workers} worker(s) em {HOST}:{PORT} (loop={loop}, http={http}); "
+        f"até {workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW)} conexões com o banco"
+    )
+    uvicorn.run(
+        "app.main:app",
+        host=HOST,
+        port=PORT,
+        workers=workers,
+        loop=loop,
+        http=http,
+        lifespan="on",
+        backlog=BACKLOG,
+        timeout_keep_alive=KEEPALIVE_TIMEOUT,
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT,
+        limit_max_requests=LIMIT_MAX_REQUESTS or None,
+        proxy_headers=True,
+        forwarded_allow_ips=FORWARDED_ALLOW_IPS,
+        access_log=False,  # Latência e status já são registrados em /metrics
+    )
+
+
+if __name__ == "__main__":
+    main()
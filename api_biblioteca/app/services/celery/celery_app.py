@@ -1,14 +1,17 @@
 from celery import Celery
+from celery.signals import task_failure, task_postrun, task_prerun, worker_process_shutdown, worker_ready
 from datetime import datetime, timedelta
-from sqlalchemy import select
 import os
+import time
 
-from app.models.user import Usuario
-from app.models.book import Livro
-from app.models.loan import Emprestimo
 from app.services.celery.notifications import enviar_notificacao
 from app.services.celery.celery_config import SessionLocalCelery  # Sessão síncrona para o Celery
+from app.services.celery.overdue_loans import consulta_emprestimos_vencidos
+from app.services.celery.orphan_images import COLUNAS, UPLOAD_DIR, gravar_cursores, ler_cursores, limpar_categoria
 from app.models.__all_models import Base 
+from app.services import metrics
+from app.services.query_counter import avisar_n_mais_um, encerrar_contagem, iniciar_contagem
+from app.services.storage_backend import criar_backend
 
 # Configurando o Celery
 celery_app = Celery(
@@ -32,6 +35,43 @@ celery_app.conf.beat_schedule = {
     },
 }
 
+# -------------------------
+# Métricas das tarefas
+# -------------------------
+_inicio_tarefas = {}  # task_id -> (início, contador de consultas, token do contexto)
+
+@task_prerun.connect
+def _registrar_inicio_tarefa(task_id=None, task=None, **kwargs):
+    contador, token = iniciar_contagem(task.name)
+    _inicio_tarefas[task_id] = (time.perf_counter(), contador, token)
+
+@task_postrun.connect
+def _registrar_fim_tarefa(task_id=None, task=None, state=None, **kwargs):
+    registro = _inicio_tarefas.pop(task_id, None)
+    if registro is not None:
+        inicio, contador, token = registro
+        encerrar_contagem(token)
+        metrics.DURACAO_TAREFA.labels(task.name, state or "UNKNOWN").observe(time.perf_counter() - inicio)
+        metrics.CONSULTAS_POR_TAREFA.labels(task.name).observe(contador.comandos)
+        avisar_n_mais_um(contador, task.name)
+
+@task_failure.connect
+def _registrar_falha_tarefa(sender=None, **kwargs):
+    metrics.FALHAS_TAREFA.labels(sender.name).inc()
+
+@worker_ready.connect
+def _iniciar_servidor_metricas(**kwargs):
+    # Com o pool prefork, defina PROMETHEUS_MULTIPROC_DIR para agregar as métricas dos processos filhos
+    porta = os.getenv("CELERY_METRICS_PORT")
+    if porta:
+        from prometheus_client import start_http_server
+        start_http_server(int(porta), registry=metrics.registry_coleta())
+
+@worker_process_shutdown.connect
+def _descartar_metricas_processo(pid=None, **kwargs):
+    metrics.descartar_metricas_processo(pid)
+
+
 @celery_app.task
 def verificar_emprestimos_vencidos():
     with SessionLocalCelery() as session:
@@ -42,13 +82,7 @@ def verificar_emprestimos_vencidos():
             data_limite = agora - timedelta(days=7)
 
             # Consulta os empréstimos ativos com data de devolução ultrapassada
-            result = session.execute(
-                select(Emprestimo)
-                .filter(
-                    Emprestimo.status == "Ativo",  # Filtra empréstimos ativos
-                    Emprestimo.data_devolucao < data_limite,  # Filtra empréstimos com mais de 7 dias
-                )
-            )
+            result = session.execute(consulta_emprestimos_vencidos(data_limite))
             emprestimos = result.scalars().all()
 
             # Atualiza o status e notifica os usuários
@@ -73,45 +107,16 @@ def verificar_emprestimos_vencidos():
 
 @celery_app.task
 def limpar_imagens_orfas():
-    UPLOAD_DIR = "upload"
-    profile_dir = os.path.join(UPLOAD_DIR, "profile")
-    book_cover_dir = os.path.join(UPLOAD_DIR, "book_cover")
-
-    # Obtém a lista de arquivos nos diretórios, se existirem
-    arquivos_profile = os.listdir(profile_dir) if os.path.exists(profile_dir) else []
-    arquivos_book_cover = os.listdir(book_cover_dir) if os.path.exists(book_cover_dir) else []
-
-    # Consulta o banco de dados para obter os nomes dos arquivos referenciados
+    # Incremental: cada execução continua do cursor da anterior (ver orphan_images), no mesmo
+    # backend de armazenamento do images_service (diretório upload ou bucket S3)
+    arquivos = criar_backend(UPLOAD_DIR)
+    cursores = ler_cursores()
+    removidos = 0
     with SessionLocalCelery() as session:
-        # Para os usuários
-        usuarios = session.execute(select(Usuario.profile_picture_url)).scalars().all()
-        # Para os livros
-        livros = session.execute(select(Livro.image_url)).scalars().all()
-
-    # Extrai apenas o nome do arquivo (basename) das URLs registradas
-    referenciados_profile = {os.path.basename(url) for url in usuarios if url}
-    referenciados_book = {os.path.basename(url) for url in livros if url}
-
-    arquivos_removidos = []
-
-    # Verifica e remove arquivos órfãos no diretório de perfil
-    for arquivo in arquivos_profile:
-        if arquivo not in referenciados_profile:
-            caminho_arquivo = os.path.join(profile_dir, arquivo)
-            try:
-                os.remove(caminho_arquivo)
-                arquivos_removidos.append(caminho_arquivo)
-            except Exception as e:
-                print(f"Erro ao remover {caminho_arquivo}: {e}")
-
-    # Verifica e remove arquivos órfãos no diretório de capas de livros
-    for arquivo in arquivos_book_cover:
-        if arquivo not in referenciados_book:
-            caminho_arquivo = os.path.join(book_cover_dir, arquivo)
-            try:
-                os.remove(caminho_arquivo)
-                arquivos_removidos.append(caminho_arquivo)
-            except Exception as e:
-                print(f"Erro ao remover {caminho_arquivo}: {e}")
-
-    return f"Arquivos órfãos removidos: {arquivos_removidos}"
\ No newline at end of file
+        for categoria in COLUNAS:
+            cursor = cursores.get(categoria)
+            removidos_categoria, cursores[categoria] = limpar_categoria(session, arquivos, categoria, cursor if isinstance(cursor, str) else "")
+            removidos += removidos_categoria
+            gravar_cursores(cursores)
+
+    return f"Arquivos órfãos removidos: {removidos} (cursores: {cursores})"
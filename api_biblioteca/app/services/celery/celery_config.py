@@ -1,9 +1,10 @@
 # celery_config.py
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
 import os
 
+from app.database import EstatisticasPool, criar_engine
+
 # Carrega as variáveis de ambiente do arquivo .env
 load_dotenv()
 
@@ -14,6 +15,7 @@ DATABASE_URL_CELERY = os.getenv("DATABASE_URL_CELERY")
 if not DATABASE_URL_CELERY:
     raise ValueError("A variável de ambiente DATABASE_URL_CELERY não foi configurada no arquivo .env")
 
-# Cria a engine e a sessão do SQLAlchemy
-engine = create_engine(DATABASE_URL_CELERY)
-SessionLocalCelery = sessionmaker(autocommit=False, autoflush=False, bind=engine)
\ No newline at end of file
+# Cria a engine (mesma fábrica e configurações de pool da API) e a sessão do SQLAlchemy
+estatisticas_pool_celery = EstatisticasPool(nome="celery")
+engine = criar_engine(DATABASE_URL_CELERY, estatisticas_pool_celery)
+SessionLocalCelery = sessionmaker(autocommit=False, autoflush=False, bind=engine)
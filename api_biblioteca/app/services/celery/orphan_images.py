@@ -0,0 +1,183 @@
+"""-----------------------------------------------------------
+Limpeza incremental das imagens órfãs (sem livro ou usuário que as referencie).
+
+- Os arquivos são listados pelo backend de armazenamento (storage_backend: o diretório
+  upload ou um bucket S3, o mesmo do images_service), em ordem e em streaming: cada
+  execução processa no máximo ORPHAN_FILES_PER_RUN arquivos por categoria (as próximas
+  chaves depois do cursor), então a memória e a duração não crescem com o total. Os dois
+  layouts (<categoria>/<arquivo> e <categoria>/ab/cd/<arquivo>) entram na mesma listagem.
+- O cursor de cada categoria fica em upload/.meta/limpeza_orfas.json; a execução
+  seguinte continua de onde a anterior parou e, no fim da categoria, volta ao início.
+- As referências são consultadas no banco em lotes de ORPHAN_BATCH_SIZE nomes, por
+  igualdade com as URLs que o images_service gera (índices em image_url e
+  profile_picture_url), em vez de carregar todas as URLs na memória.
+- Arquivos modificados há menos de ORPHAN_GRACE_SECONDS nunca são apagados: um
+  upload recém-publicado (ou reaproveitado, que atualiza o mtime) pode ainda não ter
+  o commit que grava a URL.
+- No backend local, cada remoção é feita sob o lock de escrita do SQLite de referências
+  do images_service (upload/.meta/referencias.sqlite3), o mesmo que serializa o
+  reaproveitamento de um arquivo: o mtime conferido sob o lock não muda até a remoção, e a
+  contagem do arquivo sai junto com ele.
+-----------------------------------------------------------"""
+import hashlib
+import heapq
+import json
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+from sqlalchemy import select
+
+from app.models.book import Livro
+from app.models.user import Usuario
+from app.services.storage_backend import ArmazenamentoLocal
+
+load_dotenv()
+
+UPLOAD_DIR = "upload"
+# Prefixo das URLs geradas pelo images_service (resposta do /upload)
+IMAGES_FILES_BASE_URL = os.getenv("IMAGES_FILES_BASE_URL", "http://images_service:8000/files")
+ORPHAN_GRACE_SECONDS = int(os.getenv("ORPHAN_GRACE_SECONDS", "3600"))
+ORPHAN_BATCH_SIZE = int(os.getenv("ORPHAN_BATCH_SIZE", "1000"))
+ORPHAN_FILES_PER_RUN = int(os.getenv("ORPHAN_FILES_PER_RUN", "100000"))
+
+CAMINHO_CURSOR = os.path.join(UPLOAD_DIR, ".meta", "limpeza_orfas.json")
+EXTENSOES_ORIGINAIS = (".png", ".jpg", ".jpeg")
+HASH_HEX = re.compile(r"[0-9a-f]{64}")
+
+# Categoria (subdiretório do upload) -> coluna que referencia as imagens
+COLUNAS = {
+    "profile": Usuario.profile_picture_url,
+    "book_cover": Livro.image_url,
+}
+
+
+def nome_original(arquivo: str) -> str:
+    """Nome (sem extensão) da imagem original; as miniaturas do images_service são <nome>_<tamanho>.<formato>."""
+    return re.sub(r"_\d+$", "", os.path.splitext(arquivo)[0])
+
+
+def fragmento(nome: str) -> str:
+    """Subdiretórios do arquivo no images_service (`ab/cd`): o início do hash do conteúdo (ou do nome, nos nomes antigos)."""
+    raiz = nome_original(nome)
+    digest = raiz if HASH_HEX.fullmatch(raiz) else hashlib.sha256(raiz.encode()).hexdigest()
+    return f"{digest[:2]}/{digest[2:4]}"
+
+
+def ler_cursores() -> dict:
+    try:
+        with open(CAMINHO_CURSOR) as arquivo:
+            return json.load(arquivo)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def gravar_cursores(cursores: dict):
+    os.makedirs(os.path.dirname(CAMINHO_CURSOR), exist_ok=True)
+    temporario = f"{CAMINHO_CURSOR}.part"
+    with open(temporario, "w") as arquivo:
+        json.dump(cursores, arquivo)
+    os.replace(temporario, CAMINHO_CURSOR)
+
+
+def _arquivos(entradas, cursor: str = ""):
+    return (
+        entrada.name for entrada in entradas
+        if entrada.name > cursor and not entrada.name.startswith(".") and entrada.is_file(follow_symlinks=False)
+    )
+
+
+def proximos_nomes(diretorio: str, cursor: str, limite: int) -> list:
+    """Os `limite` menores nomes de arquivo depois do cursor (memória limitada a `limite` nomes)."""
+    with os.scandir(diretorio) as entradas:
+        return heapq.nsmallest(limite, _arquivos(entradas, cursor))
+
+
+def referencias_fora_do_padrao(session, categoria: str) -> set:
+    """Nomes referenciados por URLs em outro formato (normalmente nenhum), que a busca por igualdade não encontra."""
+    coluna = COLUNAS[categoria]
+    prefixo = f"{IMAGES_FILES_BASE_URL}/{categoria}/"
+    urls = session.execute(select(coluna).where(coluna.is_not(None), ~coluna.startswith(prefixo, autoescape=True)))
+    return {nome_original(os.path.basename(url)) for url in urls.scalars()}
+
+
+def referenciados(session, categoria: str, nomes: set) -> set:
+    """Quais dos nomes (sem extensão) estão em alguma URL da categoria, em qualquer layout; uma consulta por lote."""
+    if not nomes:
+        return set()
+    coluna = COLUNAS[categoria]
+    urls = [
+        f"{IMAGES_FILES_BASE_URL}/{categoria}/{diretorio}{nome}{extensao}"
+        for nome in nomes for extensao in EXTENSOES_ORIGINAIS for diretorio in ("", f"{fragmento(nome)}/")
+    ]
+    encontradas = session.execute(select(coluna).where(coluna.in_(urls)).distinct()).scalars()
+    return {nome_original(os.path.basename(url)) for url in encontradas}
+
+
+@contextmanager
+def transacao_referencias(arquivos):
+    """Transação com o lock de escrita no SQLite de referências do images_service (só no backend local).
+
+    Sem o banco (images_service ainda não rodou) ou com o S3, em que a contagem fica desligada, não há lock.
+    """
+    caminho = os.path.join(arquivos.diretorio, ".meta", "referencias.sqlite3") if isinstance(arquivos, ArmazenamentoLocal) else None
+    if caminho is None or not os.path.exists(caminho):
+        yield None
+        return
+    conn = sqlite3.connect(caminho, timeout=30, isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")  # O mesmo lock do reaproveitar/adicionar do images_service
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+
+def remover_se_antigo(arquivos, chave: str, limite_mtime: float) -> bool:
+    # O mtime é conferido logo antes de apagar: o arquivo pode ter sido reenviado durante a execução.
+    # No disco local, sob o lock, um reaproveitamento (que atualiza o mtime) não acontece no meio
+    try:
+        with transacao_referencias(arquivos) as conn:
+            objeto = arquivos.metadados(chave)
+            if objeto is None or objeto.mtime > limite_mtime:
+                return False
+            arquivos.remover(chave)
+            if conn is not None:
+                # Sem URL no banco, a contagem restante é de uploads cujo callback nunca gravou a URL
+                categoria, _, relativo = chave.partition("/")
+                conn.execute("DELETE FROM referencias WHERE chave = ?", (f"{categoria}/{relativo.rpartition('/')[2]}",))
+        return True
+    except Exception as e:  # OSError no disco local; sqlite3.Error no lock; erros do boto3 no S3
+        print(f"Erro ao remover {chave}: {e}")
+        return False
+
+
+def limpar_categoria(session, arquivos, categoria: str, cursor: str) -> tuple:
+    """Processa os próximos arquivos da categoria no backend `arquivos`; retorna (removidos, novo cursor).
+
+    O cursor é a última chave processada, relativa à categoria (`ab/cd/<arquivo>` ou `<arquivo>`).
+    """
+    prefixo = f"{categoria}/"
+    chaves = list(arquivos.listar(prefixo, prefixo + cursor if cursor else "", ORPHAN_FILES_PER_RUN))
+
+    fora_do_padrao = referencias_fora_do_padrao(session, categoria)
+    limite_mtime = time.time() - ORPHAN_GRACE_SECONDS
+    removidos = 0
+
+    for inicio in range(0, len(chaves), ORPHAN_BATCH_SIZE):
+        lote = chaves[inicio:inicio + ORPHAN_BATCH_SIZE]
+        nomes = {nome_original(chave.rpartition("/")[2]) for chave in lote}
+        usados = fora_do_padrao | referenciados(session, categoria, nomes - fora_do_padrao)
+        for chave in lote:
+            if nome_original(chave.rpartition("/")[2]) not in usados and remover_se_antigo(arquivos, chave, limite_mtime):
+                removidos += 1
+
+    # Lote incompleto: a categoria chegou ao fim e a próxima execução recomeça do início
+    return removidos, chaves[-1][len(prefixo):] if len(chaves) == ORPHAN_FILES_PER_RUN else ""
@@ -0,0 +1,27 @@
+"""-----------------------------------------------------------
+Consulta dos empréstimos vencidos usada pela tarefa verificar_emprestimos_vencidos.
+
+Fica fora do celery_app para que o harness de planos (benchmarks/query_plans.py) e os
+testes montem a mesma consulta sem importar a configuração do Celery.
+-----------------------------------------------------------"""
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+
+from app.models.loan import Emprestimo
+
+
+def consulta_emprestimos_vencidos(data_limite: datetime):
+    """Empréstimos ativos vencidos, com usuário e livro no mesmo SELECT (evita N+1 na notificação).
+
+    Usa o índice parcial ix_emprestimo_ativo_data_devolucao no Postgres.
+    """
+    return (
+        select(Emprestimo)
+        .options(joinedload(Emprestimo.usuario), joinedload(Emprestimo.livro))
+        .filter(
+            Emprestimo.status == "Ativo",  # Filtra empréstimos ativos
+            Emprestimo.data_devolucao < data_limite,  # Filtra empréstimos com mais de 7 dias
+        )
+    )
@@ -0,0 +1,222 @@
+"""-----------------------------------------------------------
+Compressão das respostas HTTP (gzip, Brotli e zstd).
+
+As listagens em JSON (catálogo, empréstimos, usuários) comprimem cerca de
+10x. O middleware escolhe a codificação pelo Accept-Encoding do cliente,
+respeitando a ordem de preferência de COMPRESSION_ENCODINGS, e só comprime
+tipos de conteúdo da lista permitida e corpos acima de COMPRESSION_MIN_SIZE.
+Respostas em streaming (StreamingResponse) são comprimidas pedaço a pedaço,
+com flush a cada pedaço para não atrasar a entrega ao cliente.
+
+Brotli e zstd dependem dos pacotes `brotli` e `zstandard`; sem eles, apenas
+o gzip é oferecido.
+-----------------------------------------------------------"""
+import os
+import time
+import zlib
+
+from dotenv import load_dotenv
+
+from app.services.metrics import BYTES_COMPRESSAO, DURACAO_COMPRESSAO
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depende do ambiente
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depende do ambiente
+    zstandard = None
+
+load_dotenv()
+
+COMPRESSION_ENCODINGS = [
+    codificacao.strip() for codificacao in os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",") if codificacao.strip()
+]
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))  # Bytes
+COMPRESSION_CONTENT_TYPES = [
+    tipo.strip() for tipo in os.getenv(
+        "COMPRESSION_CONTENT_TYPES", "application/json,text/,application/javascript,image/svg+xml"
+    ).split(",") if tipo.strip()
+]
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))  # 11 é lento demais para respostas dinâmicas
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+
+
+class _Gzip:
+    def __init__(self, nivel: int):
+        self._compressor = zlib.compressobj(nivel, zlib.DEFLATED, 31)  # wbits=31: cabeçalho gzip
+
+    def comprimir(self, dados: bytes) -> bytes:
+        return self._compressor.compress(dados) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finalizar(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    def __init__(self, qualidade: int):
+        self._compressor = brotli.Compressor(quality=qualidade)
+
+    def comprimir(self, dados: bytes) -> bytes:
+        return self._compressor.process(dados) + self._compressor.flush()
+
+    def finalizar(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _Zstd:
+    def __init__(self, nivel: int):
+        self._compressor = zstandard.ZstdCompressor(level=nivel).compressobj()
+
+    def comprimir(self, dados: bytes) -> bytes:
+        return self._compressor.compress(dados) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finalizar(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+def codificacoes_disponiveis(preferencia: list) -> list:
+    """Codificações configuradas cujas bibliotecas estão instaladas, na ordem de preferência."""
+    instaladas = {"gzip": True, "br": brotli is not None, "zstd": zstandard is not None}
+    return [codificacao for codificacao in preferencia if instaladas.get(codificacao)]
+
+
+def negociar_codificacao(accept_encoding: str, disponiveis: list):
+    """Escolhe a codificação preferida pelo servidor entre as aceitas pelo cliente (q > 0)."""
+    aceitas = {}
+    for item in accept_encoding.lower().split(","):
+        nome, _, parametros = item.strip().partition(";")
+        qualidade = 1.0
+        if parametros.strip().startswith("q="):
+            try:
+                qualidade = float(parametros.strip()[2:])
+            except ValueError:
+                qualidade = 0.0
+        if nome:
+            aceitas[nome.strip()] = qualidade
+
+    for codificacao in disponiveis:
+        if aceitas.get(codificacao, aceitas.get("*", 0.0)) > 0:
+            return codificacao
+    return None
+
+
+class CompressaoMiddleware:
+    """Middleware ASGI de compressão com suporte a respostas em streaming."""
+
+    def __init__(
+        self,
+        app,
+        codificacoes: list = None,
+        tamanho_minimo: int = COMPRESSION_MIN_SIZE,
+        tipos_conteudo: list = None,
+    ):
+        self.app = app
+        self.codificacoes = codificacoes_disponiveis(codificacoes or COMPRESSION_ENCODINGS)
+        self.tamanho_minimo = tamanho_minimo
+        self.tipos_conteudo = tuple(tipos_conteudo or COMPRESSION_CONTENT_TYPES)
+
+    def _novo_compressor(self, codificacao: str):
+        if codificacao == "br":
+            return _Brotli(COMPRESSION_BROTLI_QUALITY)
+        if codificacao == "zstd":
+            return _Zstd(COMPRESSION_ZSTD_LEVEL)
+        return _Gzip(COMPRESSION_GZIP_LEVEL)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        cabecalhos = dict(scope["headers"])
+        codificacao = negociar_codificacao(cabecalhos.get(b"accept-encoding", b"").decode("latin-1"), self.codificacoes)
+        if codificacao is None:
+            await self.app(scope, receive, send)
+            return
+
+        inicio_resposta = None
+        compressor = None
+        passar_direto = False
+        bytes_originais = 0
+        bytes_comprimidos = 0
+        tempo_compressao = 0.0
+
+        def comprimir(funcao, *args) -> bytes:
+            nonlocal tempo_compressao
+            inicio = time.perf_counter()
+            resultado = funcao(*args)
+            tempo_compressao += time.perf_counter() - inicio
+            return resultado
+
+        async def send_comprimindo(message):
+            nonlocal inicio_resposta, compressor, passar_direto, bytes_originais, bytes_comprimidos
+
+            if message["type"] == "http.response.start":
+                inicio_resposta = message
+                cabecalhos_resposta = dict(message.get("headers", []))
+                tipo = cabecalhos_resposta.get(b"content-type", b"").decode("latin-1")
+                tamanho = cabecalhos_resposta.get(b"content-length")
+                passar_direto = (
+                    b"content-encoding" in cabecalhos_resposta
+                    or not tipo.startswith(self.tipos_conteudo)
+                    or (tamanho is not None and int(tamanho) < self.tamanho_minimo)
+                )
+                if passar_direto:
+                    await send(message)
+                    inicio_resposta = None
+                return
+
+            if message["type"] != "http.response.body" or passar_direto:
+                await send(message)
+                return
+
+            corpo = message.get("body", b"")
+            mais_corpo = message.get("more_body", False)
+
+            if inicio_resposta is not None:
+                # Primeiro pedaço do corpo: decide se comprime
+                if not mais_corpo and len(corpo) < self.tamanho_minimo:
+                    passar_direto = True
+                    await send(inicio_resposta)
+                    await send(message)
+                    return
+
+                compressor = self._novo_compressor(codificacao)
+                cabecalhos_resposta = [
+                    (nome, valor) for nome, valor in inicio_resposta.get("headers", [])
+                    if nome.lower() not in (b"content-length", b"vary")
+                ]
+                vary = [valor for nome, valor in inicio_resposta.get("headers", []) if nome.lower() == b"vary"]
+                cabecalhos_resposta.append((b"content-encoding", codificacao.encode()))
+                cabecalhos_resposta.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+
+                if not mais_corpo:
+                    # Resposta completa: comprime de uma vez e informa o tamanho final
+                    comprimido = comprimir(lambda: compressor.comprimir(corpo) + compressor.finalizar())
+                    cabecalhos_resposta.append((b"content-length", str(len(comprimido)).encode()))
+                    await send({**inicio_resposta, "headers": cabecalhos_resposta})
+                    inicio_resposta = None
+                    bytes_originais, bytes_comprimidos = len(corpo), len(comprimido)
+                    await send({"type": "http.response.body", "body": comprimido, "more_body": False})
+                    return
+
+                await send({**inicio_resposta, "headers": cabecalhos_resposta})
+                inicio_resposta = None
+
+            # Streaming: comprime cada pedaço e finaliza no último
+            comprimido = comprimir(compressor.comprimir, corpo) if corpo else b""
+            if not mais_corpo:
+                comprimido += comprimir(compressor.finalizar)
+            bytes_originais += len(corpo)
+            bytes_comprimidos += len(comprimido)
+            await send({"type": "http.response.body", "body": comprimido, "more_body": mais_corpo})
+
+        await self.app(scope, receive, send_comprimindo)
+
+        if compressor is not None:
+            DURACAO_COMPRESSAO.labels(codificacao).observe(tempo_compressao)
+            BYTES_COMPRESSAO.labels(codificacao, "original").inc(bytes_originais)
+            BYTES_COMPRESSAO.labels(codificacao, "comprimido").inc(bytes_comprimidos)
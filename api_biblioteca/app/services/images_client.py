@@ -0,0 +1,144 @@
+"""-----------------------------------------------------------
+Cliente HTTP compartilhado para as chamadas ao images_service.
+
+Um único httpx.AsyncClient por worker, criado no lifespan, mantém as conexões
+abertas (keep-alive) entre uploads, com limites de conexões e timeouts
+configuráveis. O corpo multipart é montado em streaming a partir do UploadFile
+recebido, sem carregar o arquivo inteiro na memória, e leva o SHA-256 do
+conteúdo: se o images_service já tem o arquivo, responde sem processar o corpo.
+Cada chamada registra a latência e se a conexão foi reaproveitada ou aberta do zero.
+-----------------------------------------------------------"""
+import hashlib
+import os
+import time
+import uuid
+from urllib.parse import urlsplit
+
+import httpx
+from dotenv import load_dotenv
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+from app.services.metrics import CONEXOES_IMAGES_SERVICE, DURACAO_IMAGES_SERVICE
+
+load_dotenv()
+
+# Endereço do serviço de imagens (nome do serviço definido no docker-compose)
+IMAGES_SERVICE_URL = os.getenv("IMAGES_SERVICE_URL", "http://images_service:8000")
+API_KEY = os.getenv("API_KEY", "CHAVE_SECRETA_PADRAO")
+
+IMAGES_SERVICE_MAX_CONNECTIONS = int(os.getenv("IMAGES_SERVICE_MAX_CONNECTIONS", "20"))
+IMAGES_SERVICE_MAX_KEEPALIVE = int(os.getenv("IMAGES_SERVICE_MAX_KEEPALIVE", "10"))
+# Menor que o keep-alive do uvicorn no images_service, para o servidor não fechar a conexão antes
+IMAGES_SERVICE_KEEPALIVE_SECONDS = float(os.getenv("IMAGES_SERVICE_KEEPALIVE_SECONDS", "60"))
+IMAGES_SERVICE_CONNECT_TIMEOUT = float(os.getenv("IMAGES_SERVICE_CONNECT_TIMEOUT", "2"))
+IMAGES_SERVICE_TIMEOUT = float(os.getenv("IMAGES_SERVICE_TIMEOUT", "30"))
+IMAGES_SERVICE_POOL_TIMEOUT = float(os.getenv("IMAGES_SERVICE_POOL_TIMEOUT", "5"))
+
+TAMANHO_BLOCO = 64 * 1024
+
+
+def corpo_multipart(file: UploadFile, boundary: str, campo: str = "file") -> tuple:
+    """Gerador assíncrono do corpo multipart e o tamanho total (None quando o tamanho do arquivo é desconhecido)."""
+    nome = (file.filename or "arquivo").replace("\\", "\\\\").replace('"', "%22")
+    inicio = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{campo}"; filename="{nome}"\r\n'
+        f"Content-Type: {file.content_type or 'application/octet-stream'}\r\n\r\n"
+    ).encode()
+    fim = f"\r\n--{boundary}--\r\n".encode()
+
+    async def gerar():
+        yield inicio
+        await file.seek(0)
+        while bloco := await file.read(TAMANHO_BLOCO):  # Lê do disco em uma thread quando o arquivo é grande
+            yield bloco
+        yield fim
+
+    tamanho = len(inicio) + file.size + len(fim) if file.size is not None else None
+    return gerar(), tamanho
+
+
+def sha256_arquivo(file: UploadFile) -> str:
+    """SHA-256 do conteúdo (lido em blocos; executado em uma thread)."""
+    sha256 = hashlib.sha256()
+    file.file.seek(0)
+    while bloco := file.file.read(TAMANHO_BLOCO):
+        sha256.update(bloco)
+    file.file.seek(0)
+    return sha256.hexdigest()
+
+
+class ClienteImagens:
+    """Pool de conexões com o images_service, aberto e fechado pelo lifespan do worker."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport = None):
+        self._client = None
+        self._transport = transport
+
+    def _criar(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=IMAGES_SERVICE_URL,
+            limits=httpx.Limits(
+                max_connections=IMAGES_SERVICE_MAX_CONNECTIONS,
+                max_keepalive_connections=IMAGES_SERVICE_MAX_KEEPALIVE,
+                keepalive_expiry=IMAGES_SERVICE_KEEPALIVE_SECONDS,
+            ),
+            timeout=httpx.Timeout(
+                IMAGES_SERVICE_TIMEOUT, connect=IMAGES_SERVICE_CONNECT_TIMEOUT, pool=IMAGES_SERVICE_POOL_TIMEOUT
+            ),
+            headers={"X-API-KEY": API_KEY},
+            transport=self._transport,
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Criado sob demanda quando o lifespan não rodou (ex.: testes com ASGITransport)
+        if self._client is None:
+            self._client = self._criar()
+        return self._client
+
+    async def iniciar(self):
+        self.client
+
+    async def encerrar(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def enviar(self, file: UploadFile, image_category: str) -> httpx.Response:
+        """Envia o arquivo ao /upload do images_service em streaming."""
+        boundary = uuid.uuid4().hex
+        corpo, tamanho = corpo_multipart(file, boundary)
+        headers = {
+            "Content-Type": f"multipart/form-data; boundary={boundary}",
+            "image-category": image_category,
+            "X-Content-SHA256": await run_in_threadpool(sha256_arquivo, file),
+        }
+        if tamanho is not None:
+            headers["Content-Length"] = str(tamanho)  # Permite ao images_service recusar arquivos grandes sem ler o corpo
+
+        conexao_nova = False
+
+        async def rastrear(evento: str, info: dict):
+            nonlocal conexao_nova
+            if evento == "connection.connect_tcp.started":
+                conexao_nova = True
+
+        inicio = time.perf_counter()
+        status_code = "erro"
+        try:
+            response = await self.client.post(
+                "/upload", content=corpo, headers=headers, extensions={"trace": rastrear}
+            )
+            status_code = response.status_code
+            CONEXOES_IMAGES_SERVICE.labels("false" if conexao_nova else "true").inc()
+        finally:
+            DURACAO_IMAGES_SERVICE.labels(image_category, status_code).observe(time.perf_counter() - inicio)
+        return response
+
+    async def liberar(self, file_url: str) -> httpx.Response:
+        """Libera a referência a uma imagem que deixou de ser usada (apagada na última referência)."""
+        return await self.client.delete(urlsplit(file_url).path)
+
+
+cliente_imagens = ClienteImagens()
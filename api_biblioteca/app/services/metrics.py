@@ -0,0 +1,161 @@
+"""-----------------------------------------------------------
+Métricas Prometheus da API, do pool do banco e do Celery.
+
+As métricas são expostas em /metrics (API) e, no worker do Celery, em um
+servidor HTTP próprio na porta CELERY_METRICS_PORT. Com vários processos
+(workers do uvicorn ou prefork do Celery), defina PROMETHEUS_MULTIPROC_DIR
+para que as métricas de todos os processos sejam agregadas.
+-----------------------------------------------------------"""
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from dotenv import load_dotenv
+
+from app.services.query_counter import DB_N_PLUS_ONE_THRESHOLD, avisar_n_mais_um, encerrar_contagem, iniciar_contagem
+
+load_dotenv()
+
+# Conta os comandos SQL de cada requisição (histograma db_queries_per_request). Com false e
+# DB_N_PLUS_ONE_THRESHOLD=0 o middleware nem ativa o contador de consultas.
+METRICS_DB_QUERIES = os.getenv("METRICS_DB_QUERIES", "true").lower() == "true"
+
+# Buckets menores que o padrão: a maior parte das rotas responde em poucos milissegundos
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+DURACAO_REQUISICAO = Histogram(
+    "http_request_duration_seconds", "Latência das requisições HTTP", ["method", "route"], buckets=BUCKETS_LATENCIA
+)
+REQUISICOES = Counter("http_requests_total", "Requisições HTTP por status", ["method", "route", "status"])
+REQUISICOES_EM_ANDAMENTO = Gauge(
+    "http_requests_in_progress", "Requisições HTTP em andamento", ["method"], multiprocess_mode="livesum"
+)
+CONSULTAS_POR_REQUISICAO = Histogram(
+    "db_queries_per_request", "Comandos SQL executados por requisição", ["route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+
+DURACAO_COMPRESSAO = Histogram(
+    "http_response_compression_seconds", "Tempo de CPU gasto comprimindo cada resposta", ["encoding"],
+    buckets=(0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1),
+)
+BYTES_COMPRESSAO = Counter(
+    "http_response_compression_bytes_total", "Bytes das respostas antes e depois da compressão", ["encoding", "stage"]
+)
+
+ESPERA_POOL = Histogram(
+    "db_pool_checkout_wait_seconds", "Tempo para obter uma conexão do pool", ["pool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+CONEXOES_EM_USO = Gauge("db_pool_checked_out", "Conexões em uso", ["pool"], multiprocess_mode="livesum")
+CONEXOES_OVERFLOW = Gauge("db_pool_overflow", "Conexões além do tamanho do pool", ["pool"], multiprocess_mode="livesum")
+
+DURACAO_IMAGES_SERVICE = Histogram(
+    "images_service_request_duration_seconds", "Latência das chamadas ao images_service", ["category", "status"],
+    buckets=BUCKETS_LATENCIA,
+)
+CONEXOES_IMAGES_SERVICE = Counter(
+    "images_service_connections_total", "Chamadas ao images_service por conexão reaproveitada ou nova", ["reused"]
+)
+
+DURACAO_TAREFA = Histogram(
+    "celery_task_duration_seconds", "Duração das tarefas do Celery", ["task", "state"],
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600),
+)
+FALHAS_TAREFA = Counter("celery_task_failures_total", "Tarefas do Celery que falharam", ["task"])
+CONSULTAS_POR_TAREFA = Histogram(
+    "db_queries_per_task", "Comandos SQL executados por tarefa do Celery", ["task"],
+    buckets=(0, 1, 2, 5, 10, 50, 100, 500, 1000, 5000),
+)
+
+
+class MetricasMiddleware:
+    """Middleware ASGI que mede latência, status e consultas SQL por rota.
+
+    As métricas filhas (por método, rota e status) são resolvidas uma vez e guardadas:
+    cada `labels()` do prometheus_client custa um lock e a montagem da chave.
+    """
+
+    def __init__(self, app, ignorar: tuple = ("/metrics",), contar_consultas: bool = None):
+        self.app = app
+        self.ignorar = ignorar
+        if contar_consultas is None:
+            contar_consultas = METRICS_DB_QUERIES or bool(DB_N_PLUS_ONE_THRESHOLD)
+        self.contar_consultas = contar_consultas
+        self._em_andamento = {}  # método -> gauge
+        self._por_rota = {}  # (método, rota) -> (histograma de latência, histograma de consultas)
+        self._por_status = {}  # (método, rota, status) -> contador
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.ignorar:
+            await self.app(scope, receive, send)
+            return
+
+        metodo = scope["method"]
+        status_code = 500
+        if self.contar_consultas:
+            contador, token = iniciar_contagem(scope)
+
+        async def send_com_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        em_andamento = self._em_andamento.get(metodo)
+        if em_andamento is None:
+            em_andamento = self._em_andamento[metodo] = REQUISICOES_EM_ANDAMENTO.labels(metodo)
+        em_andamento.inc()
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_com_status)
+        finally:
+            duracao = time.perf_counter() - inicio
+            em_andamento.dec()
+            # Usa o template da rota (ex.: /livros/{livro_id}) para limitar a cardinalidade
+            rota = getattr(scope.get("route"), "path", "nao_encontrada")
+            filhos = self._por_rota.get((metodo, rota))
+            if filhos is None:
+                filhos = self._por_rota[(metodo, rota)] = (
+                    DURACAO_REQUISICAO.labels(metodo, rota), CONSULTAS_POR_REQUISICAO.labels(rota)
+                )
+            filhos[0].observe(duracao)
+            requisicoes = self._por_status.get((metodo, rota, status_code))
+            if requisicoes is None:
+                requisicoes = self._por_status[(metodo, rota, status_code)] = REQUISICOES.labels(metodo, rota, status_code)
+            requisicoes.inc()
+            if self.contar_consultas:
+                encerrar_contagem(token)
+                filhos[1].observe(contador.comandos)
+                avisar_n_mais_um(contador, f"{metodo} {rota}")
+
+
+def registry_coleta():
+    """Registry usado na exposição: agrega os processos quando PROMETHEUS_MULTIPROC_DIR está definido."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def descartar_metricas_processo(pid: int = None):
+    """Remove os gauges "live" de um processo que terminou (worker reciclado, reiniciado pelo SIGHUP
+    ou filho do prefork); sem isso as somas de requisições e conexões em uso continuam contando-o."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+
+def gerar_metricas() -> tuple:
+    """Conteúdo e content-type da resposta de /metrics."""
+    return generate_latest(registry_coleta()), CONTENT_TYPE_LATEST
@@ -0,0 +1,99 @@
+"""-----------------------------------------------------------
+Contagem de comandos SQL por requisição e por tarefa.
+
+Um listener do SQLAlchemy registra cada execução no cursor em todos os
+contadores ativos no contexto atual (requisição, tarefa do Celery ou bloco
+de teste). Comandos SELECT idênticos repetidos muitas vezes na mesma unidade
+de trabalho indicam um padrão N+1 (ex.: lazy load de uma relação por linha).
+-----------------------------------------------------------"""
+import os
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+load_dotenv()
+
+# Quantas repetições do mesmo SELECT geram um aviso de N+1 (0 = desativado)
+DB_N_PLUS_ONE_THRESHOLD = int(os.getenv("DB_N_PLUS_ONE_THRESHOLD", "0"))
+
+
+class ContadorConsultas:
+    """Comandos SQL e idas ao banco de uma unidade de trabalho."""
+
+    def __init__(self, origem=None):
+        self.origem = origem  # Escopo ASGI da requisição ou nome da tarefa
+        self.comandos = 0  # Comandos executados (executemany conta cada conjunto de parâmetros)
+        self.idas_ao_banco = 0  # Execuções no cursor
+        self.por_sql = Counter()
+
+    def registrar(self, statement: str, parameters, executemany: bool):
+        self.idas_ao_banco += 1
+        self.comandos += len(parameters) if executemany and parameters else 1
+        self.por_sql[statement] += 1
+
+    def repetidas(self, limiar: int) -> dict:
+        """SELECTs executados pelo menos `limiar` vezes (suspeitos de N+1)."""
+        return {
+            sql: total for sql, total in self.por_sql.items()
+            if total >= limiar and sql.lstrip().upper().startswith("SELECT")
+        }
+
+    def resumo(self) -> str:
+        linhas = [f"{self.comandos} comandos em {self.idas_ao_banco} idas ao banco:"]
+        linhas += [f"  {total}x {' '.join(sql.split())[:200]}" for sql, total in self.por_sql.most_common()]
+        return "\n".join(linhas)
+
+
+_contadores_ativos: ContextVar = ContextVar("contadores_consultas", default=())
+
+
+def iniciar_contagem(origem=None):
+    """Ativa um novo contador no contexto atual; retorna (contador, token)."""
+    contador = ContadorConsultas(origem)
+    token = _contadores_ativos.set(_contadores_ativos.get() + (contador,))
+    return contador, token
+
+
+def encerrar_contagem(token):
+    _contadores_ativos.reset(token)
+
+
+def origem_atual() -> str:
+    """Descrição da requisição (método e rota) ou tarefa em que o comando SQL está sendo executado."""
+    for contador in reversed(_contadores_ativos.get()):
+        origem = contador.origem
+        if isinstance(origem, dict):
+            rota = getattr(origem.get("route"), "path", origem.get("path"))
+            return f"{origem.get('method')} {rota}"
+        if origem:
+            return origem
+    return "desconhecida"
+
+
+@contextmanager
+def contar_consultas():
+    """Conta os comandos SQL executados dentro do bloco (contadores podem ser aninhados)."""
+    contador, token = iniciar_contagem()
+    try:
+        yield contador
+    finally:
+        encerrar_contagem(token)
+
+
+def avisar_n_mais_um(contador: ContadorConsultas, origem: str, limiar: int = None):
+    """Loga os SELECTs repetidos acima do limiar configurado."""
+    limiar = DB_N_PLUS_ONE_THRESHOLD if limiar is None else limiar
+    if not limiar:
+        return
+    for sql, total in contador.repetidas(limiar).items():
+        print(f"Possível N+1 em {origem}: {total}x {' '.join(sql.split())[:200]}")
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _contar_consulta(conn, cursor, statement, parameters, context, executemany):
+    for contador in _contadores_ativos.get():
+        contador.registrar(statement, parameters, executemany)
@@ -0,0 +1,180 @@
+"""-----------------------------------------------------------
+Limitação de tentativas de login.
+
+Cada tentativa em /auth/token custa uma verificação bcrypt, portanto um
+ataque de credential stuffing consegue saturar a CPU da API. O limitador
+usa uma janela deslizante por IP do cliente (todas as tentativas) e por
+conta (só as tentativas com senha errada, para que o próprio usuário não
+se bloqueie), guardada no Redis quando REDIS_URL está configurada ou em
+memória (por processo) caso contrário.
+-----------------------------------------------------------"""
+import logging
+import math
+import os
+import time
+import uuid
+from collections import deque
+from typing import Annotated
+
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordRequestForm
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+# Número máximo de tentativas dentro da janela (falhas por conta, tentativas por IP)
+LOGIN_RATE_LIMIT_ACCOUNT = int(os.getenv("LOGIN_RATE_LIMIT_ACCOUNT", "5"))
+LOGIN_RATE_LIMIT_IP = int(os.getenv("LOGIN_RATE_LIMIT_IP", "20"))
+LOGIN_RATE_LIMIT_WINDOW_SECONDS = int(os.getenv("LOGIN_RATE_LIMIT_WINDOW_SECONDS", "60"))
+
+
+class JanelaDeslizanteMemoria:
+    """Janela deslizante em memória, usada quando não há Redis configurado."""
+
+    # Acima desse número de chaves, as janelas já expiradas são descartadas
+    MAX_CHAVES = 10_000
+
+    def __init__(self):
+        self._tentativas: dict[str, deque] = {}
+
+    async def registrar(self, chave: str, limite: int, janela: int, contar: bool = True) -> int:
+        """Registra uma tentativa e retorna os segundos de espera (0 se permitida).
+
+        Com `contar=False` só consulta a janela, sem registrar a tentativa.
+        """
+        agora = time.monotonic()
+        tentativas = self._janela(chave, janela, agora)
+        if len(tentativas) >= limite:
+            return max(1, math.ceil(tentativas[0] + janela - agora))
+
+        if contar:
+            tentativas.append(agora)
+        return 0
+
+    async def adicionar(self, chave: str, janela: int):
+        """Registra uma tentativa sem verificar o limite."""
+        agora = time.monotonic()
+        self._janela(chave, janela, agora).append(agora)
+
+    def _janela(self, chave: str, janela: int, agora: float) -> deque:
+        if len(self._tentativas) > self.MAX_CHAVES:
+            self._tentativas = {
+                k: v for k, v in self._tentativas.items() if v and v[-1] > agora - janela
+            }
+        tentativas = self._tentativas.setdefault(chave, deque())
+        while tentativas and tentativas[0] <= agora - janela:
+            tentativas.popleft()
+        return tentativas
+
+    def limpar(self):
+        self._tentativas.clear()
+
+
+class JanelaDeslizanteRedis:
+    """Janela deslizante compartilhada entre workers, usando um sorted set por chave."""
+
+    # Verificação e registro em um único script: tentativas simultâneas não passam
+    # todas pela verificação antes de qualquer uma ser registrada. Retorna o score da
+    # tentativa mais antiga quando o limite foi atingido (nil se permitida).
+    SCRIPT_REGISTRAR = """
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, tonumber(ARGV[1]) - tonumber(ARGV[2]))
+    if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[3]) then
+        return redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')[2]
+    end
+    if ARGV[4] ~= '' then
+        redis.call('ZADD', KEYS[1], ARGV[1], ARGV[4])
+        redis.call('EXPIRE', KEYS[1], ARGV[2])
+    end
+    return false
+    """
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self._script_registrar = self._redis.register_script(self.SCRIPT_REGISTRAR)
+        self._erros_redis = (redis.RedisError, OSError)
+
+    async def registrar(self, chave: str, limite: int, janela: int, contar: bool = True) -> int:
+        try:
+            return await self._registrar(chave, limite, janela, contar)
+        except self._erros_redis:
+            # Se o Redis estiver indisponível o login não deve ficar fora do ar
+            logger.exception("Limitador de login indisponível")
+            return 0
+
+    async def adicionar(self, chave: str, janela: int):
+        try:
+            async with self._redis.pipeline(transaction=True) as pipe:
+                pipe.zadd(chave, {uuid.uuid4().hex: time.time()})
+                pipe.expire(chave, janela)
+                await pipe.execute()
+        except self._erros_redis:
+            logger.exception("Limitador de login indisponível")
+
+    async def _registrar(self, chave: str, limite: int, janela: int, contar: bool) -> int:
+        agora = time.time()
+        membro = uuid.uuid4().hex if contar else ""
+        mais_antiga = await self._script_registrar(keys=[chave], args=[agora, janela, limite, membro])
+        if mais_antiga is None:
+            return 0
+        return max(1, math.ceil(float(mais_antiga) + janela - agora))
+
+    def limpar(self):
+        pass
+
+
+class LimitadorLogin:
+    """Aplica os limites de tentativas de login por conta e por IP."""
+
+    def __init__(self, backend, limite_conta: int, limite_ip: int, janela: int):
+        self.backend = backend
+        self.limite_conta = limite_conta
+        self.limite_ip = limite_ip
+        self.janela = janela
+
+    async def verificar(self, email: str, ip: str) -> int:
+        """Retorna os segundos até a próxima tentativa permitida (0 se permitida).
+
+        Conta a tentativa no IP; a conta só é consultada (as falhas entram por registrar_falha).
+        """
+        espera_ip = await self.backend.registrar(f"login:ip:{ip}", self.limite_ip, self.janela)
+        if espera_ip:
+            return espera_ip
+        return await self.backend.registrar(self._chave_conta(email), self.limite_conta, self.janela, contar=False)
+
+    async def registrar_falha(self, email: str):
+        """Conta uma tentativa com senha errada para a conta."""
+        await self.backend.adicionar(self._chave_conta(email), self.janela)
+
+    @staticmethod
+    def _chave_conta(email: str) -> str:
+        return f"login:conta:{email.lower()}"
+
+
+limitador_login = LimitadorLogin(
+    JanelaDeslizanteRedis(REDIS_URL) if REDIS_URL else JanelaDeslizanteMemoria(),
+    limite_conta=LOGIN_RATE_LIMIT_ACCOUNT,
+    limite_ip=LOGIN_RATE_LIMIT_IP,
+    janela=LOGIN_RATE_LIMIT_WINDOW_SECONDS,
+)
+
+
+async def limitar_tentativas_login(
+    request: Request,
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
+):
+    """Dependência que rejeita o login com 429 antes de qualquer verificação bcrypt."""
+    ip = request.client.host if request.client else "desconhecido"
+    espera = await limitador_login.verificar(form_data.username, ip)
+    if espera:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Muitas tentativas de login. Tente novamente mais tarde.",
+            headers={"Retry-After": str(espera)},
+        )
+    return form_data
@@ -0,0 +1,35 @@
+"""
+Este script mede o tempo de hash do bcrypt no hardware atual e sugere o valor de BCRYPT_ROUNDS
+que respeita o orçamento de latência informado (em milissegundos).
+
+Uso:
+    python -m app.services.scripts.calibrate_bcrypt --alvo-ms 250
+"""
+
+import argparse
+import time
+
+from passlib.context import CryptContext
+
+from app.services.security import calibrar_custo_bcrypt
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibra o custo do bcrypt para um orçamento de latência.")
+    parser.add_argument("--alvo-ms", type=float, default=250, help="Tempo máximo desejado por hash (ms)")
+    args = parser.parse_args()
+
+    rounds = calibrar_custo_bcrypt(args.alvo_ms)
+
+    # Confirma a medição com o custo escolhido
+    contexto = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+    inicio = time.perf_counter()
+    contexto.hash("calibracao-bcrypt")
+    duracao_ms = (time.perf_counter() - inicio) * 1000
+
+    print(f"----> Custo sugerido: {rounds} ({duracao_ms:.0f} ms por hash, alvo de {args.alvo_ms:.0f} ms)")
+    print(f"Defina BCRYPT_ROUNDS={rounds} no .env (ou BCRYPT_TARGET_MS={args.alvo_ms:.0f} para calibrar na inicialização).")
+
+
+if __name__ == "__main__":
+    main()
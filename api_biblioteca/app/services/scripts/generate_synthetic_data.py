@@ -0,0 +1,343 @@
+"""
+Este script gera uma massa de dados sintética de alto volume (livros, usuários e empréstimos)
+para testar índices, paginação e as tarefas do Celery em escala de produção.
+
+As distribuições são geradas com NumPy a partir de uma semente e os dados são carregados com
+COPY do Postgres:
+- a popularidade dos livros e a atividade dos usuários seguem leis de potência (Zipf), então
+  poucos livros e poucos leitores concentram boa parte dos empréstimos;
+- gêneros com pesos desiguais, ano de publicação concentrado nas últimas décadas e número de
+  páginas log-normal;
+- empréstimos espalhados pelo período (--anos), mais frequentes nos meses recentes: a maior
+  parte já devolvida, os recentes ativos e uma fração ativa com prazo vencido (trabalho para a
+  tarefa verificar_emprestimos_vencidos).
+
+Os empréstimos (a tabela grande) são codificados direto no formato binário do COPY a partir de
+arrays NumPy, sem criar um objeto Python por linha, e os índices secundários da tabela são
+removidos durante a carga e recriados no final.
+
+Mesma semente, mesma data de referência e mesmo tamanho de lote geram os mesmos dados. Os
+registros são acrescentados aos existentes; use um banco dedicado.
+
+Uso:
+    python -m app.services.scripts.generate_synthetic_data --usuarios 1000000 --livros 500000 --emprestimos 10000000
+    python -m app.services.scripts.generate_synthetic_data --url postgresql+asyncpg://... --semente 7 --data-referencia 2025-01-01
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import time
+from datetime import date, datetime
+from functools import partial
+
+import asyncpg
+import numpy as np
+from passlib.context import CryptContext
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import make_url
+from sqlalchemy.schema import CreateIndex, DropIndex
+
+from app.models.__all_models import Emprestimo
+
+GENEROS = np.array([
+    "Romance", "Fantasia", "Ficção Científica", "Suspense", "Terror", "Biografia", "História",
+    "Autoajuda", "Poesia", "Infantil", "Negócios", "Filosofia",
+])
+PESOS_GENEROS = np.array([18, 14, 10, 12, 6, 7, 8, 9, 3, 6, 5, 2], dtype=float)
+PALAVRAS = np.array([
+    "sombra", "vento", "cidade", "mar", "noite", "jardim", "fogo", "estrela", "rio", "montanha",
+    "segredo", "viagem", "memória", "silêncio", "tempo", "casa", "guerra", "sonho", "lua", "caminho",
+    "último", "perdido", "eterno", "azul", "secreto", "distante", "antigo", "livro", "voz", "ilha",
+])
+NOMES = np.array([
+    "Ana", "Bruno", "Carla", "Daniel", "Eduarda", "Felipe", "Gabriela", "Henrique", "Isabela", "João",
+    "Larissa", "Marcos", "Natália", "Otávio", "Paula", "Rafael", "Sofia", "Thiago", "Valéria", "Yuri",
+])
+SOBRENOMES = np.array([
+    "Silva", "Santos", "Oliveira", "Souza", "Lima", "Pereira", "Costa", "Ferreira", "Almeida", "Ribeiro",
+    "Carvalho", "Gomes", "Martins", "Rocha", "Barbosa", "Moreira", "Cardoso", "Teixeira", "Mendes", "Nunes",
+])
+
+STATUS = np.array([b"Ativo", b"Devolvido", b"Atrasado"])
+ATIVO, DEVOLVIDO, ATRASADO = range(3)
+
+EPOCA_POSTGRES = np.datetime64("2000-01-01T00:00:00", "us")  # Origem dos timestamps no COPY binário
+MICROS_POR_DIA = 86_400_000_000
+PRAZO_DIAS = 7
+
+
+def cdf_zipf(total: int, expoente: float, rng: np.random.Generator) -> np.ndarray:
+    """Distribuição acumulada de Zipf sobre `total` itens, com os ranks embaralhados.
+
+    O embaralhamento evita que a popularidade acompanhe a ordem dos ids.
+    """
+    pesos = 1.0 / np.arange(1, total + 1, dtype=float) ** expoente
+    cdf = np.cumsum(rng.permutation(pesos))
+    return cdf / cdf[-1]
+
+
+def amostrar(cdf: np.ndarray, tamanho: int, rng: np.random.Generator) -> np.ndarray:
+    """Índices sorteados segundo a distribuição acumulada (busca binária, sem recalcular pesos)."""
+    return np.minimum(np.searchsorted(cdf, rng.random(tamanho), side="right"), len(cdf) - 1)
+
+
+def gerar_livros(rng: np.random.Generator, primeiro_id: int, total: int, criado_em: datetime) -> list:
+    """Registros de livro na ordem de COLUNAS_LIVRO."""
+    palavras = PALAVRAS[rng.integers(0, len(PALAVRAS), size=(total, 4))]
+    tamanhos = rng.integers(2, 5, size=total)
+    generos = GENEROS[rng.choice(len(GENEROS), size=total, p=PESOS_GENEROS / PESOS_GENEROS.sum())]
+    autores = rng.zipf(1.6, size=total) % max(total // 8, 1)  # Poucos autores com muitos livros
+    anos = np.clip(np.rint(rng.normal(2000, 18, size=total)), 1850, 2025).astype(int)
+    paginas = np.clip(np.rint(rng.lognormal(5.6, 0.45, size=total)), 40, 2000).astype(int)
+    quantidades = rng.poisson(3, size=total) + 1
+    editoras = rng.integers(1, 200, size=total)
+
+    return [
+        (
+            primeiro_id + i,
+            " ".join(palavras[i, :tamanhos[i]]).capitalize(),
+            f"Autor {autores[i]}",
+            str(generos[i]),
+            f"Editora {editoras[i]}",
+            int(anos[i]),
+            int(paginas[i]),
+            int(quantidades[i]),
+            f"978{primeiro_id + i:010d}",
+            criado_em,
+            criado_em,
+        )
+        for i in range(total)
+    ]
+
+
+COLUNAS_LIVRO = [
+    "id", "titulo", "autor", "genero", "editora", "ano_publicacao", "numero_paginas", "quantidade_disponivel", "isbn",
+    "data_criacao", "data_atualizacao",
+]
+
+
+def gerar_usuarios(rng: np.random.Generator, primeiro_id: int, total: int, senha_hash: str, criado_em: datetime) -> list:
+    """Registros de usuário na ordem de COLUNAS_USUARIO (todos do grupo "cliente")."""
+    nomes = NOMES[rng.integers(0, len(NOMES), size=total)]
+    sobrenomes = SOBRENOMES[rng.integers(0, len(SOBRENOMES), size=(total, 2))]
+    telefones = rng.integers(0, 100_000_000, size=total)
+    ddds = rng.integers(11, 99, size=total)
+    numeros = rng.integers(1, 3000, size=total)
+    ruas = PALAVRAS[rng.integers(0, len(PALAVRAS), size=total)]
+
+    return [
+        (
+            primeiro_id + i,
+            f"{nomes[i]} {sobrenomes[i, 0]} {sobrenomes[i, 1]}",
+            f"usuario{primeiro_id + i}@sintetico.com",
+            f"({ddds[i]}) 9{telefones[i]:08d}",
+            f"Rua {ruas[i].capitalize()}, {numeros[i]}",
+            senha_hash,
+            "cliente",
+            criado_em,
+            criado_em,
+        )
+        for i in range(total)
+    ]
+
+
+COLUNAS_USUARIO = [
+    "id", "nome", "email", "telefone", "endereco_completo", "senha_hash", "grupo_politica",
+    "data_criacao", "data_atualizacao",
+]
+
+
+def gerar_emprestimos(
+    rng: np.random.Generator,
+    primeiro_id: int,
+    total: int,
+    ids_usuarios: np.ndarray,
+    cdf_usuarios: np.ndarray,
+    ids_livros: np.ndarray,
+    cdf_livros: np.ndarray,
+    referencia: np.datetime64,
+    anos: float,
+) -> dict:
+    """Colunas dos empréstimos como arrays NumPy (datas em microssegundos desde 2000-01-01)."""
+    # Beta(1, 2): mais empréstimos nos meses recentes (crescimento da base)
+    dias_atras = rng.beta(1, 2, size=total) * anos * 365
+    inicio = (referencia - EPOCA_POSTGRES).astype(np.int64) - (dias_atras * MICROS_POR_DIA).astype(np.int64)
+    renovacoes = rng.choice(3, size=total, p=[0.75, 0.2, 0.05])
+    devolucao = inicio + (PRAZO_DIAS * (1 + renovacoes)) * MICROS_POR_DIA
+
+    # Dentro do prazo: ativo. Vencidos: quase todos devolvidos, alguns já marcados como
+    # atrasados e uma fração ainda ativa (a tarefa diária ainda não passou por eles)
+    vencido = devolucao < (referencia - EPOCA_POSTGRES).astype(np.int64)
+    sorteio = rng.random(total)
+    status = np.where(
+        ~vencido, ATIVO, np.where(sorteio < 0.97, DEVOLVIDO, np.where(sorteio < 0.99, ATRASADO, ATIVO))
+    )
+    return {
+        "id": np.arange(primeiro_id, primeiro_id + total, dtype=np.int64),
+        "usuario_id": ids_usuarios[amostrar(cdf_usuarios, total, rng)],
+        "livro_id": ids_livros[amostrar(cdf_livros, total, rng)],
+        "data_emprestimo": inicio,
+        "data_devolucao": devolucao,
+        "numero_renovacoes": renovacoes,
+        "status": status,
+    }
+
+
+COLUNAS_EMPRESTIMO = ["id", "usuario_id", "livro_id", "data_emprestimo", "data_devolucao", "numero_renovacoes", "status"]
+
+
+def copy_binario_emprestimos(colunas: dict) -> bytes:
+    """Codifica os empréstimos no formato binário do COPY (big-endian, sem laço por linha).
+
+    Cada linha tem tamanho fixo para um mesmo status, então as linhas são agrupadas por
+    status e cada grupo vira um array estruturado convertido para bytes de uma vez.
+    """
+    partes = [b"PGCOPY\n\xff\r\n\x00", np.array([0, 0], dtype=">i4").tobytes()]  # Assinatura, flags e extensão
+    for codigo, texto in enumerate(STATUS):
+        selecao = colunas["status"] == codigo
+        quantidade = int(selecao.sum())
+        if not quantidade:
+            continue
+        linhas = np.empty(quantidade, dtype=np.dtype([
+            ("campos", ">i2"),
+            ("tam_id", ">i4"), ("id", ">i4"),
+            ("tam_usuario", ">i4"), ("usuario_id", ">i4"),
+            ("tam_livro", ">i4"), ("livro_id", ">i4"),
+            ("tam_emprestimo", ">i4"), ("data_emprestimo", ">i8"),
+            ("tam_devolucao", ">i4"), ("data_devolucao", ">i8"),
+            ("tam_renovacoes", ">i4"), ("numero_renovacoes", ">i4"),
+            ("tam_status", ">i4"), ("status", f"S{len(texto)}"),
+        ]))
+        linhas["campos"] = len(COLUNAS_EMPRESTIMO)
+        for nome in ("id", "usuario_id", "livro_id", "data_emprestimo", "data_devolucao", "numero_renovacoes"):
+            linhas[nome] = colunas[nome][selecao]
+        for nome, tamanho in (
+            ("tam_id", 4), ("tam_usuario", 4), ("tam_livro", 4), ("tam_emprestimo", 8),
+            ("tam_devolucao", 8), ("tam_renovacoes", 4), ("tam_status", len(texto)),
+        ):
+            linhas[nome] = tamanho
+        linhas["status"] = texto
+        partes.append(linhas.tobytes())
+    partes.append(np.array([-1], dtype=">i2").tobytes())  # Fim dos dados
+    return b"".join(partes)
+
+
+def rng_do_lote(semente: int, tabela: int, lote: int) -> np.random.Generator:
+    """Gerador independente por tabela e lote: o resultado não depende da ordem de execução."""
+    return np.random.default_rng([semente, tabela, lote])
+
+
+async def proximo_id(conn, tabela: str) -> int:
+    return (await conn.fetchval(f"SELECT coalesce(max(id), 0) FROM {tabela}")) + 1
+
+
+async def atualizar_sequencia(conn, tabela: str):
+    await conn.execute(f"SELECT setval(pg_get_serial_sequence('{tabela}', 'id'), (SELECT coalesce(max(id), 1) FROM {tabela}))")
+
+
+async def carregar_registros(conn, tabela: str, colunas: list, gerar, total: int, lote: int, semente: int, codigo: int):
+    primeiro_id = await proximo_id(conn, tabela)
+    for indice, inicio in enumerate(range(0, total, lote)):
+        registros = gerar(rng_do_lote(semente, codigo, indice), primeiro_id + inicio, min(lote, total - inicio))
+        await conn.copy_records_to_table(tabela, records=registros, columns=colunas)
+    await atualizar_sequencia(conn, tabela)
+
+
+def ddl(elemento) -> str:
+    return str(elemento.compile(dialect=postgresql.dialect()))
+
+
+async def carregar_emprestimos(conn, total: int, lote: int, semente: int, referencia: np.datetime64, anos: float, manter_indices: bool):
+    # Usuários e livros existentes (inclusive os que acabaram de ser gerados), com popularidade Zipf
+    ids_usuarios = np.array([linha["id"] for linha in await conn.fetch("SELECT id FROM usuario ORDER BY id")], dtype=np.int64)
+    ids_livros = np.array([linha["id"] for linha in await conn.fetch("SELECT id FROM livro ORDER BY id")], dtype=np.int64)
+    if not len(ids_usuarios) or not len(ids_livros):
+        raise RuntimeError("É preciso ter usuários e livros antes de gerar empréstimos.")
+    rng_distribuicoes = rng_do_lote(semente, 3, 0)
+    cdf_usuarios = cdf_zipf(len(ids_usuarios), 0.8, rng_distribuicoes)
+    cdf_livros = cdf_zipf(len(ids_livros), 1.05, rng_distribuicoes)
+
+    indices = list(Emprestimo.__table__.indexes)
+    if not manter_indices:
+        for indice in indices:
+            await conn.execute(ddl(DropIndex(indice, if_exists=True)))
+
+    try:
+        primeiro_id = await proximo_id(conn, "emprestimo")
+        for numero, inicio in enumerate(range(0, total, lote)):
+            quantidade = min(lote, total - inicio)
+            colunas = gerar_emprestimos(
+                rng_do_lote(semente, 4, numero), primeiro_id + inicio, quantidade,
+                ids_usuarios, cdf_usuarios, ids_livros, cdf_livros, referencia, anos,
+            )
+            await conn.copy_to_table(
+                "emprestimo", source=io.BytesIO(copy_binario_emprestimos(colunas)), columns=COLUNAS_EMPRESTIMO, format="binary"
+            )
+            print(f"      {inicio + quantidade:,} / {total:,} empréstimos")
+        await atualizar_sequencia(conn, "emprestimo")
+    finally:
+        # Mesmo se um COPY falhar a tabela não pode ficar sem os índices
+        if not manter_indices:
+            print("----> Recriando os índices de emprestimo...")
+            for indice in indices:
+                await conn.execute(ddl(CreateIndex(indice, if_not_exists=True)))
+
+
+async def gerar(args):
+    url = make_url(args.url).set(drivername="postgresql")
+    conn = await asyncpg.connect(url.render_as_string(hide_password=False))
+    referencia = np.datetime64(args.data_referencia, "us")
+    criado_em = referencia.astype(datetime)
+    inicio_total = time.perf_counter()
+    try:
+        await conn.execute("INSERT INTO grupo_politica (nome) VALUES ('cliente') ON CONFLICT DO NOTHING")
+
+        if args.livros:
+            inicio = time.perf_counter()
+            gerar_lote = partial(gerar_livros, criado_em=criado_em)
+            await carregar_registros(conn, "livro", COLUNAS_LIVRO, gerar_lote, args.livros, args.lote, args.semente, 1)
+            print(f"----> {args.livros:,} livros em {time.perf_counter() - inicio:.1f}s")
+
+        if args.usuarios:
+            inicio = time.perf_counter()
+            # Um único hash (custo mínimo) para todos: gerar milhões de hashes bcrypt levaria dias
+            senha_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash(args.senha)
+            gerar_lote = partial(gerar_usuarios, senha_hash=senha_hash, criado_em=criado_em)
+            await carregar_registros(conn, "usuario", COLUNAS_USUARIO, gerar_lote, args.usuarios, args.lote, args.semente, 2)
+            print(f"----> {args.usuarios:,} usuários em {time.perf_counter() - inicio:.1f}s (senha: {args.senha})")
+
+        if args.emprestimos:
+            inicio = time.perf_counter()
+            await carregar_emprestimos(
+                conn, args.emprestimos, args.lote, args.semente, referencia, args.anos, args.manter_indices
+            )
+            print(f"----> {args.emprestimos:,} empréstimos em {time.perf_counter() - inicio:.1f}s")
+
+        await conn.execute("ANALYZE livro, usuario, emprestimo")
+    finally:
+        await conn.close()
+    print(f"----> Concluído em {time.perf_counter() - inicio_total:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos de alto volume e carrega com COPY.")
+    parser.add_argument("--url", default=os.getenv("DATABASE_URL"), help="URL do Postgres (padrão: DATABASE_URL)")
+    parser.add_argument("--livros", type=int, default=500_000)
+    parser.add_argument("--usuarios", type=int, default=1_000_000)
+    parser.add_argument("--emprestimos", type=int, default=10_000_000)
+    parser.add_argument("--anos", type=float, default=5, help="Período coberto pelos empréstimos")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--data-referencia", default=date.today().isoformat(), help="\"Hoje\" dos dados (AAAA-MM-DD)")
+    parser.add_argument("--lote", type=int, default=500_000, help="Linhas por COPY")
+    parser.add_argument("--senha", default="senha123", help="Senha de todos os usuários gerados")
+    parser.add_argument("--manter-indices", action="store_true", help="Não remove os índices de emprestimo durante a carga")
+    args = parser.parse_args()
+    if not args.url:
+        parser.error("informe --url ou DATABASE_URL")
+    asyncio.run(gerar(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Este script migra as imagens do layout antigo, direto na categoria (upload/<categoria>/<arquivo>),
+para o layout fragmentado do images_service (upload/<categoria>/ab/cd/<arquivo>) e reescreve as
+URLs em usuario.profile_picture_url e livro.image_url.
+
+Pode rodar em segundo plano com os serviços no ar, em lotes (--pausa alivia o disco e o banco):
+1. Arquivos: movidos com os.replace (atômico, no mesmo sistema de arquivos), o original e as
+   miniaturas para o mesmo subdiretório. As URLs antigas continuam funcionando durante a
+   migração: o images_service procura no layout novo o arquivo que não está mais no antigo.
+2. URLs: as tabelas são percorridas pela chave primária, em lotes, e cada URL do layout antigo
+   cujo arquivo já está no layout novo é trocada (inclusive as gravadas durante a migração). O
+   UPDATE confere a URL antiga, então uma troca de foto concorrente não é sobrescrita.
+Interrompido, pode ser executado de novo: continua do que falta.
+
+Usa a conexão síncrona do Celery (DATABASE_URL_CELERY) e deve rodar onde o diretório upload
+está montado (o container do celery_worker, por exemplo).
+
+Uso:
+    python -m app.services.scripts.migrate_upload_layout
+    python -m app.services.scripts.migrate_upload_layout --lote 500 --pausa 0.05
+    python -m app.services.scripts.migrate_upload_layout --somente-urls
+"""
+
+import argparse
+import os
+import time
+
+from sqlalchemy import bindparam, select
+
+from app.services.celery.orphan_images import COLUNAS, IMAGES_FILES_BASE_URL, UPLOAD_DIR, fragmento, proximos_nomes
+
+
+def mover_arquivos(diretorio: str, lote: int, pausa: float) -> int:
+    """Move os arquivos do layout antigo da categoria para ab/cd/; retorna quantos foram movidos."""
+    movidos = 0
+    cursor = ""
+    while nomes := proximos_nomes(diretorio, cursor, lote):
+        for nome in nomes:
+            destino = os.path.join(diretorio, fragmento(nome), nome)
+            try:
+                os.makedirs(os.path.dirname(destino), exist_ok=True)
+                os.replace(os.path.join(diretorio, nome), destino)
+                movidos += 1
+            except FileNotFoundError:
+                pass  # Liberado pelo images_service durante a migração
+        cursor = nomes[-1]
+        print(f"----> {diretorio}: {movidos} arquivos movidos")
+        time.sleep(pausa)
+    return movidos
+
+
+def reescrever_urls(session, categoria: str, diretorio: str, lote: int, pausa: float) -> int:
+    """Troca as URLs do layout antigo pelas do novo; retorna quantas foram trocadas."""
+    coluna = COLUNAS[categoria]
+    tabela = coluna.class_.__table__
+    prefixo = f"{IMAGES_FILES_BASE_URL}/{categoria}/"
+    atualizar = (
+        tabela.update()
+        .where(tabela.c.id == bindparam("chave"), tabela.c[coluna.key] == bindparam("antiga"))
+        .values({coluna.key: bindparam("nova")})
+    )
+
+    trocadas = 0
+    ultimo_id = 0
+    while True:
+        linhas = session.execute(
+            select(tabela.c.id, tabela.c[coluna.key])
+            .where(tabela.c.id > ultimo_id, tabela.c[coluna.key].startswith(prefixo, autoescape=True))
+            .order_by(tabela.c.id)
+            .limit(lote)
+        ).all()
+        if not linhas:
+            return trocadas
+        ultimo_id = linhas[-1][0]
+
+        trocas = []
+        for chave, url in linhas:
+            nome = url[len(prefixo):]
+            relativo = f"{fragmento(nome)}/{nome}"
+            if "/" not in nome and os.path.exists(os.path.join(diretorio, relativo)):
+                trocas.append({"chave": chave, "antiga": url, "nova": prefixo + relativo})
+        if trocas:
+            session.execute(atualizar, trocas)
+            session.commit()
+            trocadas += len(trocas)
+        print(f"----> {tabela.name}: {trocadas} URLs reescritas (até o id {ultimo_id})")
+        time.sleep(pausa)
+
+
+def migrar(session, lote: int = 1000, pausa: float = 0, somente_urls: bool = False) -> dict:
+    resultado = {}
+    for categoria in COLUNAS:
+        diretorio = os.path.join(UPLOAD_DIR, categoria)
+        if not os.path.isdir(diretorio):
+            continue
+        movidos = 0 if somente_urls else mover_arquivos(diretorio, lote, pausa)
+        resultado[categoria] = {"arquivos": movidos, "urls": reescrever_urls(session, categoria, diretorio, lote, pausa)}
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra os uploads para o layout fragmentado (ab/cd/) e reescreve as URLs.")
+    parser.add_argument("--lote", type=int, default=1000, help="Arquivos ou linhas por lote")
+    parser.add_argument("--pausa", type=float, default=0, help="Segundos de espera entre os lotes")
+    parser.add_argument("--somente-urls", action="store_true", help="Só reescreve as URLs (arquivos já movidos)")
+    args = parser.parse_args()
+
+    from app.services.celery.celery_config import SessionLocalCelery
+
+    with SessionLocalCelery() as session:
+        resultado = migrar(session, args.lote, args.pausa, args.somente_urls)
+    for categoria, totais in resultado.items():
+        print(f"----> {categoria}: {totais['arquivos']} arquivos movidos, {totais['urls']} URLs reescritas")
+
+
+if __name__ == "__main__":
+    main()
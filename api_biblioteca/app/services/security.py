@@ -1,15 +1,22 @@
 from datetime import timedelta, datetime, timezone  # Manipulação de datas e tempos para expiração de tokens
+from sqlalchemy import update
 from sqlalchemy.future import select  # Consulta assíncrona com SQLAlchemy
 from sqlalchemy.ext.asyncio import AsyncSession
 from passlib.context import CryptContext  # Biblioteca para hashing de senhas
 from jose import jwt, JWTError  # Biblioteca para geração e validação de tokens JWT
-from fastapi import Depends, status, HTTPException
+from fastapi import BackgroundTasks, Depends, status, HTTPException
+from fastapi.concurrency import run_in_threadpool  # Executa o bcrypt fora do event loop
 from fastapi.security import OAuth2PasswordBearer  # Esquema de autenticação para tokens OAuth2
-from typing import Annotated  # Tipagem avançada para anotações de dependências
+from typing import Annotated, Optional  # Tipagem avançada para anotações de dependências
+import asyncio
+import logging
+import time
 
+from app.database import AsyncSessionLocal
 from app.models.user import Usuario as UsuarioModel
 from app.models.policy_group import GrupoPolitica as GrupoPoliticaModel
 from app.models.permission import Permissao as PermissaoModel
+from app.models.policy_group_permission import grupo_politica_permissao
 
 import os
 from dotenv import load_dotenv  # Carregar variáveis de ambiente do arquivo .env
@@ -17,6 +24,8 @@ from dotenv import load_dotenv  # Carregar variáveis de ambiente do arquivo .en
 # Carrega as variáveis de ambiente do arquivo .env
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Configurações de segurança para JWT
 SECRET_KEY = os.getenv("JWT_SECRET")  # Chave secreta usada para assinar tokens
 ALGORITHM = os.getenv("ALGORITHM")  # Algoritmo utilizado para geração de tokens
@@ -24,22 +33,181 @@ ALGORITHM = os.getenv("ALGORITHM")  # Algoritmo utilizado para geração de toke
 # Configuração do bcrypt para hashing de senhas
 bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Limites aceitos para o custo do bcrypt (cada unidade dobra o tempo de hash)
+BCRYPT_MIN_ROUNDS = 10
+BCRYPT_MAX_ROUNDS = 16
+
+
+def calibrar_custo_bcrypt(alvo_ms: float, amostras: int = 3) -> int:
+    """Mede o hash neste hardware e retorna o maior custo que cabe no orçamento de latência."""
+    rounds_base = 8
+    contexto = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds_base)
+    tempos = []
+    for _ in range(amostras):
+        inicio = time.perf_counter()
+        contexto.hash("calibracao-bcrypt")
+        tempos.append(time.perf_counter() - inicio)
+    tempo_base_ms = min(tempos) * 1000
+
+    # O tempo dobra a cada round: escolhe o maior custo abaixo do alvo
+    rounds = BCRYPT_MIN_ROUNDS
+    while rounds < BCRYPT_MAX_ROUNDS and tempo_base_ms * 2 ** (rounds + 1 - rounds_base) <= alvo_ms:
+        rounds += 1
+    return rounds
+
+
+def configurar_custo_bcrypt(rounds: int):
+    """Define o custo dos novos hashes; hashes com custo menor passam a precisar de rehash."""
+    bcrypt_context.update(bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds)
+
+
+# BCRYPT_ROUNDS fixa o custo; BCRYPT_TARGET_MS calibra o custo na inicialização
+if os.getenv("BCRYPT_ROUNDS"):
+    configurar_custo_bcrypt(int(os.getenv("BCRYPT_ROUNDS")))
+elif os.getenv("BCRYPT_TARGET_MS"):
+    configurar_custo_bcrypt(calibrar_custo_bcrypt(float(os.getenv("BCRYPT_TARGET_MS"))))
+
 # Esquema de autenticação OAuth2, usado para obter tokens de acesso
 oauth2_bearer = OAuth2PasswordBearer(tokenUrl='auth/token')
 
+# Segundos que as permissões de um grupo ficam em cache para a emissão de tokens (0 = sem cache).
+# O token já carrega as permissões até expirar, então um atraso curto não muda a semântica.
+PERMISSION_CACHE_TTL_SECONDS = float(os.getenv("PERMISSION_CACHE_TTL_SECONDS", "60"))
+
+# Com Redis, as invalidações são publicadas para todos os workers (o mesmo REDIS_URL do limitador de login)
+REDIS_URL = os.getenv("REDIS_URL")
+
+
+class CachePermissoes:
+    """Permissões por grupo de política, em memória (por processo), com expiração.
+
+    As rotas que alteram grupos, permissões ou o relacionamento entre eles chamam
+    `invalidar_global()`. Com REDIS_URL, a invalidação é publicada no canal
+    CANAL_INVALIDACAO e cada worker, inscrito por `iniciar_escuta()`, limpa o próprio
+    cache; sem Redis (um único processo) só o cache local é limpo. O TTL continua
+    valendo como garantia caso uma mensagem se perca.
+    """
+
+    CANAL_INVALIDACAO = "permissoes:invalidar"
+
+    def __init__(self, ttl: float = PERMISSION_CACHE_TTL_SECONDS, redis_url: str = None):
+        self.ttl = ttl
+        self._grupos: dict[str, tuple[float, list]] = {}  # grupo -> (expira em, namespaces)
+        self._redis = None
+        self._tarefa = None
+        if redis_url:
+            import redis.asyncio as redis
+
+            self._redis = redis.from_url(redis_url)
+            self._erros_redis = (redis.RedisError, OSError)
+
+    async def obter(self, grupo_politica: str, db: AsyncSession) -> list:
+        agora = time.monotonic()
+        registro = self._grupos.get(grupo_politica)
+        if registro is not None and registro[0] > agora:
+            return registro[1]
+
+        result = await db.execute(
+            select(PermissaoModel.namespace)
+            .join(GrupoPoliticaModel.permissoes)  # Associa permissões pelo relacionamento muitos-para-muitos
+            .where(GrupoPoliticaModel.nome == grupo_politica)
+        )
+        permissoes = [row[0] for row in result.fetchall()]  # Obtendo os namespaces das permissões
+        if self.ttl > 0:
+            self._grupos[grupo_politica] = (agora + self.ttl, permissoes)
+        return permissoes
 
-async def authenticate_user(email: str, password: str, db: AsyncSession):
+    async def carregar_todos(self, db: AsyncSession) -> int:
+        """Carrega as permissões de todos os grupos em uma única consulta (aquecimento do worker)."""
+        if self.ttl <= 0:
+            return 0
+        result = await db.execute(select(grupo_politica_permissao))
+        grupos: dict[str, list] = {}
+        for row in result.fetchall():
+            grupos.setdefault(row.grupo_politica_nome, []).append(row.permissao_namespace)
+
+        expira = time.monotonic() + self.ttl
+        self._grupos = {grupo: (expira, permissoes) for grupo, permissoes in grupos.items()}
+        return len(grupos)
+
+    def invalidar(self):
+        """Limpa o cache deste processo."""
+        self._grupos.clear()
+
+    async def invalidar_global(self):
+        """Limpa o cache deste processo e o dos demais workers (via Redis)."""
+        self.invalidar()
+        if self._redis is None:
+            return
+        try:
+            await self._redis.publish(self.CANAL_INVALIDACAO, "1")
+        except self._erros_redis:
+            logger.exception("Não foi possível publicar a invalidação do cache de permissões")
+
+    def iniciar_escuta(self):
+        """Inscreve o worker no canal de invalidação (uma tarefa em segundo plano por worker)."""
+        if self._redis is not None and self.ttl > 0 and self._tarefa is None:
+            self._tarefa = asyncio.create_task(self._escutar())
+
+    async def encerrar_escuta(self):
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            self._tarefa = None
+
+    async def _escutar(self):
+        while True:
+            try:
+                async with self._redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.CANAL_INVALIDACAO)
+                    async for mensagem in pubsub.listen():
+                        # A confirmação da inscrição também limpa: invalidações publicadas
+                        # enquanto o worker estava desconectado foram perdidas
+                        if mensagem["type"] in ("message", "subscribe"):
+                            self.invalidar()
+            except self._erros_redis:
+                logger.exception("Canal de invalidação do cache de permissões indisponível")
+                await asyncio.sleep(1)
+
+
+cache_permissoes = CachePermissoes(redis_url=REDIS_URL)
+
+
+async def rehash_senha(user_id: int, password: str):
+    """Regrava o hash da senha com o custo atual (executado em segundo plano após o login)."""
+    novo_hash = await run_in_threadpool(bcrypt_context.hash, password)
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(UsuarioModel).where(UsuarioModel.id == user_id).values(senha_hash=novo_hash)
+        )
+        await db.commit()
+
+
+def consulta_usuario_por_email(email: str):
+    """Busca do usuário no login (usa o índice único de usuario.email)."""
+    return select(UsuarioModel).where(UsuarioModel.email == email)
+
+
+async def authenticate_user(
+    email: str, password: str, db: AsyncSession, background_tasks: Optional[BackgroundTasks] = None
+):
     """Autentica um usuário verificando se o email existe e a senha está correta."""
-    stmt = select(UsuarioModel).where(UsuarioModel.email == email)  # Consulta para buscar o usuário pelo email
+    stmt = consulta_usuario_por_email(email)  # Consulta para buscar o usuário pelo email
     result = await db.execute(stmt)  # Executa a consulta
     user = result.scalar_one_or_none()  # Obtém o usuário encontrado ou None se não existir
     
     if not user:  # Se o usuário não for encontrado, retorna None
+        # Verificação contra um hash fictício (gerado uma única vez) para manter o
+        # tempo de resposta uniforme e não revelar quais emails estão cadastrados
+        await run_in_threadpool(bcrypt_context.dummy_verify)
         return None
     
     # Verifica se a senha informada corresponde ao hash armazenado
-    if not bcrypt_context.verify(password, user.senha_hash):
+    if not await run_in_threadpool(bcrypt_context.verify, password, user.senha_hash):
         return None 
+
+    # Hashes criados com um custo menor que o atual são atualizados sem exigir troca de senha
+    if background_tasks is not None and bcrypt_context.needs_update(user.senha_hash):
+        background_tasks.add_task(rehash_senha, user.id, password)
     
     return user  # Retorna o usuário autenticado
 
@@ -47,13 +215,8 @@ async def authenticate_user(email: str, password: str, db: AsyncSession):
 async def create_access_token(username: str, user_id: int, grupo_politica: str, expires_delta: timedelta, db: AsyncSession):
     """Gera um token JWT contendo permissões associadas ao grupo de política do usuário."""
 
-    # Buscar permissões associadas ao grupo de política do usuário
-    result = await db.execute(
-        select(PermissaoModel.namespace)
-        .join(GrupoPoliticaModel.permissoes)  # Associa permissões pelo relacionamento muitos-para-muitos
-        .where(GrupoPoliticaModel.nome == grupo_politica)
-    )
-    permissoes = [row[0] for row in result.fetchall()]  # Obtendo os namespaces das permissões
+    # Permissões associadas ao grupo de política do usuário (em cache por PERMISSION_CACHE_TTL_SECONDS)
+    permissoes = await cache_permissoes.obter(grupo_politica, db)
 
     # Definição do payload do token
     encode = {
@@ -97,4 +260,21 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token inválido."
-        )
\ No newline at end of file
+        )
+
+def exige_permissao(
+    namespace: str,
+    detail: str = "Permissão negada.",
+    status_code: int = status.HTTP_403_FORBIDDEN
+):
+    """Cria uma dependência que valida a permissão do token antes de qualquer acesso ao banco.
+
+    Declarada antes de `get_db` na rota, faz com que requisições negadas sejam rejeitadas
+    sem abrir sessão nem retirar conexões do pool.
+    """
+    async def verificar_permissao(current_user: Annotated[dict, Depends(get_current_user)]):
+        if namespace not in current_user.get("permissoes", []):
+            raise HTTPException(status_code=status_code, detail=detail)
+        return current_user
+
+    return verificar_permissao
@@ -0,0 +1,27 @@
+"""-----------------------------------------------------------
+Serialização rápida das listagens grandes.
+
+Com response_model, o FastAPI valida cada objeto ORM no schema Pydantic e só
+depois serializa o resultado. Nas listagens, as linhas vêm direto do banco
+(já confiáveis), então a consulta seleciona apenas as colunas do schema de
+saída e as linhas são serializadas em JSON pelo pydantic-core, sem validação
+intermediária. O response_model continua declarado na rota para a
+documentação (OpenAPI) e o formato do JSON é o mesmo.
+-----------------------------------------------------------"""
+from fastapi import Response
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+
+def colunas_do_schema(modelo_orm, schema: type[BaseModel]) -> list:
+    """Colunas do modelo ORM correspondentes aos campos do schema, na mesma ordem."""
+    return [getattr(modelo_orm, campo).label(campo) for campo in schema.model_fields]
+
+
+def linhas_como_dicts(result) -> list[dict]:
+    return [dict(linha) for linha in result.mappings()]
+
+
+def resposta_json(conteudo) -> Response:
+    """Resposta JSON serializada pelo pydantic-core (datas em ISO 8601, como no response_model)."""
+    return Response(content=to_json(conteudo), media_type="application/json")
@@ -0,0 +1,187 @@
+"""-----------------------------------------------------------
+Registro de consultas lentas (opcional).
+
+Com DB_SLOW_QUERY_MS definido, todo comando SQL que passar do limiar é
+logado com a rota (ou tarefa) de origem, os parâmetros mascarados e a
+duração. Uma fração dos SELECTs lentos (DB_SLOW_QUERY_EXPLAIN_SAMPLE_RATE)
+é executada de novo com EXPLAIN ANALYZE em uma conexão separada, fora do
+pool da aplicação, com as mesmas opções de conexão (statement_timeout e cache
+de prepared statements) e no máximo DB_SLOW_QUERY_EXPLAIN_CONCURRENCY de cada
+vez: quando o banco fica lento e as consultas lentas se multiplicam, os EXPLAIN
+excedentes são descartados em vez de somar carga e conexões. Os registros mais recentes ficam em memória e são
+expostos em GET /diagnostico/consultas-lentas.
+-----------------------------------------------------------"""
+import asyncio
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.services.query_counter import origem_atual
+
+load_dotenv()
+
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "0"))  # 0 = desativado
+DB_SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(os.getenv("DB_SLOW_QUERY_EXPLAIN_SAMPLE_RATE", "0.1"))
+DB_SLOW_QUERY_BUFFER_SIZE = int(os.getenv("DB_SLOW_QUERY_BUFFER_SIZE", "100"))
+DB_SLOW_QUERY_EXPLAIN_CONCURRENCY = int(os.getenv("DB_SLOW_QUERY_EXPLAIN_CONCURRENCY", "1"))  # Por processo
+# statement_timeout do EXPLAIN ANALYZE (0 = o DB_STATEMENT_TIMEOUT_MS da aplicação)
+DB_SLOW_QUERY_EXPLAIN_TIMEOUT_MS = int(os.getenv("DB_SLOW_QUERY_EXPLAIN_TIMEOUT_MS", "10000"))
+
+# Tipos cujos valores aparecem no log; os demais (textos, bytes...) são mascarados
+_TIPOS_VISIVEIS = (bool, int, float, Decimal, date, datetime, type(None))
+
+
+def mascarar_parametros(parametros):
+    """Mantém números, datas e nulos; textos e binários viram apenas tipo e tamanho."""
+    if isinstance(parametros, dict):
+        return {chave: mascarar_parametros(valor) for chave, valor in parametros.items()}
+    if isinstance(parametros, (list, tuple)):
+        return [mascarar_parametros(valor) for valor in parametros]
+    if isinstance(parametros, _TIPOS_VISIVEIS):
+        return parametros if not isinstance(parametros, (date, Decimal)) else str(parametros)
+    tamanho = len(parametros) if hasattr(parametros, "__len__") else None
+    return f"<{type(parametros).__name__}{f':{tamanho}' if tamanho is not None else ''}>"
+
+
+class RegistroConsultasLentas:
+    """Mede cada comando SQL de um engine e guarda os mais lentos em um buffer circular."""
+
+    def __init__(
+        self, limiar_ms: float, taxa_explain: float = 0.1, tamanho: int = 100, max_explains: int = 1,
+        timeout_explain_ms: int = 0,
+    ):
+        self.limiar_ms = limiar_ms
+        self.taxa_explain = taxa_explain
+        self.timeout_explain_ms = timeout_explain_ms
+        self.consultas = deque(maxlen=tamanho)
+        self._engines_explain = {}  # Um engine sem pool por banco, separado do pool da aplicação
+        self._connect_args = {}  # Opções de conexão de cada banco, passadas ao instalar
+        self._vagas_explain = threading.BoundedSemaphore(max_explains)  # Vale para tarefas e threads
+        self._tarefas = set()  # Referências aos EXPLAIN em andamento
+
+    @property
+    def ativo(self) -> bool:
+        return self.limiar_ms > 0
+
+    def instalar(self, engine, connect_args: dict = None):
+        """Mede os comandos do engine; `connect_args` são usados também nas conexões do EXPLAIN."""
+        engine_sincrono = getattr(engine, "sync_engine", engine)
+        self._connect_args[engine_sincrono.url.render_as_string(hide_password=False)] = connect_args or {}
+        event.listen(engine_sincrono, "before_cursor_execute", self._antes)
+        event.listen(engine_sincrono, "after_cursor_execute", self._depois)
+        event.listen(engine_sincrono, "handle_error", self._erro)
+
+    def _antes(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("inicio_consultas", []).append(time.perf_counter())
+
+    def _erro(self, contexto_erro):
+        conexao = contexto_erro.connection
+        if conexao is not None and conexao.info.get("inicio_consultas"):
+            conexao.info["inicio_consultas"].pop()
+
+    def _depois(self, conn, cursor, statement, parameters, context, executemany):
+        duracao_ms = (time.perf_counter() - conn.info["inicio_consultas"].pop()) * 1000
+        if duracao_ms < self.limiar_ms:
+            return
+
+        registro = {
+            "quando": datetime.now(timezone.utc).isoformat(),
+            "origem": origem_atual(),
+            "duracao_ms": round(duracao_ms, 3),
+            "sql": statement,
+            "parametros": mascarar_parametros(parameters),
+            "plano": None,
+        }
+        self.consultas.append(registro)
+        print(f"Consulta lenta ({duracao_ms:.1f} ms) em {registro['origem']}: {' '.join(statement.split())[:500]}")
+
+        if self._pode_explicar(conn, statement, executemany) and random.random() < self.taxa_explain:
+            self._agendar_explain(conn.engine, statement, parameters, registro)
+
+    @staticmethod
+    def _pode_explicar(conn, statement: str, executemany: bool) -> bool:
+        # EXPLAIN ANALYZE executa o comando: apenas SELECTs no Postgres
+        return (
+            not executemany
+            and conn.dialect.name == "postgresql"
+            and statement.lstrip().upper().startswith("SELECT")
+        )
+
+    def _engine_explain(self, engine):
+        chave = engine.url.render_as_string(hide_password=False)
+        if chave not in self._engines_explain:
+            fabrica = create_async_engine if engine.dialect.is_async else create_engine
+            self._engines_explain[chave] = fabrica(engine.url, poolclass=NullPool, connect_args=self._connect_args.get(chave, {}))
+        return self._engines_explain[chave]
+
+    def _agendar_explain(self, engine, statement, parameters, registro):
+        sql = f"EXPLAIN (ANALYZE, FORMAT JSON) {statement}"
+        parametros = tuple(parameters) if isinstance(parameters, list) else parameters
+        engine_explain = self._engine_explain(engine)
+        if not self._vagas_explain.acquire(blocking=False):
+            registro["erro_plano"] = "EXPLAIN descartado: limite de EXPLAIN simultâneos atingido"
+            return
+
+        if not engine.dialect.is_async:
+            try:
+                with engine_explain.connect() as conn:
+                    registro["plano"] = _como_json(conn.exec_driver_sql(sql, parametros).scalar())
+                    conn.rollback()
+            except (DBAPIError, OSError) as e:
+                registro["erro_plano"] = str(e)
+            finally:
+                self._vagas_explain.release()
+            return
+
+        async def explicar():
+            try:
+                async with engine_explain.connect() as conn:
+                    registro["plano"] = _como_json((await conn.exec_driver_sql(sql, parametros)).scalar())
+                    await conn.rollback()
+            except (DBAPIError, OSError) as e:
+                registro["erro_plano"] = str(e)
+            finally:
+                self._vagas_explain.release()
+
+        # Contexto vazio: o EXPLAIN não entra na contagem de consultas da requisição
+        tarefa = contextvars.Context().run(asyncio.get_running_loop().create_task, explicar())
+        self._tarefas.add(tarefa)
+        tarefa.add_done_callback(self._tarefas.discard)
+
+    def snapshot(self) -> dict:
+        return {
+            "limiar_ms": self.limiar_ms,
+            "taxa_explain": self.taxa_explain,
+            "consultas": list(reversed(self.consultas)),  # Mais recentes primeiro
+        }
+
+    async def dispose(self):
+        for engine in self._engines_explain.values():
+            resultado = engine.dispose()
+            if asyncio.iscoroutine(resultado):
+                await resultado
+
+
+def _como_json(valor):
+    return json.loads(valor) if isinstance(valor, str) else valor
+
+
+registro_consultas_lentas = RegistroConsultasLentas(
+    DB_SLOW_QUERY_MS,
+    taxa_explain=DB_SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+    tamanho=DB_SLOW_QUERY_BUFFER_SIZE,
+    max_explains=DB_SLOW_QUERY_EXPLAIN_CONCURRENCY,
+    timeout_explain_ms=DB_SLOW_QUERY_EXPLAIN_TIMEOUT_MS,
+)
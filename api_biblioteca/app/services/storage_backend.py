@@ -0,0 +1,170 @@
+"""-----------------------------------------------------------
+Acesso aos arquivos das imagens pelo mesmo backend do images_service (STORAGE_BACKEND):
+o diretório upload local (volume compartilhado) ou um bucket S3 compatível (AWS S3, MinIO...).
+
+É a parte da interface do images_service (app/services/storage_backend.py) usada pela limpeza
+das órfãs: metadados, listar e remover, com as mesmas chaves (`<categoria>/ab/cd/<arquivo>`)
+e a mesma ordem de listagem nos dois backends. Com o S3, o worker do Celery não precisa do
+volume upload e o images_service pode rodar com várias réplicas.
+-----------------------------------------------------------"""
+import heapq
+import itertools
+import os
+import stat
+import threading
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+S3_BUCKET = os.getenv("S3_BUCKET", "")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None  # Vazio: AWS; no MinIO, http://minio:9000
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+S3_KEY_PREFIX = os.getenv("S3_KEY_PREFIX", "")
+
+LOTE_LISTAGEM = 1000
+
+# Um cliente do S3 por processo (os do prefork do Celery criam o seu)
+_clientes = {}
+_lock_clientes = threading.Lock()
+
+
+class Objeto:
+    """Metadados de um arquivo armazenado."""
+
+    def __init__(self, chave: str, tamanho: int, mtime_ns: int):
+        self.chave = chave
+        self.tamanho = tamanho
+        self.mtime_ns = mtime_ns
+
+    @property
+    def mtime(self) -> float:
+        return self.mtime_ns / 1e9
+
+
+class ArmazenamentoLocal:
+    """Arquivos em um diretório local (o volume upload compartilhado com o images_service)."""
+
+    def __init__(self, diretorio: str):
+        self.diretorio = diretorio
+
+    def caminho(self, chave: str) -> str:
+        return os.path.join(self.diretorio, chave)
+
+    def metadados(self, chave: str) -> Objeto:
+        """Tamanho e mtime do arquivo; None se não existe."""
+        try:
+            resultado_stat = os.stat(self.caminho(chave))
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        if not stat.S_ISREG(resultado_stat.st_mode):
+            return None
+        return Objeto(chave, resultado_stat.st_size, resultado_stat.st_mtime_ns)
+
+    def remover(self, chave: str):
+        try:
+            os.remove(self.caminho(chave))
+        except FileNotFoundError:
+            pass
+
+    def listar(self, prefixo: str, depois_de: str = "", limite: int = None):
+        """Chaves que começam com `prefixo`, depois de `depois_de`, em ordem (como o ListObjectsV2 do S3).
+
+        Lê os diretórios sob demanda, no máximo LOTE_LISTAGEM entradas de cada vez, e não abre os
+        subdiretórios que ficam inteiros antes de `depois_de`.
+        """
+        diretorio, _, inicio = prefixo.rpartition("/")
+        return itertools.islice(self._percorrer(f"{diretorio}/" if diretorio else "", inicio, depois_de), limite)
+
+    def _percorrer(self, base: str, inicio: str, depois_de: str):
+        caminho = os.path.join(self.diretorio, base)
+        ultima = ""
+        while True:
+            try:
+                with os.scandir(caminho) as entradas:
+                    lote = heapq.nsmallest(LOTE_LISTAGEM, self._entradas(entradas, base, inicio, depois_de, ultima))
+            except (FileNotFoundError, NotADirectoryError):
+                return
+            for ordem, diretorio in lote:
+                if diretorio:
+                    yield from self._percorrer(base + ordem, "", depois_de)
+                else:
+                    yield base + ordem
+            if len(lote) < LOTE_LISTAGEM:
+                return
+            ultima = lote[-1][0]
+
+    def _entradas(self, entradas, base: str, inicio: str, depois_de: str, ultima: str):
+        # Subdiretórios entram como `nome/`, a posição das suas chaves na ordem lexicográfica
+        for entrada in entradas:
+            if entrada.name.startswith(".") or not entrada.name.startswith(inicio):
+                continue
+            if entrada.is_dir(follow_symlinks=False):
+                ordem = f"{entrada.name}/"
+                # Todas as chaves do subdiretório vêm antes do cursor
+                if depois_de and base + ordem < depois_de and not depois_de.startswith(base + ordem):
+                    continue
+            elif entrada.is_file(follow_symlinks=False):
+                ordem = entrada.name
+                if base + ordem <= depois_de:
+                    continue
+            else:
+                continue
+            if ordem > ultima:
+                yield ordem, ordem.endswith("/")
+
+
+class ArmazenamentoS3:
+    """Objetos em um bucket S3 compatível."""
+
+    def __init__(self, bucket: str, prefixo: str, endpoint_url: str = None, regiao: str = None):
+        if not bucket:
+            raise ValueError("S3_BUCKET não configurado")
+        self.bucket = bucket
+        self.prefixo = prefixo
+        self.endpoint_url = endpoint_url
+        self.regiao = regiao
+
+    def cliente(self):
+        chave_cliente = (os.getpid(), self.endpoint_url, self.regiao)
+        with _lock_clientes:
+            if chave_cliente not in _clientes:
+                import boto3  # Só é necessário com STORAGE_BACKEND=s3
+
+                _clientes[chave_cliente] = boto3.session.Session().client(
+                    "s3", endpoint_url=self.endpoint_url, region_name=self.regiao
+                )
+            return _clientes[chave_cliente]
+
+    def metadados(self, chave: str) -> Objeto:
+        from botocore.exceptions import ClientError
+
+        try:
+            cabecalho = self.cliente().head_object(Bucket=self.bucket, Key=self.prefixo + chave)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return Objeto(chave, cabecalho["ContentLength"], int(cabecalho["LastModified"].timestamp()) * 10**9)
+
+    def remover(self, chave: str):
+        self.cliente().delete_object(Bucket=self.bucket, Key=self.prefixo + chave)
+
+    def listar(self, prefixo: str, depois_de: str = "", limite: int = None):
+        """Chaves que começam com `prefixo`, depois de `depois_de`, em ordem; páginas de até mil chaves."""
+        parametros = {"Bucket": self.bucket, "Prefix": self.prefixo + prefixo}
+        if depois_de:
+            parametros["StartAfter"] = self.prefixo + depois_de
+        paginas = self.cliente().get_paginator("list_objects_v2").paginate(**parametros)
+        chaves = (objeto["Key"][len(self.prefixo):] for pagina in paginas for objeto in pagina.get("Contents", []))
+        return itertools.islice(chaves, limite)
+
+
+def criar_backend(diretorio: str):
+    """Backend configurado em STORAGE_BACKEND; `diretorio` é o upload local (só usado no backend local)."""
+    if STORAGE_BACKEND == "s3":
+        return ArmazenamentoS3(S3_BUCKET, S3_KEY_PREFIX, S3_ENDPOINT_URL, S3_REGION)
+    if STORAGE_BACKEND != "local":
+        raise ValueError(f"STORAGE_BACKEND inválido: {STORAGE_BACKEND} (use local ou s3)")
+    return ArmazenamentoLocal(diretorio)
@@ -0,0 +1,82 @@
+"""-----------------------------------------------------------
+Tickets de upload direto para o images_service.
+
+Em vez de receber a imagem e repassá-la ao images_service (o dobro de tráfego e um
+worker da API ocupado durante toda a transferência), a API emite um ticket curto,
+assinado com HMAC-SHA256, que autoriza um único destino: o usuário que pediu, a
+categoria e a entidade (livro ou usuário) que vai receber a imagem. O navegador envia
+o arquivo direto ao images_service, que confere a assinatura localmente (mesma chave
+UPLOAD_TICKET_SECRET) e chama o callback da API com a URL gerada. O callback aceita cada ticket
+(jti) uma única vez e confere de novo a permissão do usuário que o pediu (sub).
+
+Formato: <payload JSON em base64url>.<HMAC do payload em base64url>
+-----------------------------------------------------------"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+import uuid
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+UPLOAD_TICKET_SECRET = os.getenv("UPLOAD_TICKET_SECRET")
+# Com uma chave padrão, qualquer um que a conhecesse assinaria tickets: sem a variável o serviço não sobe
+if not UPLOAD_TICKET_SECRET:
+    raise ValueError("A variável de ambiente UPLOAD_TICKET_SECRET não foi configurada no arquivo .env")
+UPLOAD_TICKET_TTL_SECONDS = int(os.getenv("UPLOAD_TICKET_TTL_SECONDS", "300"))
+# O ticket é conferido no início do upload; o callback chega depois da transferência e aceita
+# tickets vencidos há até esse tempo
+TOLERANCIA_CALLBACK_SECONDS = 120
+# Endereço do images_service visto pelo navegador (a porta exposta no docker-compose)
+IMAGES_SERVICE_PUBLIC_URL = os.getenv("IMAGES_SERVICE_PUBLIC_URL", "http://localhost:8001")
+
+# Entidade de destino -> categoria da imagem
+CATEGORIAS = {"usuario": "profile", "livro": "book_cover"}
+
+
+def _b64(dados: bytes) -> str:
+    return base64.urlsafe_b64encode(dados).rstrip(b"=").decode()
+
+
+def _de_b64(texto: str) -> bytes:
+    return base64.urlsafe_b64decode(texto + "=" * (-len(texto) % 4))
+
+
+def _assinatura(corpo: str) -> str:
+    return _b64(hmac.new(UPLOAD_TICKET_SECRET.encode(), corpo.encode(), hashlib.sha256).digest())
+
+
+def emitir_ticket(usuario_id: int, tipo: str, alvo_id: int) -> dict:
+    """Ticket para o usuário enviar a imagem da entidade `tipo`/`alvo_id`, válido por UPLOAD_TICKET_TTL_SECONDS."""
+    expira_em = int(time.time()) + UPLOAD_TICKET_TTL_SECONDS
+    payload = {
+        "sub": usuario_id,
+        "cat": CATEGORIAS[tipo],
+        "tipo": tipo,
+        "id": alvo_id,
+        "exp": expira_em,
+        "jti": uuid.uuid4().hex,
+    }
+    corpo = _b64(json.dumps(payload, separators=(",", ":")).encode())
+    return {
+        "ticket": f"{corpo}.{_assinatura(corpo)}",
+        "upload_url": f"{IMAGES_SERVICE_PUBLIC_URL}/upload/direct",
+        "category": payload["cat"],
+        "expires_at": expira_em,
+    }
+
+
+def verificar_ticket(ticket: str, tolerancia: int = 0) -> dict:
+    """Payload do ticket; ValueError se a assinatura não confere ou se expirou há mais de `tolerancia` segundos."""
+    corpo, _, assinatura = ticket.partition(".")
+    # Comparados como bytes: o compare_digest recusa str com caracteres não ASCII (TypeError)
+    if not assinatura or not hmac.compare_digest(assinatura.encode(), _assinatura(corpo).encode()):
+        raise ValueError("Ticket com assinatura inválida")
+    payload = json.loads(_de_b64(corpo))
+    if payload["exp"] + tolerancia < time.time():
+        raise ValueError("Ticket expirado")
+    return payload
@@ -0,0 +1,113 @@
+"""-----------------------------------------------------------
+Aquecimento do worker da API, executado no lifespan antes de o worker
+aceitar requisições.
+
+Logo após um deploy, as primeiras requisições de cada worker pagavam os
+custos de inicialização: abrir as conexões do pool, configurar os mappers
+do ORM, compilar o SQL das consultas mais usadas (e prepará-lo no
+asyncpg), carregar o backend do bcrypt e buscar as permissões dos grupos
+no login. O aquecimento antecipa esses custos.
+-----------------------------------------------------------"""
+import asyncio
+import os
+import time
+
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import configure_mappers
+from sqlalchemy.pool import QueuePool
+
+from app.database import AsyncSessionLocal, DB_POOL_SIZE, engine, roteador_replicas
+from app.services.security import bcrypt_context, cache_permissoes, consulta_usuario_por_email
+
+load_dotenv()
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", str(DB_POOL_SIZE)))  # Conexões abertas por pool
+
+
+def consultas_quentes() -> list:
+    """Consultas das rotas mais acessadas, montadas pelos mesmos construtores das rotas.
+
+    Os parâmetros não retornam linhas: o objetivo é compilar o SQL (cache do
+    SQLAlchemy) e prepará-lo em cada conexão (cache de statements do asyncpg).
+    """
+    # Importados aqui para não criar o ciclo services -> routers na importação
+    from app.models.book import Livro as LivroModel
+    from app.routers.books import montar_consulta_livros
+    from app.routers.loans import consulta_emprestimos_usuario
+    from app.schemas.book import LivroOut
+    from app.services.serialization import colunas_do_schema
+
+    livros = montar_consulta_livros()
+    return [
+        consulta_usuario_por_email(""),  # Login
+        consulta_emprestimos_usuario(0),  # Empréstimos do usuário
+        select(func.count()).select_from(livros.subquery()),  # Catálogo: total
+        livros.with_only_columns(*colunas_do_schema(LivroModel, LivroOut)).offset(0).limit(0),  # Catálogo: página
+    ]
+
+
+async def aquecer_pool(engine: AsyncEngine, conexoes: int, consultas: list) -> int:
+    """Abre até `conexoes` conexões ao mesmo tempo e executa as consultas em cada uma.
+
+    As conexões voltam ao pool no final. Retorna quantas foram aquecidas.
+    """
+    if isinstance(engine.pool, QueuePool):
+        conexoes = min(conexoes, engine.pool.size())
+    else:
+        conexoes = min(conexoes, 1)  # Sem fila (ex.: NullPool), não há conexões para manter abertas
+    if conexoes <= 0:
+        return 0
+
+    # Barreira simples (asyncio.Barrier só existe a partir do Python 3.11)
+    conectadas = 0
+    todas_conectadas = asyncio.Event()
+
+    async def aquecer_conexao():
+        nonlocal conectadas
+        try:
+            async with engine.connect() as conn:
+                # Todas ficam retiradas até a última conectar, forçando conexões distintas
+                conectadas += 1
+                if conectadas == conexoes:
+                    todas_conectadas.set()
+                await todas_conectadas.wait()
+                async with AsyncSession(bind=conn) as session:
+                    for consulta in consultas:
+                        await session.execute(consulta)
+        except BaseException:
+            todas_conectadas.set()  # Libera as demais se esta conexão falhar
+            raise
+
+    await asyncio.gather(*(aquecer_conexao() for _ in range(conexoes)))
+    return conexoes
+
+
+async def aquecer_worker():
+    """Aquece o worker; falhas são logadas e não impedem a subida."""
+    if not WARMUP_ENABLED:
+        return
+
+    inicio = time.perf_counter()
+    configure_mappers()  # Resolve os relacionamentos do ORM agora, e não na primeira consulta
+    await run_in_threadpool(bcrypt_context.dummy_verify)  # Gera o hash fictício usado no login com email inexistente
+
+    try:
+        consultas = consultas_quentes()
+        conexoes = 0
+        for alvo in [engine, *roteador_replicas.saudaveis]:
+            conexoes += await aquecer_pool(alvo, WARMUP_CONNECTIONS, consultas)
+        async with AsyncSessionLocal() as db:
+            grupos = await cache_permissoes.carregar_todos(db)
+    except (DBAPIError, OSError) as e:
+        print(f"Aquecimento do worker incompleto: {e}")
+        return
+
+    print(
+        f"----> Worker aquecido em {(time.perf_counter() - inicio) * 1000:.0f} ms: {conexoes} conexões, "
+        f"{len(consultas)} consultas compiladas, permissões de {grupos} grupos em cache"
+    )
@@ -0,0 +1,61 @@
+"""
+Mede o custo de CPU da compressão contra os bytes economizados, por codificação e nível,
+em respostas JSON no formato da listagem de livros (100 e 10.000 linhas).
+
+Uso:
+    python -m benchmarks.compression --repeticoes 50
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime
+
+from app.services.compression import _Brotli, _Gzip, _Zstd, brotli, zstandard
+
+# (codificação, nível, fábrica do compressor)
+CONFIGURACOES = [("gzip", nivel, lambda nivel=nivel: _Gzip(nivel)) for nivel in (1, 6, 9)]
+if brotli is not None:
+    CONFIGURACOES += [("br", nivel, lambda nivel=nivel: _Brotli(nivel)) for nivel in (1, 4, 11)]
+if zstandard is not None:
+    CONFIGURACOES += [("zstd", nivel, lambda nivel=nivel: _Zstd(nivel)) for nivel in (1, 3, 9)]
+
+
+def gerar_listagem(total: int) -> bytes:
+    agora = datetime.now().isoformat()
+    livros = [
+        {
+            "id": i, "titulo": f"Livro {i}", "autor": f"Autor {i % 500}", "genero": "Fantasia",
+            "editora": "Editora", "ano_publicacao": 1950 + i % 70, "numero_paginas": 100 + i % 900,
+            "quantidade_disponivel": i % 7, "isbn": f"978{i:010d}", "image_url": None,
+            "data_criacao": agora, "data_atualizacao": agora,
+        }
+        for i in range(total)
+    ]
+    return json.dumps({"livros": livros, "total": total}).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara CPU e bytes economizados por codificação.")
+    parser.add_argument("--repeticoes", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'linhas':>7}  {'codif.':<6}{'nível':>6}{'µs/resp':>11}{'razão':>8}{'KB economizados':>17}{'µs/KB econ.':>13}")
+    for total in (100, 10_000):
+        corpo = gerar_listagem(total)
+        repeticoes = max(1, args.repeticoes if total <= 100 else args.repeticoes // 10)
+        for codificacao, nivel, fabrica in CONFIGURACOES:
+            inicio = time.process_time()
+            for _ in range(repeticoes):
+                compressor = fabrica()
+                comprimido = compressor.comprimir(corpo) + compressor.finalizar()
+            micros = (time.process_time() - inicio) / repeticoes * 1_000_000
+            economizados_kb = (len(corpo) - len(comprimido)) / 1024
+            print(
+                f"{total:>7}  {codificacao:<6}{nivel:>6}{micros:>11.0f}{len(corpo) / len(comprimido):>8.1f}"
+                f"{economizados_kb:>17.1f}{micros / economizados_kb:>13.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Tempo de importação dos pontos de entrada (API, supervisor e worker do Celery).
+
+Importa cada módulo em um processo novo com `python -X importtime`, repete algumas
+vezes e usa a mediana. O relatório agrupa o tempo próprio de cada módulo pelo pacote
+de topo (sqlalchemy, fastapi, jose...) e compara o total com a baseline gravada em
+import_time_baseline.json. Também falha se um ponto de entrada voltar a importar um
+pacote que ele não deveria carregar (ex.: psycopg2 na API).
+
+Uso (com o .env do projeto; a importação cria os engines, mas não conecta):
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --gravar   # atualiza a baseline
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+CAMINHO_BASELINE = Path(__file__).with_name("import_time_baseline.json")
+
+PONTOS_DE_ENTRADA = ["app.main", "app.server", "app.services.celery.celery_app"]
+
+# Pacotes que cada ponto de entrada não deve importar
+PROIBIDOS = {
+    "app.main": ["psycopg2"],  # A API usa o asyncpg; o psycopg2 é só do Celery
+    "app.server": ["sqlalchemy", "app.database"],  # O supervisor apenas cria os workers
+}
+
+
+def medir_importacao(modulo: str) -> dict:
+    """Importa o módulo em um processo novo; retorna {módulo importado: (próprio µs, acumulado µs)}."""
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        capture_output=True, text=True, cwd=Path(__file__).resolve().parent.parent,
+    )
+    if processo.returncode != 0:
+        raise RuntimeError(f"Falha ao importar {modulo}:\n{processo.stderr[-2000:]}")
+
+    tempos = {}
+    for linha in processo.stderr.splitlines():
+        if not linha.startswith("import time:") or "self [us]" in linha:
+            continue
+        proprio, acumulado, nome = linha[len("import time:"):].split("|")
+        tempos[nome.strip()] = (int(proprio), int(acumulado))
+    return tempos
+
+
+def agrupar_por_pacote(tempos: dict) -> dict:
+    """Soma o tempo próprio (µs) dos módulos pelo pacote de topo."""
+    pacotes = defaultdict(int)
+    for nome, (proprio, _) in tempos.items():
+        pacotes[nome.split(".")[0]] += proprio
+    return dict(pacotes)
+
+
+def relatorio(modulo: str, repeticoes: int, maiores: int = 12) -> dict:
+    medicoes = [medir_importacao(modulo) for _ in range(repeticoes)]
+    total_ms = statistics.median(m[modulo][1] for m in medicoes) / 1000
+    pacotes = defaultdict(list)
+    for medicao in medicoes:
+        for pacote, micros in agrupar_por_pacote(medicao).items():
+            pacotes[pacote].append(micros)
+    por_pacote = sorted(
+        ((pacote, statistics.median(valores) / 1000) for pacote, valores in pacotes.items()),
+        key=lambda item: item[1], reverse=True,
+    )
+    return {
+        "total_ms": round(total_ms, 1),
+        "pacotes_ms": {pacote: round(ms, 1) for pacote, ms in por_pacote[:maiores]},
+        "importados_proibidos": [
+            pacote for pacote in PROIBIDOS.get(modulo, []) if any(
+                nome == pacote or nome.startswith(pacote + ".") for nome in medicoes[0]
+            )
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede o tempo de importação dos pontos de entrada.")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--gravar", action="store_true", help="Grava os tempos atuais como baseline")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="Aumento tolerado (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    baseline = json.loads(CAMINHO_BASELINE.read_text()) if CAMINHO_BASELINE.exists() and not args.gravar else {}
+    resultados = {}
+    falhou = False
+    for modulo in PONTOS_DE_ENTRADA:
+        resultado = resultados[modulo] = relatorio(modulo, args.repeticoes)
+        anterior = baseline.get(modulo, {}).get("total_ms")
+        comparacao = f" (baseline {anterior:.0f} ms)" if anterior else ""
+        print(f"{modulo}: {resultado['total_ms']:.0f} ms{comparacao}")
+        for pacote, ms in resultado["pacotes_ms"].items():
+            print(f"    {pacote:<28}{ms:>8.1f} ms")
+
+        if resultado["importados_proibidos"]:
+            falhou = True
+            print(f"    ERRO: importa {', '.join(resultado['importados_proibidos'])}")
+        if anterior and resultado["total_ms"] > anterior * (1 + args.tolerancia):
+            falhou = True
+            print(f"    ERRO: {resultado['total_ms']:.0f} ms acima da baseline (+{args.tolerancia:.0%} tolerado)")
+
+    if args.gravar:
+        CAMINHO_BASELINE.write_text(json.dumps(resultados, indent=2, ensure_ascii=False) + "\n")
+    sys.exit(1 if falhou else 0)
+
+
+if __name__ == "__main__":
+    main()
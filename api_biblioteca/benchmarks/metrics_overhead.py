@@ -0,0 +1,113 @@
+"""
+Mede o custo do MetricasMiddleware por requisição, em microssegundos.
+
+Chama os apps ASGI diretamente (sem rede nem cliente HTTP):
+    app          a rota /healthy de um FastAPI, com e sem o middleware
+    isolado      o middleware em volta de um app ASGI mínimo que só responde, o que
+                 separa o custo do middleware do ruído do roteamento do FastAPI
+
+As variantes com e sem métricas são medidas em rodadas alternadas e o custo é a
+diferença das medianas; "sem consultas" desliga a contagem de comandos SQL
+(METRICS_DB_QUERIES=false com DB_N_PLUS_ONE_THRESHOLD=0).
+
+Uso:
+    python -m benchmarks.metrics_overhead --requisicoes 20000
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from fastapi import FastAPI
+
+from app.services.metrics import MetricasMiddleware
+
+
+class RotaFixa:
+    path = "/healthy"
+
+
+async def app_minimo(scope, receive, send):
+    scope["route"] = RotaFixa
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+def montar_app(com_metricas: bool, contar_consultas: bool = True):
+    app = FastAPI()
+
+    @app.get("/healthy")
+    async def health_check():
+        return {"status": "Healthy"}
+
+    if com_metricas:
+        app.add_middleware(MetricasMiddleware, contar_consultas=contar_consultas)
+    return app
+
+
+def variantes(cenario: str) -> dict:
+    if cenario == "isolado":
+        return {
+            "sem métricas": app_minimo,
+            "com métricas": MetricasMiddleware(app_minimo, contar_consultas=True),
+            "sem consultas": MetricasMiddleware(app_minimo, contar_consultas=False),
+        }
+    return {
+        "sem métricas": montar_app(False),
+        "com métricas": montar_app(True, contar_consultas=True),
+        "sem consultas": montar_app(True, contar_consultas=False),
+    }
+
+
+async def medir(app, total_requisicoes: int) -> list:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/healthy", "raw_path": b"/healthy", "root_path": "",
+        "query_string": b"", "headers": [], "client": ("127.0.0.1", 1), "server": ("benchmark", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    duracoes = []
+    for _ in range(total_requisicoes):
+        inicio = time.perf_counter()
+        await app(dict(scope), receive, send)
+        duracoes.append((time.perf_counter() - inicio) * 1_000_000)
+    return duracoes
+
+
+async def executar(total_requisicoes: int, rodadas: int):
+    for cenario in ("app", "isolado"):
+        apps = variantes(cenario)
+        duracoes = {nome: [] for nome in apps}
+        for app in apps.values():
+            await medir(app, 500)  # Aquecimento (monta a pilha de middlewares e os rótulos)
+        # Rodadas alternadas: o ruído da máquina afeta as variantes por igual
+        for _ in range(rodadas):
+            for nome, app in apps.items():
+                duracoes[nome] += await medir(app, total_requisicoes // rodadas)
+
+        print(f"\n{cenario}")
+        medianas = {nome: statistics.median(valores) for nome, valores in duracoes.items()}
+        for nome, valores in duracoes.items():
+            p99 = statistics.quantiles(valores, n=100)[98]
+            print(f"  {nome:<14} mediana {medianas[nome]:8.1f} µs   p99 {p99:8.1f} µs")
+        for nome in ("com métricas", "sem consultas"):
+            print(f"  Custo do middleware ({nome}): {medianas[nome] - medianas['sem métricas']:.1f} µs por requisição")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede o custo do middleware de métricas.")
+    parser.add_argument("--requisicoes", type=int, default=20000)
+    parser.add_argument("--rodadas", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(executar(args.requisicoes, args.rodadas))
+
+
+if __name__ == "__main__":
+    main()
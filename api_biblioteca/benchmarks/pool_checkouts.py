@@ -0,0 +1,88 @@
+"""
+Mede quantas conexões são retiradas do pool em uma carga mista de requisições.
+
+Requisições negadas (401/403) não devem retirar nenhuma conexão do pool; leituras
+autorizadas retiram uma conexão por requisição.
+
+Uso (com o banco de DATABASE_URL já migrado):
+    python -m benchmarks.pool_checkouts --requisicoes 200
+"""
+
+import argparse
+import asyncio
+import random
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+
+from httpx import ASGITransport, AsyncClient
+from jose import jwt
+
+from app.main import app
+from app.database import estatisticas_pool
+from app.services.security import SECRET_KEY, ALGORITHM
+from app.services.scripts.populate_policy_group_permission import permissoes_admin, permissoes_cliente
+
+
+def gerar_token(user_id: int, grupo_politica: str, permissoes: list) -> str:
+    payload = {
+        "sub": f"{grupo_politica}@benchmark.com",
+        "id": user_id,
+        "grupo_politica": grupo_politica,
+        "permissoes": permissoes,
+        "exp": datetime.now(timezone.utc) + timedelta(minutes=10),
+    }
+    return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def montar_cenarios():
+    admin = {"Authorization": f"Bearer {gerar_token(1, 'admin', permissoes_admin)}"}
+    cliente = {"Authorization": f"Bearer {gerar_token(2, 'cliente', permissoes_cliente)}"}
+    invalido = {"Authorization": "Bearer token-invalido"}
+
+    # (nome, método, rota, headers, corpo json)
+    return [
+        ("catálogo anônimo", "GET", "/livros/", {}, None),
+        ("admin lista usuários", "GET", "/usuarios/", admin, None),
+        ("cliente lista todos os empréstimos", "GET", "/emprestimos/all", cliente, None),
+        ("cliente cria livro", "POST", "/livros/", cliente, {"titulo": "x", "autor": "y", "quantidade_disponivel": 1, "isbn": "0"}),
+        ("cliente lista permissões", "GET", "/permissoes/", cliente, None),
+        ("token inválido", "GET", "/usuarios/", invalido, None),
+    ]
+
+
+async def executar(total_requisicoes: int, semente: int):
+    cenarios = montar_cenarios()
+    sorteio = random.Random(semente)
+    checkouts = defaultdict(int)
+    requisicoes = Counter()
+    status_por_cenario = defaultdict(Counter)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://benchmark") as client:
+        for _ in range(total_requisicoes):
+            nome, metodo, rota, headers, corpo = sorteio.choice(cenarios)
+            antes = estatisticas_pool.checkouts
+            response = await client.request(metodo, rota, headers=headers, json=corpo)
+            checkouts[nome] += estatisticas_pool.checkouts - antes
+            requisicoes[nome] += 1
+            status_por_cenario[nome][response.status_code] += 1
+
+    print(f"{'cenário':<38}{'req':>6}{'checkouts':>11}{'por req':>9}  status")
+    for nome, *_ in cenarios:
+        if not requisicoes[nome]:
+            continue
+        por_requisicao = checkouts[nome] / requisicoes[nome]
+        codigos = ", ".join(f"{codigo}x{qtd}" for codigo, qtd in sorted(status_por_cenario[nome].items()))
+        print(f"{nome:<38}{requisicoes[nome]:>6}{checkouts[nome]:>11}{por_requisicao:>9.2f}  {codigos}")
+    print(f"Total de checkouts: {sum(checkouts.values())} em {total_requisicoes} requisições")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conta checkouts do pool em uma carga mista.")
+    parser.add_argument("--requisicoes", type=int, default=200)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+    asyncio.run(executar(args.requisicoes, args.semente))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Compara requisições por segundo do caminho padrão (objetos ORM validados pelo
+response_model) com o caminho rápido (linhas serializadas pelo pydantic-core)
+em páginas de 100 e 10.000 livros.
+
+O banco fica fora da medição: as duas rotas devolvem dados já carregados em
+memória, para isolar o custo de validação e serialização.
+
+Uso:
+    python -m benchmarks.serialization --segundos 3
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime
+
+from fastapi import FastAPI
+
+from app.models.__all_models import Livro
+from app.schemas.book import LivroOut
+from app.services.serialization import resposta_json
+
+
+def gerar_livros(total: int) -> list:
+    agora = datetime.now()
+    return [
+        Livro(
+            id=i, titulo=f"Livro {i}", autor=f"Autor {i % 500}", genero="Fantasia", editora="Editora",
+            ano_publicacao=2000, numero_paginas=300, quantidade_disponivel=5, isbn=f"isbn-{i}",
+            image_url=None, data_criacao=agora, data_atualizacao=agora,
+        )
+        for i in range(total)
+    ]
+
+
+def montar_app(livros: list) -> FastAPI:
+    app = FastAPI()
+    linhas = [{campo: getattr(livro, campo) for campo in LivroOut.model_fields} for livro in livros]
+
+    @app.get("/padrao", response_model=list[LivroOut])
+    async def padrao():
+        return livros
+
+    @app.get("/rapido", response_model=list[LivroOut])
+    async def rapido():
+        return resposta_json(linhas)
+
+    return app
+
+
+async def medir(app, rota: str, segundos: float) -> tuple:
+    """Chama a rota repetidamente pelo ASGI; retorna (requisições por segundo, bytes da resposta)."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": rota, "raw_path": rota.encode(), "root_path": "",
+        "query_string": b"", "headers": [], "client": ("127.0.0.1", 1), "server": ("benchmark", 80),
+    }
+    tamanho = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal tamanho
+        if message["type"] == "http.response.body":
+            tamanho += len(message.get("body", b""))
+
+    await app(dict(scope), receive, send)  # Aquecimento
+    requisicoes = 0
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < segundos:
+        tamanho = 0
+        await app(dict(scope), receive, send)
+        requisicoes += 1
+    return requisicoes / (time.perf_counter() - inicio), tamanho
+
+
+async def executar(segundos: float):
+    print(f"{'linhas':>7}  {'caminho':<8}{'req/s':>10}{'bytes':>12}")
+    for total in (100, 10_000):
+        app = montar_app(gerar_livros(total))
+        resultados = {}
+        for rota in ("padrao", "rapido"):
+            resultados[rota], tamanho = await medir(app, f"/{rota}", segundos)
+            print(f"{total:>7}  {rota:<8}{resultados[rota]:>10.1f}{tamanho:>12}")
+        print(f"{'':>7}  ganho: {resultados['rapido'] / resultados['padrao']:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara os caminhos de serialização das listagens.")
+    parser.add_argument("--segundos", type=float, default=3, help="Duração de cada medição")
+    args = parser.parse_args()
+    asyncio.run(executar(args.segundos))
+
+
+if __name__ == "__main__":
+    main()
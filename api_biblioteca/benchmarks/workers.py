@@ -0,0 +1,118 @@
+"""
+Teste de carga local: compara 1 worker com N workers do app.server.
+
+Para cada configuração, sobe `python -m app.server` em uma porta livre, aguarda o
+/healthy responder e dispara requisições concorrentes por alguns segundos,
+reportando requisições por segundo e latências p50/p99.
+
+Uso (com o .env do projeto; rotas que usam o banco precisam dele migrado):
+    python -m benchmarks.workers --workers 1 4 --rota /livros/ --concorrencia 64 --segundos 10
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+def porta_livre() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def aguardar_servidor(url: str, limite: float = 30):
+    async with httpx.AsyncClient() as client:
+        inicio = time.monotonic()
+        while time.monotonic() - inicio < limite:
+            try:
+                if (await client.get(f"{url}/healthy")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Servidor não respondeu em {limite:.0f}s")
+
+
+async def gerar_carga(url: str, rota: str, concorrencia: int, segundos: float) -> tuple:
+    latencias = []
+    erros = 0
+    limites = httpx.Limits(max_connections=concorrencia, max_keepalive_connections=concorrencia)
+
+    async with httpx.AsyncClient(base_url=url, limits=limites, timeout=30) as client:
+        fim = time.monotonic() + segundos
+
+        async def usuario_virtual():
+            nonlocal erros
+            while time.monotonic() < fim:
+                inicio = time.perf_counter()
+                try:
+                    response = await client.get(rota)
+                    if response.status_code >= 500:
+                        erros += 1
+                except httpx.TransportError:
+                    erros += 1
+                latencias.append(time.perf_counter() - inicio)
+
+        inicio = time.monotonic()
+        await asyncio.gather(*(usuario_virtual() for _ in range(concorrencia)))
+        duracao = time.monotonic() - inicio
+    return latencias, erros, duracao
+
+
+async def medir(workers: int, rota: str, concorrencia: int, segundos: float) -> dict:
+    porta = porta_livre()
+    url = f"http://127.0.0.1:{porta}"
+    ambiente = {**os.environ, "WEB_CONCURRENCY": str(workers), "PORT": str(porta), "HOST": "127.0.0.1"}
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "app.server"], env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        await aguardar_servidor(url)
+        await gerar_carga(url, rota, concorrencia, 1)  # Aquecimento
+        latencias, erros, duracao = await gerar_carga(url, rota, concorrencia, segundos)
+    finally:
+        processo.send_signal(signal.SIGTERM)
+        processo.wait(timeout=60)
+
+    percentis = statistics.quantiles(latencias, n=100)
+    return {
+        "req_s": len(latencias) / duracao,
+        "p50_ms": percentis[49] * 1000,
+        "p99_ms": percentis[98] * 1000,
+        "erros": erros,
+    }
+
+
+async def executar(lista_workers: list, rota: str, concorrencia: int, segundos: float):
+    print(f"Rota {rota}, {concorrencia} conexões concorrentes, {segundos:.0f}s por configuração")
+    print(f"{'workers':>8}{'req/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'erros':>7}")
+    base = None
+    for workers in lista_workers:
+        resultado = await medir(workers, rota, concorrencia, segundos)
+        base = base or resultado["req_s"]
+        print(
+            f"{workers:>8}{resultado['req_s']:>10.1f}{resultado['p50_ms']:>9.1f}{resultado['p99_ms']:>9.1f}"
+            f"{resultado['erros']:>7}   ({resultado['req_s'] / base:.1f}x)"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara a vazão com 1 e N workers.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 2])
+    parser.add_argument("--rota", default="/healthy")
+    parser.add_argument("--concorrencia", type=int, default=64)
+    parser.add_argument("--segundos", type=float, default=10)
+    args = parser.parse_args()
+    asyncio.run(executar(args.workers, args.rota, args.concorrencia, args.segundos))
+
+
+if __name__ == "__main__":
+    main()
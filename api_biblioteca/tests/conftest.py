@@ -3,13 +3,14 @@ from sqlalchemy import NullPool, insert, select
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, AsyncEngine
 from sqlalchemy.orm import sessionmaker
 import pytest_asyncio
-# import pytest
+import pytest
 import asyncio
+from contextlib import contextmanager
 from fastapi.testclient import TestClient
 from httpx import AsyncClient, ASGITransport
 
 from app.main import app
-from app.database import get_db
+from app.database import get_db, get_db_leitura
 from app.models.__all_models import Base
 from app.models.policy_group import GrupoPolitica as GrupoPoliticaModel
 from app.models.permission import Permissao as PermissaoModel
@@ -17,7 +18,8 @@ from app.models.user import Usuario as UsuarioModel
 from app.models.policy_group_permission import grupo_politica_permissao
 from app.services.scripts.populate_permissions import permissoes  # Importa a lista de permissões
 from app.services.scripts.populate_policy_group_permission import permissoes_admin, permissoes_cliente  # Importa a lista de relacionamento
-from app.services.security import bcrypt_context, create_access_token
+from app.services.security import bcrypt_context, cache_permissoes, create_access_token
+from app.services.query_counter import contar_consultas
 
 from dotenv import load_dotenv
 import os
@@ -130,6 +132,15 @@ async def prepare_test_db():
         await conn.run_sync(Base.metadata.drop_all)  # Limpeza do banco após os testes
 
 
+# O cache de permissões é por processo: limpa entre os testes, já que cada teste
+# desfaz as próprias alterações no banco com rollback
+@pytest.fixture(autouse=True)
+def limpar_cache_permissoes():
+    cache_permissoes.invalidar()
+    yield
+    cache_permissoes.invalidar()
+
+
 # Fixture que cria e gerencia a transação do banco para cada teste
 @pytest_asyncio.fixture(scope="function")
 async def async_session():
@@ -151,6 +162,7 @@ async def client(async_session):
         yield async_session
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_db_leitura] = override_get_db
 
     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
         yield ac
@@ -204,3 +216,16 @@ async def admin_auth_headers(token_admin):
 async def client_auth_headers(token_cliente):
     """Retorna os headers de autorização para um cliente autenticado"""
     return {"Authorization": f"Bearer {token_cliente}"}
+
+# Fixture para limitar o número de comandos SQL de um bloco (detecta regressões N+1)
+@pytest.fixture
+def orcamento_consultas():
+    """Uso: `with orcamento_consultas(2): await client.get(...)`"""
+    @contextmanager
+    def verificar(maximo: int):
+        with contar_consultas() as contador:
+            yield contador
+        assert contador.comandos <= maximo, (
+            f"Orçamento de {maximo} comandos SQL excedido.\n{contador.resumo()}"
+        )
+    return verificar
@@ -72,4 +72,88 @@ async def test_login_sem_credenciais(client: AsyncClient):
     """Teste para tentar login sem enviar credenciais."""
     payload = {}  # Nenhum dado enviado
     response = await client.post("/auth/token", data=payload)
-    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
\ No newline at end of file
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+@pytest.mark.asyncio
+async def test_login_bloqueado_apos_muitas_tentativas(client: AsyncClient):
+    """Teste para garantir que a conta é bloqueada temporariamente após exceder o limite de tentativas."""
+    from app.services.rate_limit import limitador_login
+
+    payload = {
+        "username": "alvo_de_ataque@example.com",
+        "password": "senhaerrada"
+    }
+    for _ in range(limitador_login.limite_conta):
+        response = await client.post("/auth/token", data=payload)
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = await client.post("/auth/token", data=payload)
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert int(response.headers["Retry-After"]) > 0
+
+
+@pytest.mark.asyncio
+async def test_limitador_login_por_ip():
+    """Teste para garantir que o limite por IP vale para qualquer conta."""
+    from app.services.rate_limit import LimitadorLogin, JanelaDeslizanteMemoria
+
+    limitador = LimitadorLogin(JanelaDeslizanteMemoria(), limite_conta=10, limite_ip=2, janela=60)
+    assert await limitador.verificar("a@example.com", "10.0.0.1") == 0
+    assert await limitador.verificar("b@example.com", "10.0.0.1") == 0
+    assert await limitador.verificar("c@example.com", "10.0.0.1") > 0
+    assert await limitador.verificar("c@example.com", "10.0.0.2") == 0
+
+
+@pytest.mark.asyncio
+async def test_limitador_login_conta_so_falhas():
+    """Teste para garantir que logins bem-sucedidos não bloqueiam a própria conta."""
+    from app.services.rate_limit import LimitadorLogin, JanelaDeslizanteMemoria
+
+    limitador = LimitadorLogin(JanelaDeslizanteMemoria(), limite_conta=2, limite_ip=100, janela=60)
+    for _ in range(5):
+        assert await limitador.verificar("a@example.com", "10.0.0.1") == 0
+
+    await limitador.registrar_falha("A@example.com")
+    assert await limitador.verificar("a@example.com", "10.0.0.1") == 0
+    await limitador.registrar_falha("a@example.com")
+    assert await limitador.verificar("a@example.com", "10.0.0.1") > 0
+    assert await limitador.verificar("b@example.com", "10.0.0.1") == 0
+
+
+@pytest.mark.asyncio
+async def test_login_atualiza_hash_com_custo_menor(client: AsyncClient, async_session, monkeypatch):
+    """Teste para garantir que um hash com custo abaixo do atual é regravado após o login."""
+    from passlib.context import CryptContext
+    from app.models.user import Usuario as UsuarioModel
+    from app.services import security
+
+    usuario_antigo = UsuarioModel(
+        nome="Usuário Antigo",
+        email="hash_antigo@example.com",
+        senha_hash=CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("senhaAntiga123"),
+        grupo_politica="cliente"
+    )
+    async_session.add(usuario_antigo)
+    await async_session.commit()
+
+    rehashes = []
+
+    async def fake_rehash_senha(user_id: int, password: str):
+        rehashes.append((user_id, password))
+
+    monkeypatch.setattr(security, "rehash_senha", fake_rehash_senha)
+    # Custo atual maior que o do hash armazenado
+    monkeypatch.setattr(security, "bcrypt_context", CryptContext(schemes=["bcrypt"], bcrypt__rounds=5, bcrypt__min_rounds=5))
+
+    payload = {"username": "hash_antigo@example.com", "password": "senhaAntiga123"}
+    response = await client.post("/auth/token", data=payload)
+    assert response.status_code == status.HTTP_200_OK
+    assert rehashes == [(usuario_antigo.id, "senhaAntiga123")]
+
+
+def test_calibrar_custo_bcrypt():
+    """Teste para garantir que a calibração respeita os limites de custo."""
+    from app.services.security import calibrar_custo_bcrypt, BCRYPT_MIN_ROUNDS, BCRYPT_MAX_ROUNDS
+
+    assert calibrar_custo_bcrypt(alvo_ms=0, amostras=1) == BCRYPT_MIN_ROUNDS
+    assert calibrar_custo_bcrypt(alvo_ms=10**9, amostras=1) == BCRYPT_MAX_ROUNDS
@@ -180,3 +180,24 @@ async def test_deletar_livro(client: AsyncClient, async_session: AsyncSession, a
     response = await client.get(f"/livros/{livro.id}", headers=admin_auth_headers)
     assert response.status_code == status.HTTP_404_NOT_FOUND
 
+
+
+# A listagem de livros faz apenas a contagem e a página
+@pytest.mark.asyncio
+async def test_orcamento_consultas_listar_livros(client: AsyncClient, orcamento_consultas):
+    with orcamento_consultas(2):
+        response = await client.get("/livros/?limit=100")
+    assert response.status_code == status.HTTP_200_OK
+
+
+# A listagem serializada direto das linhas tem o mesmo formato do response_model
+@pytest.mark.asyncio
+async def test_listar_livros_mesmo_formato_do_response_model(client: AsyncClient, admin_auth_headers):
+    livro = {"titulo": "Formato", "autor": "Autor", "quantidade_disponivel": 1, "isbn": "formato-1"}
+    response = await client.post("/livros/", json=livro, headers=admin_auth_headers)
+    assert response.status_code == status.HTTP_201_CREATED
+    livro_id = response.json()["id"]
+
+    listagem = (await client.get("/livros/?titulo=Formato")).json()
+    detalhe = (await client.get(f"/livros/{livro_id}")).json()
+    assert listagem["livros"] == [detalhe]
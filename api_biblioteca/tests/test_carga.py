@@ -0,0 +1,58 @@
+import zlib
+
+import pytest
+from httpx import AsyncClient
+
+from benchmarks.carga import comparar, gerar_dados, gerar_png, resumir, rodar_cenario
+
+
+# A mesma semente gera exatamente a mesma massa de dados
+def test_massa_de_dados_deterministica():
+    dados = gerar_dados(semente=7, livros=200, usuarios=50)
+    assert dados == gerar_dados(semente=7, livros=200, usuarios=50)
+    assert dados != gerar_dados(semente=8, livros=200, usuarios=50)
+    assert len(dados["livros"]) == 200 and len(dados["usuarios"]) == 50
+    assert len({livro["isbn"] for livro in dados["livros"]}) == 200
+    assert all(1 <= emprestimo["livro_id"] <= 200 for emprestimo in dados["emprestimos"])
+
+
+# A popularidade dos empréstimos é concentrada nos primeiros livros
+def test_emprestimos_concentrados_nos_populares():
+    emprestimos = gerar_dados(semente=1, livros=1000, usuarios=500)["emprestimos"]
+    populares = sum(1 for emprestimo in emprestimos if emprestimo["livro_id"] <= 10)
+    assert populares > len(emprestimos) / 2
+
+
+def test_png_valido():
+    png = gerar_png(4, 3, semente=1)
+    assert png.startswith(b"\x89PNG\r\n\x1a\n")
+    inicio_idat = png.index(b"IDAT") + 4
+    tamanho = int.from_bytes(png[inicio_idat - 8:inicio_idat - 4], "big")
+    assert len(zlib.decompress(png[inicio_idat:inicio_idat + tamanho])) == 3 * (4 + 1)
+
+
+def test_resumo_percentis():
+    resumo = resumir([i / 1000 for i in range(1, 101)], erros=2, duracao=2.0)
+    assert resumo["requisicoes"] == 100
+    assert resumo["req_s"] == 50.0
+    assert resumo["p50_ms"] == pytest.approx(50.5)
+    assert resumo["p95_ms"] == pytest.approx(95.05)
+    assert resumo["erros"] == 2
+
+
+def test_comparacao_com_baseline():
+    base = {"req_s": 100.0, "p95_ms": 50.0, "erros": 0}
+    assert comparar({"req_s": 95.0, "p95_ms": 55.0, "erros": 0}, base, tolerancia=0.2) == []
+    problemas = comparar({"req_s": 70.0, "p95_ms": 80.0, "erros": 3}, base, tolerancia=0.2)
+    assert len(problemas) == 3
+    assert comparar({"req_s": 1.0, "p95_ms": 999.0, "erros": 0}, None, tolerancia=0.2) == []
+
+
+# O cenário de catálogo roda pelo ASGI sem erros (fumaça)
+@pytest.mark.asyncio
+async def test_cenario_catalogo(client: AsyncClient):
+    resultado = await rodar_cenario(
+        client, "catalogo", {"total_livros": 10, "total_usuarios": 1}, concorrencia=2, segundos=0.2, semente=1
+    )
+    assert resultado["requisicoes"] > 0
+    assert resultado["erros"] == 0
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert, select, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.database import RoteadorReplicas, SessaoRoteada, criar_engine
+from app.models.__all_models import Base
+from app.models.book import Livro as LivroModel
+
+
+# Primário e réplica em processo: dois bancos SQLite com conteúdos diferentes
+@pytest_asyncio.fixture
+async def primario_e_replica(tmp_path):
+    primario = criar_engine(f"sqlite+aiosqlite:///{tmp_path / 'primario.db'}")
+    replica = criar_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+    for engine, titulo in ((primario, "Livro do primário"), (replica, "Livro da réplica")):
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(LivroModel).values(titulo=titulo, autor="Autor", quantidade_disponivel=1, isbn=titulo))
+    yield primario, replica
+    await primario.dispose()
+    await replica.dispose()
+
+
+# Leituras vão para a réplica até a primeira escrita da sessão
+@pytest.mark.asyncio
+async def test_sessao_roteada_le_da_replica_ate_escrever(primario_e_replica):
+    primario, replica = primario_e_replica
+    SessionLocal = sessionmaker(bind=primario, class_=AsyncSession, sync_session_class=SessaoRoteada, expire_on_commit=False)
+
+    async with SessionLocal() as session:
+        session.info["replica"] = replica
+        titulos = (await session.execute(select(LivroModel.titulo))).scalars().all()
+        assert titulos == ["Livro da réplica"]
+
+        session.add(LivroModel(titulo="Novo livro", autor="Autor", quantidade_disponivel=1, isbn="novo"))
+        await session.flush()
+
+        titulos = (await session.execute(select(LivroModel.titulo))).scalars().all()
+        assert titulos == ["Livro do primário", "Novo livro"]
+        await session.rollback()
+
+
+# Sem réplica definida, a sessão usa sempre o primário
+@pytest.mark.asyncio
+async def test_sessao_roteada_sem_replica_usa_primario(primario_e_replica):
+    primario, _ = primario_e_replica
+    SessionLocal = sessionmaker(bind=primario, class_=AsyncSession, sync_session_class=SessaoRoteada)
+
+    async with SessionLocal() as session:
+        titulos = (await session.execute(select(LivroModel.titulo))).scalars().all()
+        assert titulos == ["Livro do primário"]
+
+
+# Réplicas indisponíveis saem do round-robin
+@pytest.mark.asyncio
+async def test_roteador_replicas_ignora_replica_indisponivel(tmp_path):
+    roteador = RoteadorReplicas([
+        f"sqlite+aiosqlite:///{tmp_path / 'replica1.db'}",
+        f"sqlite+aiosqlite:///{tmp_path / 'replica2.db'}",
+        f"sqlite+aiosqlite:///{tmp_path / 'inexistente' / 'replica3.db'}",
+    ])
+    await roteador.verificar()
+    assert len(roteador.saudaveis) == 2
+
+    escolhidas = {roteador.proxima() for _ in range(4)}
+    assert escolhidas == set(roteador.saudaveis)
+
+    roteador.marcar_falha(roteador.saudaveis[0])
+    roteador.marcar_falha(roteador.saudaveis[0])
+    assert roteador.proxima() is None
+    await roteador.dispose()
+
+
+# Erros do comando (statement_timeout, SQL inválido) não tiram a réplica do round-robin; falhas de conexão sim
+@pytest.mark.asyncio
+async def test_roteador_replicas_so_falha_de_conexao_marca_a_replica(tmp_path):
+    roteador = RoteadorReplicas([f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}"])
+    replica = roteador.replicas[0]
+    # O SQLite não perde conexões: o dialeto passa a tratar esse erro como queda da conexão
+    replica.sync_engine.dialect.is_disconnect = lambda erro, conexao, cursor: "conexao_perdida" in str(erro)
+
+    async with replica.connect() as conn:
+        with pytest.raises(DBAPIError):
+            await conn.execute(text("SELECT coluna_inexistente"))
+    assert roteador.saudaveis == [replica]
+
+    with pytest.raises(DBAPIError):
+        async with replica.connect() as conn:
+            await conn.execute(text("SELECT conexao_perdida"))
+    assert roteador.saudaveis == []
+    await roteador.dispose()
+
+
+# A verificação em segundo plano devolve ao round-robin a réplica que voltou
+@pytest.mark.asyncio
+async def test_roteador_replicas_verifica_em_segundo_plano(tmp_path):
+    roteador = RoteadorReplicas([f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}"], intervalo_verificacao=0.01)
+    roteador.marcar_falha(roteador.replicas[0])
+    assert roteador.proxima() is None
+
+    roteador.iniciar_verificacao()
+    for _ in range(100):
+        if roteador.saudaveis:
+            break
+        await asyncio.sleep(0.01)
+    assert roteador.proxima() is roteador.replicas[0]
+    await roteador.dispose()
+    assert roteador._tarefa is None
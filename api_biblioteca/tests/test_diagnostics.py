@@ -0,0 +1,119 @@
+import asyncio
+import os
+
+import pytest
+from httpx import AsyncClient
+from fastapi import status
+from sqlalchemy import text
+
+from app.database import EstatisticasPool, argumentos_conexao, criar_engine
+
+
+# Admin pode consultar as estatísticas do pool
+@pytest.mark.asyncio
+async def test_estatisticas_pool_admin(client: AsyncClient, admin_auth_headers):
+    response = await client.get("/diagnostico/pool", headers=admin_auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert {"checkouts", "espera_media_ms", "espera_max_ms"} <= response.json().keys()
+
+
+# Cliente NÃO pode consultar as estatísticas do pool
+@pytest.mark.asyncio
+async def test_estatisticas_pool_cliente(client: AsyncClient, client_auth_headers):
+    response = await client.get("/diagnostico/pool", headers=client_auth_headers)
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+# O engine criado pela fábrica registra checkouts e tempo de espera do pool
+@pytest.mark.asyncio
+async def test_criar_engine_registra_estatisticas(tmp_path):
+    estatisticas = EstatisticasPool()
+    engine = criar_engine(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}", estatisticas, pool_size=2)
+    assert engine.echo is False
+
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+        assert estatisticas.snapshot()["em_uso"] == 1
+
+    dados = estatisticas.snapshot()
+    assert dados["checkouts"] == 1
+    assert dados["tamanho"] == 2
+    assert dados["em_uso"] == 0
+    assert estatisticas.esperas == 1
+    await engine.dispose()
+
+
+# Admin pode consultar as consultas lentas; cliente não
+@pytest.mark.asyncio
+async def test_consultas_lentas_somente_admin(client: AsyncClient, admin_auth_headers, client_auth_headers):
+    response = await client.get("/diagnostico/consultas-lentas", headers=admin_auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert {"limiar_ms", "taxa_explain", "consultas"} <= response.json().keys()
+
+    response = await client.get("/diagnostico/consultas-lentas", headers=client_auth_headers)
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+# Comandos acima do limiar entram no buffer circular com os textos mascarados
+@pytest.mark.asyncio
+async def test_registro_consultas_lentas(tmp_path):
+    from app.services.slow_query import RegistroConsultasLentas
+
+    registro = RegistroConsultasLentas(limiar_ms=0.000001, taxa_explain=1.0, tamanho=2)
+    engine = criar_engine(f"sqlite+aiosqlite:///{tmp_path / 'lentas.db'}")
+    registro.instalar(engine)
+
+    async with engine.connect() as conn:
+        for numero in range(3):
+            await conn.execute(text("SELECT :email, :numero"), {"email": "cliente@biblioteca.com", "numero": numero})
+
+    consultas = registro.snapshot()["consultas"]
+    assert len(consultas) == 2
+    assert consultas[0]["parametros"] == ["<str:22>", 2]
+    assert consultas[0]["origem"] == "desconhecida"
+    assert consultas[0]["plano"] is None  # EXPLAIN ANALYZE apenas no Postgres
+    await engine.dispose()
+
+
+# EXPLAIN além do limite de simultâneos é descartado; a vaga volta quando o anterior termina
+@pytest.mark.asyncio
+async def test_explain_limitado(tmp_path):
+    from app.services.slow_query import RegistroConsultasLentas
+
+    registro = RegistroConsultasLentas(limiar_ms=1, taxa_explain=1.0, max_explains=1)
+    engine = criar_engine(f"sqlite+aiosqlite:///{tmp_path / 'lentas.db'}")
+    registro.instalar(engine)
+
+    registros = [{}, {}, {}]
+    for numero in range(2):
+        registro._agendar_explain(engine.sync_engine, "SELECT 1", (), registros[numero])
+    assert registros[1]["erro_plano"].startswith("EXPLAIN descartado")
+    await asyncio.gather(*registro._tarefas)
+    assert not registros[0]["erro_plano"].startswith("EXPLAIN descartado")  # Erro do SQLite, sem EXPLAIN ANALYZE
+
+    registro._agendar_explain(engine.sync_engine, "SELECT 1", (), registros[2])
+    await asyncio.gather(*registro._tarefas)
+    assert not registros[2]["erro_plano"].startswith("EXPLAIN descartado")
+    await registro.dispose()
+    await engine.dispose()
+
+
+# O EXPLAIN ANALYZE roda com as opções de conexão do engine, inclusive o statement_timeout
+@pytest.mark.asyncio
+@pytest.mark.skipif(not os.getenv("PLAN_DATABASE_URL"), reason="PLAN_DATABASE_URL não configurada")
+async def test_explain_com_statement_timeout():
+    from app.services.slow_query import RegistroConsultasLentas
+
+    registro = RegistroConsultasLentas(limiar_ms=100, taxa_explain=1.0)
+    engine = criar_engine(os.getenv("PLAN_DATABASE_URL"))
+    registro.instalar(engine, argumentos_conexao(engine.dialect.driver, 150))
+
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT pg_sleep(0.3)"))
+    await asyncio.gather(*registro._tarefas)
+
+    consulta = registro.snapshot()["consultas"][0]
+    assert consulta["plano"] is None
+    assert "statement timeout" in consulta["erro_plano"]
+    await registro.dispose()
+    await engine.dispose()
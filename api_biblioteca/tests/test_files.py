@@ -1,7 +1,20 @@
+import asyncio
+import hashlib
+import io
+import os
+import socket
+
 import pytest
+import pytest_asyncio
+import uvicorn
+from fastapi import UploadFile
 from httpx import AsyncClient
+from prometheus_client import REGISTRY
+from python_multipart.multipart import MultipartParser
+from starlette.datastructures import Headers
 
 from app.models.book import Livro as LivroModel
+from app.services.images_client import ClienteImagens
 
 # O monkeypatch sobrescreverá a função upload_imagem usada nessa rota.
 @pytest.mark.asyncio
@@ -84,3 +97,123 @@ async def test_upload_book_cover_image(client, admin_auth_headers, monkeypatch,
 
     # Verifica se a URL da imagem foi atualizada conforme o fake_upload_imagem
     assert response_data.get("image_url") == "http://images_service:8000/files/book_cover/dummy.png"
+
+
+# Servidor HTTP real (uvicorn em uma porta livre) que confere o multipart recebido
+@pytest_asyncio.fixture
+async def images_service_falso():
+    recebidos = []
+
+    async def app(scope, receive, send):
+        corpo = b""
+        while True:
+            mensagem = await receive()
+            corpo += mensagem.get("body", b"")
+            if not mensagem.get("more_body"):
+                break
+        recebidos.append((dict(scope["headers"]), corpo))
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": b'{"file_url": "http://images_service:8000/files/x.png"}'})
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        porta = s.getsockname()[1]
+    servidor = uvicorn.Server(uvicorn.Config(app, port=porta, lifespan="off", log_level="warning"))
+    tarefa = asyncio.create_task(servidor.serve())
+    while not servidor.started:
+        await asyncio.sleep(0.01)
+    yield f"http://127.0.0.1:{porta}", recebidos
+    servidor.should_exit = True
+    await tarefa
+
+
+def valor_metrica(nome: str, **labels) -> float:
+    return REGISTRY.get_sample_value(nome, labels) or 0.0
+
+
+# O corpo é enviado em streaming com Content-Length e as conexões são reaproveitadas
+@pytest.mark.asyncio
+async def test_cliente_imagens_reaproveita_conexao(images_service_falso, monkeypatch):
+    url, recebidos = images_service_falso
+    monkeypatch.setattr("app.services.images_client.IMAGES_SERVICE_URL", url)
+    monkeypatch.setattr("app.services.images_client.TAMANHO_BLOCO", 1000)
+    cliente = ClienteImagens()
+    novas = valor_metrica("images_service_connections_total", reused="false")
+    reaproveitadas = valor_metrica("images_service_connections_total", reused="true")
+
+    conteudo = os.urandom(10_000)
+    for _ in range(3):
+        arquivo = UploadFile(io.BytesIO(conteudo), size=len(conteudo), filename='capa "1".png',
+                             headers=Headers({"content-type": "image/png"}))
+        response = await cliente.enviar(arquivo, "book_cover")
+        assert response.status_code == 200
+    await cliente.encerrar()
+
+    assert valor_metrica("images_service_connections_total", reused="false") - novas == 1
+    assert valor_metrica("images_service_connections_total", reused="true") - reaproveitadas == 2
+
+    headers, corpo = recebidos[0]
+    assert int(headers[b"content-length"]) == len(corpo)
+    assert headers[b"image-category"] == b"book_cover"
+    assert headers[b"x-content-sha256"].decode() == hashlib.sha256(conteudo).hexdigest()
+    boundary = headers[b"content-type"].split(b"boundary=")[1]
+    partes = []
+    parser = MultipartParser(boundary, {"on_part_data": lambda dados, inicio, fim: partes.append(dados[inicio:fim])})
+    parser.write(corpo)
+    parser.finalize()
+    assert b"".join(partes) == conteudo
+    assert b'filename="capa %221%22.png"' in corpo
+
+
+# As miniaturas geradas pelo images_service pertencem ao original na limpeza de órfãos
+def test_miniaturas_associadas_ao_original():
+    from app.services.celery.orphan_images import nome_original
+
+    assert nome_original("d330819e695d4f41.jpg") == "d330819e695d4f41"
+    assert nome_original("d330819e695d4f41_150.avif") == "d330819e695d4f41"
+    assert nome_original("d330819e695d4f41_600.jpg") == "d330819e695d4f41"
+
+
+# Ao trocar a foto, a anterior perde a referência no images_service
+@pytest.mark.asyncio
+async def test_troca_de_foto_libera_a_anterior(client, admin_auth_headers, monkeypatch):
+    urls = iter(["http://images_service:8000/files/profile/a.png", "http://images_service:8000/files/profile/b.png"])
+    liberadas = []
+
+    async def fake_upload_imagem(file, category: str):
+        class DummyResponse:
+            status_code = 200
+            url = next(urls)
+
+            def json(self):
+                return {"file_url": self.url}
+        return DummyResponse()
+
+    async def fake_liberar(file_url):
+        liberadas.append(file_url)
+
+    monkeypatch.setattr("app.routers.files.upload_imagem", fake_upload_imagem)
+    monkeypatch.setattr("app.routers.files.cliente_imagens.liberar", fake_liberar)
+
+    for _ in range(2):
+        response = await client.post("/images/profile/1", files={"file": ("f.png", b"x", "image/png")}, headers=admin_auth_headers)
+        assert response.status_code == 200
+    assert liberadas == ["http://images_service:8000/files/profile/a.png"]
+
+
+# Conteúdo recusado pelo images_service (não é imagem, pixels demais) volta como 400, sem alterar o perfil
+@pytest.mark.asyncio
+async def test_imagem_recusada_pelo_images_service(client, admin_auth_headers, monkeypatch):
+    async def fake_upload_imagem(file, category: str):
+        class DummyResponse:
+            status_code = 400
+
+            def json(self):
+                return {"detail": "Conteúdo não corresponde a um tipo permitido"}
+        return DummyResponse()
+
+    monkeypatch.setattr("app.routers.files.upload_imagem", fake_upload_imagem)
+
+    response = await client.post("/images/profile/1", files={"file": ("f.png", b"texto", "image/png")}, headers=admin_auth_headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Conteúdo não corresponde a um tipo permitido"
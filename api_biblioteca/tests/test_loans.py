@@ -175,4 +175,53 @@ async def test_deletar_emprestimo(client: AsyncClient, admin_auth_headers):
 
     # Verificar que o emprestimo foi deletado
     response_verificar = await client.get(f"/emprestimos/{emprestimo_id}", headers=admin_auth_headers)
-    assert response_verificar.status_code == status.HTTP_404_NOT_FOUND
\ No newline at end of file
+    assert response_verificar.status_code == status.HTTP_404_NOT_FOUND
+
+# Requisições negadas não devem abrir sessão com o banco
+@pytest.mark.asyncio
+async def test_permissao_negada_nao_abre_sessao(client: AsyncClient, client_auth_headers, async_session):
+    from app.main import app
+    from app.database import get_db, get_db_leitura
+
+    sessoes_abertas = []
+
+    async def override_get_db():
+        sessoes_abertas.append(async_session)
+        yield async_session
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_db_leitura] = override_get_db
+
+    response = await client.get("/emprestimos/all", headers=client_auth_headers)
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    assert sessoes_abertas == []
+
+
+# A listagem de empréstimos não pode fazer uma consulta por linha (N+1)
+@pytest.mark.asyncio
+async def test_orcamento_consultas_listar_emprestimos(client: AsyncClient, async_session: AsyncSession, admin_auth_headers, client_auth_headers, orcamento_consultas):
+    from app.models.book import Livro as LivroModel
+    from app.models.loan import Emprestimo as EmprestimoModel
+
+    livros = [
+        LivroModel(titulo=f"Livro {i}", autor="Autor", quantidade_disponivel=1, isbn=f"orcamento-{i}")
+        for i in range(10)
+    ]
+    async_session.add_all(livros)
+    await async_session.flush()
+    async_session.add_all([
+        EmprestimoModel(usuario_id=2, livro_id=livro.id, data_devolucao=datetime.now() + timedelta(days=7), status="Ativo")
+        for livro in livros
+    ])
+    await async_session.commit()
+    async_session.expunge_all()  # Garante que os livros não venham do identity map da sessão
+
+    with orcamento_consultas(2):  # Empréstimos + livros (selectinload)
+        response = await client.get("/emprestimos/", headers=client_auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()) >= 10
+
+    with orcamento_consultas(1):
+        response = await client.get("/emprestimos/all", headers=admin_auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()) >= 10
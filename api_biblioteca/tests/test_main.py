@@ -1,10 +1,94 @@
+from benchmarks.import_time import medir_importacao
 from fastapi.testclient import TestClient
 from app.main import app
-from fastapi import status
+from fastapi import Response, status
 
 client = TestClient(app)
 
 def test_return_health_check():
     response = client.get('/healthy')
     assert response.status_code == status.HTTP_200_OK
-    assert response.json() == {'status': 'Healthy'}
\ No newline at end of file
+    assert response.json() == {'status': 'Healthy'}
+
+def test_metricas_prometheus():
+    client.get('/healthy')
+    response = client.get('/metrics')
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers['content-type'].startswith('text/plain')
+    assert 'http_request_duration_seconds_count{method="GET",route="/healthy"}' in response.text
+    assert 'http_requests_total{method="GET",route="/healthy",status="200"}' in response.text
+
+
+# Um worker que encerra (reciclado ou reiniciado pelo SIGHUP) deixa de somar nos gauges "livesum"
+def test_worker_encerrado_sai_dos_gauges(tmp_path, monkeypatch):
+    from app.services.metrics import descartar_metricas_processo
+
+    monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(tmp_path))
+    for arquivo in ('gauge_livesum_4242.db', 'gauge_livesum_4343.db', 'counter_4242.db'):
+        (tmp_path / arquivo).touch()
+    descartar_metricas_processo(4242)
+    assert sorted(arquivo.name for arquivo in tmp_path.iterdir()) == ['counter_4242.db', 'gauge_livesum_4343.db']
+
+
+def test_compressao_negociada_pelo_accept_encoding():
+    from app.services.compression import CompressaoMiddleware
+    from fastapi import FastAPI
+    from fastapi.responses import StreamingResponse
+
+    app_teste = FastAPI()
+    app_teste.add_middleware(CompressaoMiddleware, codificacoes=["gzip"], tamanho_minimo=500)
+    livros = [{"id": i, "titulo": f"Livro {i}"} for i in range(200)]
+
+    @app_teste.get("/grande")
+    def grande():
+        return livros
+
+    @app_teste.get("/pequena")
+    def pequena():
+        return {"status": "ok"}
+
+    @app_teste.get("/streaming")
+    def streaming():
+        return StreamingResponse((f"linha {i}\n" for i in range(100)), media_type="text/plain")
+
+    @app_teste.get("/binario")
+    def binario():
+        return Response(content=b"\x00" * 2000, media_type="application/octet-stream")
+
+    cliente = TestClient(app_teste)
+
+    response = cliente.get('/grande', headers={'Accept-Encoding': 'br;q=1, gzip;q=0.5'})
+    assert response.headers['content-encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['vary']
+    assert int(response.headers['content-length']) < len(response.content)
+    assert response.json() == livros
+
+    response = cliente.get('/grande', headers={'Accept-Encoding': 'identity'})
+    assert 'content-encoding' not in response.headers
+
+    response = cliente.get('/pequena', headers={'Accept-Encoding': 'gzip'})
+    assert 'content-encoding' not in response.headers
+
+    response = cliente.get('/binario', headers={'Accept-Encoding': 'gzip'})
+    assert 'content-encoding' not in response.headers
+
+    response = cliente.get('/streaming', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['content-encoding'] == 'gzip'
+    assert 'content-length' not in response.headers
+    assert response.text == ''.join(f"linha {i}\n" for i in range(100))
+
+
+def test_negociar_codificacao():
+    from app.services.compression import negociar_codificacao
+
+    assert negociar_codificacao('gzip, br, zstd', ['zstd', 'br', 'gzip']) == 'zstd'
+    assert negociar_codificacao('gzip, br;q=0', ['br', 'gzip']) == 'gzip'
+    assert negociar_codificacao('*', ['br', 'gzip']) == 'br'
+    assert negociar_codificacao('', ['gzip']) is None
+
+
+# A API não carrega o psycopg2 (driver síncrono usado apenas pelo Celery)
+def test_api_nao_importa_psycopg2():
+    importados = medir_importacao("app.main")
+    assert "app.main" in importados
+    assert not any(nome == "psycopg2" or nome.startswith("psycopg2.") for nome in importados)
@@ -0,0 +1,174 @@
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.__all_models import Base
+from app.models.book import Livro
+from app.models.policy_group import GrupoPolitica
+from app.models.user import Usuario
+from app.services.celery import orphan_images
+from app.services.storage_backend import ArmazenamentoLocal
+
+BASE = "http://images_service:8000/files"
+ANTIGO = time.time() - 2 * 86400
+
+
+def criar_arquivo(diretorio, nome, mtime=ANTIGO):
+    caminho = diretorio / nome
+    caminho.write_bytes(b"x")
+    os.utime(caminho, (mtime, mtime))
+    return caminho
+
+
+# Banco síncrono e diretório de uploads em um diretório temporário (o upload é relativo ao cwd)
+@pytest.fixture
+def ambiente(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    engine = create_engine(f"sqlite:///{tmp_path / 'celery.db'}")
+    Base.metadata.create_all(engine)
+    SessionLocal = sessionmaker(bind=engine, autoflush=False)
+    monkeypatch.setattr("app.services.celery.celery_app.SessionLocalCelery", SessionLocal)
+
+    capas = tmp_path / "upload" / "book_cover"
+    perfis = tmp_path / "upload" / "profile"
+    capas.mkdir(parents=True)
+    perfis.mkdir(parents=True)
+    yield SessionLocal, capas, perfis
+    engine.dispose()
+
+
+def test_remove_somente_orfas_antigas(ambiente):
+    from app.services.celery.celery_app import limpar_imagens_orfas
+
+    SessionLocal, capas, perfis = ambiente
+    with SessionLocal() as session:
+        session.add(GrupoPolitica(nome="cliente"))
+        session.add(Livro(titulo="A", autor="B", quantidade_disponivel=1, isbn="1", image_url=f"{BASE}/book_cover/usada.png"))
+        session.add(Livro(titulo="C", autor="D", quantidade_disponivel=1, isbn="2", image_url="http://cdn.antigo/capas/legada.jpg"))
+        session.add(Usuario(nome="U", email="u@t.com", senha_hash="x", grupo_politica="cliente", profile_picture_url=f"{BASE}/profile/foto.jpg"))
+        session.commit()
+
+    for nome in ["usada.png", "usada_150.webp", "legada.jpg", "orfa.png", "orfa_150.avif", "orfa_300.png.part"]:
+        criar_arquivo(capas, nome)
+    criar_arquivo(capas, "recente.png", mtime=time.time())  # Upload cujo commit ainda não chegou
+    for nome in ["foto.jpg", "foto_600.avif", "usada.png"]:  # Mesmo nome em outra categoria não conta
+        criar_arquivo(perfis, nome)
+
+    assert limpar_imagens_orfas().startswith("Arquivos órfãos removidos: 4")
+    assert sorted(os.listdir(capas)) == ["legada.jpg", "recente.png", "usada.png", "usada_150.webp"]
+    assert sorted(os.listdir(perfis)) == ["foto.jpg", "foto_600.avif"]
+
+
+def test_cursor_retoma_e_volta_ao_inicio(ambiente, monkeypatch):
+    from app.services.celery.celery_app import limpar_imagens_orfas
+
+    _, capas, _ = ambiente
+    monkeypatch.setattr(orphan_images, "ORPHAN_FILES_PER_RUN", 2)
+    monkeypatch.setattr(orphan_images, "ORPHAN_BATCH_SIZE", 1)
+    for nome in ["a.png", "b.png", "c.png"]:
+        criar_arquivo(capas, nome)
+
+    limpar_imagens_orfas()
+    assert sorted(os.listdir(capas)) == ["c.png"]
+    assert orphan_images.ler_cursores()["book_cover"] == "b.png"
+
+    # Continua depois do cursor e, ao chegar no fim do diretório, recomeça
+    criar_arquivo(capas, "a2.png")
+    limpar_imagens_orfas()
+    assert sorted(os.listdir(capas)) == ["a2.png"]
+    assert orphan_images.ler_cursores()["book_cover"] == ""
+
+    limpar_imagens_orfas()
+    assert os.listdir(capas) == []
+
+
+# Uma consulta por lote de nomes, sem carregar todas as URLs do banco
+def test_consultas_em_lotes(ambiente, monkeypatch, orcamento_consultas):
+    SessionLocal, capas, _ = ambiente
+    monkeypatch.setattr(orphan_images, "ORPHAN_BATCH_SIZE", 10)
+    for i in range(35):
+        criar_arquivo(capas, f"{i:02d}.png")
+
+    with SessionLocal() as session, orcamento_consultas(5) as contador:
+        removidos, cursor = orphan_images.limpar_categoria(session, ArmazenamentoLocal("upload"), "book_cover", "")
+
+    assert (removidos, cursor) == (35, "")
+    assert contador.idas_ao_banco == 5  # URLs fora do padrão + 4 lotes
+
+
+# Layout fragmentado (<categoria>/ab/cd/<arquivo>): percorrido em ordem, a partir do cursor
+def test_layout_fragmentado(ambiente, monkeypatch):
+    SessionLocal, capas, _ = ambiente
+    arquivos = ArmazenamentoLocal("upload")
+    usada, orfa = "a" * 64, "b" * 64
+    with SessionLocal() as session:
+        session.add(Livro(titulo="A", autor="B", quantidade_disponivel=1, isbn="1", image_url=f"{BASE}/book_cover/aa/aa/{usada}.png"))
+        session.commit()
+
+    for nome in [f"{usada}.png", f"{usada}_150.webp", f"{orfa}.png", f"{orfa}_150.webp"]:
+        diretorio = capas / orphan_images.fragmento(nome)
+        diretorio.mkdir(parents=True, exist_ok=True)
+        criar_arquivo(diretorio, nome)
+
+    monkeypatch.setattr(orphan_images, "ORPHAN_FILES_PER_RUN", 3)
+    with SessionLocal() as session:
+        removidos, cursor = orphan_images.limpar_categoria(session, arquivos, "book_cover", "")
+        assert (removidos, cursor) == (1, f"bb/bb/{orfa}.png")
+        removidos, cursor = orphan_images.limpar_categoria(session, arquivos, "book_cover", cursor)
+        assert (removidos, cursor) == (1, "")
+
+    assert sorted(os.listdir(capas / "aa" / "aa")) == [f"{usada}.png", f"{usada}_150.webp"]
+    assert os.listdir(capas / "bb" / "bb") == []
+
+
+def criar_referencias(diretorio, contagens: dict):
+    """SQLite de referências como o images_service o cria (upload/.meta/referencias.sqlite3)."""
+    (diretorio / ".meta").mkdir(exist_ok=True)
+    conn = sqlite3.connect(diretorio / ".meta" / "referencias.sqlite3", isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE referencias (chave TEXT PRIMARY KEY, contagem INTEGER NOT NULL)")
+    conn.executemany("INSERT INTO referencias VALUES (?, ?)", contagens.items())
+    return conn
+
+
+# A contagem da órfã sai junto com o arquivo; a das outras fica
+def test_remove_a_contagem_da_orfa(ambiente):
+    _, capas, _ = ambiente
+    orfa, outra = "b" * 64, "c" * 64
+    conn = criar_referencias(capas.parent, {f"book_cover/{orfa}.png": 1, f"book_cover/{outra}.png": 2})
+    diretorio = capas / orphan_images.fragmento(orfa)
+    diretorio.mkdir(parents=True)
+    criar_arquivo(diretorio, f"{orfa}.png")
+
+    assert orphan_images.remover_se_antigo(ArmazenamentoLocal("upload"), f"book_cover/bb/bb/{orfa}.png", time.time())
+    assert conn.execute("SELECT chave, contagem FROM referencias").fetchall() == [(f"book_cover/{outra}.png", 2)]
+    conn.close()
+
+
+# Um reaproveitamento em andamento (lock de escrita do images_service) adia a remoção, que então vê o mtime novo
+def test_nao_remove_arquivo_reaproveitado_durante_a_limpeza(ambiente):
+    _, capas, _ = ambiente
+    caminho = criar_arquivo(capas, "reenviada.png")
+    conn = criar_referencias(capas.parent, {})
+    conn.execute("BEGIN IMMEDIATE")
+
+    resultado = []
+    limpeza = threading.Thread(
+        target=lambda: resultado.append(orphan_images.remover_se_antigo(ArmazenamentoLocal("upload"), "book_cover/reenviada.png", time.time() - 60))
+    )
+    limpeza.start()
+    time.sleep(0.2)
+    assert limpeza.is_alive()  # Esperando o lock
+    os.utime(caminho)  # O images_service reaproveita o arquivo
+    conn.execute("INSERT INTO referencias VALUES ('book_cover/reenviada.png', 1)")
+    conn.execute("COMMIT")
+    limpeza.join(5)
+
+    assert resultado == [False]
+    assert caminho.exists()
+    conn.close()
@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from app.models.__all_models import Base
+from app.models.book import Livro
+from app.models.loan import Emprestimo
+from app.models.policy_group import GrupoPolitica
+from app.models.user import Usuario
+from app.services.query_counter import contar_consultas
+
+
+# Banco síncrono com empréstimos vencidos de usuários e livros diferentes
+@pytest.fixture
+def sessao_celery(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'celery.db'}")
+    Base.metadata.create_all(engine)
+    SessionLocal = sessionmaker(bind=engine, autoflush=False)
+
+    with SessionLocal() as session:
+        session.add(GrupoPolitica(nome="cliente"))
+        for i in range(5):
+            usuario = Usuario(nome=f"Usuário {i}", email=f"usuario{i}@teste.com", senha_hash="x", grupo_politica="cliente")
+            livro = Livro(titulo=f"Livro {i}", autor="Autor", quantidade_disponivel=1, isbn=f"isbn-{i}")
+            session.add(Emprestimo(
+                usuario=usuario, livro=livro, status="Ativo",
+                data_devolucao=datetime.utcnow() - timedelta(days=10),
+            ))
+        session.commit()
+
+    yield SessionLocal
+    engine.dispose()
+
+
+# O contador aponta o SELECT repetido por linha quando a relação é carregada sob demanda
+def test_contador_detecta_n_mais_um(sessao_celery):
+    with sessao_celery() as session, contar_consultas() as contador:
+        for emprestimo in session.execute(select(Emprestimo)).scalars():
+            emprestimo.usuario.email
+
+    assert contador.comandos == 6
+    assert len(contador.repetidas(5)) == 1
+
+
+# A tarefa de empréstimos vencidos não pode consultar usuário e livro a cada empréstimo
+def test_orcamento_consultas_emprestimos_vencidos(sessao_celery, monkeypatch, orcamento_consultas):
+    from app.services.celery import celery_app
+
+    notificacoes = []
+    monkeypatch.setattr(celery_app, "SessionLocalCelery", sessao_celery)
+    monkeypatch.setattr(celery_app, "enviar_notificacao", lambda **kwargs: notificacoes.append(kwargs))
+
+    # SELECT com joins + UPDATE em lote (executemany); o BEGIN implícito não passa pelo cursor
+    with orcamento_consultas(6) as contador:
+        celery_app.verificar_emprestimos_vencidos()
+
+    assert len(notificacoes) == 5
+    assert contador.idas_ao_banco == 2
+    assert contador.repetidas(2) == {}
@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+from benchmarks.query_plans import analisar_plano, comparar_custo, executar, ler_baseline
+
+CENARIO = {"nome": "teste", "sem_seq_scan": ["emprestimo"], "indices": ["ix_emprestimo_usuario_id"]}
+
+
+def plano(*nos):
+    return {"Plan": {"Node Type": "Nested Loop", "Total Cost": 10.0, "Plans": list(nos)}}
+
+
+# Plano que usa o índice esperado não gera problemas
+def test_plano_com_indice_esperado():
+    resultado = plano(
+        {"Node Type": "Index Scan", "Relation Name": "emprestimo", "Index Name": "ix_emprestimo_usuario_id"},
+        {"Node Type": "Seq Scan", "Relation Name": "grupo_politica"},  # Tabela pequena pode ser varrida
+    )
+    assert analisar_plano(resultado, CENARIO) == []
+
+
+# Seq Scan em tabela grande e índice ausente são apontados
+def test_plano_com_seq_scan():
+    resultado = plano({"Node Type": "Seq Scan", "Relation Name": "emprestimo"})
+    problemas = analisar_plano(resultado, CENARIO)
+    assert "Seq Scan em emprestimo" in problemas
+    assert any("ix_emprestimo_usuario_id" in problema for problema in problemas)
+
+
+def test_comparar_custo_com_baseline():
+    assert comparar_custo(140.0, 100.0, 0.5) == ""
+    assert comparar_custo(160.0, 100.0, 0.5) != ""
+    assert comparar_custo(160.0, None, 0.5) == ""  # Sem baseline gravada
+
+
+# A baseline versionada cobre todos os cenários do harness
+def test_baseline_cobre_os_cenarios():
+    from benchmarks.query_plans import montar_cenarios
+
+    assert set(ler_baseline()) == {cenario["nome"] for cenario in montar_cenarios()}
+
+
+# Verificação completa contra um Postgres populado (defina PLAN_DATABASE_URL para executar)
+@pytest.mark.asyncio
+@pytest.mark.skipif(not os.getenv("PLAN_DATABASE_URL"), reason="PLAN_DATABASE_URL não configurada")
+async def test_planos_consultas_principais():
+    resultados = await executar(os.getenv("PLAN_DATABASE_URL"), baseline=ler_baseline(), tolerancia=0.5)
+    falhas = {nome: r["problemas"] for nome, r in resultados.items() if r["problemas"]}
+    assert falhas == {}
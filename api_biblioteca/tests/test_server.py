@@ -0,0 +1,22 @@
+from benchmarks.import_time import medir_importacao
+from app.server import calcular_workers
+
+
+# Um worker por núcleo, arredondando cotas fracionárias de CPU para cima
+def test_workers_pelos_nucleos():
+    assert calcular_workers(4, memoria_mb=None, memoria_por_worker=200, maximo=16) == 4
+    assert calcular_workers(1.5, memoria_mb=None, memoria_por_worker=200, maximo=16) == 2
+    assert calcular_workers(64, memoria_mb=None, memoria_por_worker=200, maximo=16) == 16
+
+
+# A memória disponível limita o número de workers, mas sempre sobe ao menos um
+def test_workers_limitados_pela_memoria():
+    assert calcular_workers(8, memoria_mb=1000, memoria_por_worker=200, maximo=16) == 4
+    assert calcular_workers(8, memoria_mb=100, memoria_por_worker=200, maximo=16) == 1
+
+
+# O supervisor não importa a aplicação nem o SQLAlchemy (os workers importam do zero)
+def test_supervisor_nao_importa_o_banco():
+    importados = medir_importacao("app.server")
+    assert "app.server" in importados
+    assert not any(nome == "sqlalchemy" or nome.startswith(("sqlalchemy.", "app.database")) for nome in importados)
@@ -0,0 +1,122 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.__all_models import Base
+from app.models.book import Livro
+from app.services import storage_backend
+from app.services.celery import orphan_images
+from app.services.storage_backend import ArmazenamentoLocal, ArmazenamentoS3
+
+BASE = "http://images_service:8000/files"
+CHAVES = ["cat/a.png", "cat/ab.png", "cat/ab/cd/x.png", "cat/ab/cd/x_150.webp", "cat/ab/cd/z.png", "cat/zz/00/q.png"]
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    moto = pytest.importorskip("moto")
+    import boto3
+
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "teste")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "teste")
+    monkeypatch.setattr(storage_backend, "_clientes", {})  # O cliente do mock não pode ser reaproveitado
+    with moto.mock_aws():
+        cliente = boto3.client("s3", region_name="us-east-1")
+        cliente.create_bucket(Bucket="imagens")
+        yield cliente, ArmazenamentoS3("imagens", "uploads/", regiao="us-east-1")
+
+
+# Mesma ordem e mesmos filtros do ListObjectsV2, para o cursor valer nos dois backends
+def test_listagem_local_na_ordem_do_s3(tmp_path, monkeypatch):
+    for chave in CHAVES + ["outra/x.png", "cat/.tmp/parcial.part"]:
+        caminho = tmp_path / chave
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        caminho.write_bytes(b"x")
+    arquivos = ArmazenamentoLocal(str(tmp_path))
+
+    assert list(arquivos.listar("cat/")) == CHAVES
+    assert list(arquivos.listar("cat/", "cat/ab/cd/x.png")) == CHAVES[3:]
+    assert list(arquivos.listar("cat/ab/cd/x_")) == ["cat/ab/cd/x_150.webp"]
+
+    # Diretórios lidos em lotes: o resultado não muda
+    monkeypatch.setattr(storage_backend, "LOTE_LISTAGEM", 2)
+    assert list(arquivos.listar("cat/", "cat/a.png", 3)) == CHAVES[1:4]
+    assert list(arquivos.listar("nada/")) == []
+
+
+# A listagem local é uma cópia da do images_service (os serviços não compartilham pacote): as duas
+# precisam devolver a mesma ordem, senão o cursor da limpeza das órfãs pula ou repete arquivos
+def test_listagem_igual_a_do_images_service(tmp_path, monkeypatch):
+    caminho = Path(__file__).resolve().parents[2] / "images_service" / "app" / "services" / "storage_backend.py"
+    if not caminho.exists():
+        pytest.skip("images_service fora deste checkout")
+    spec = importlib.util.spec_from_file_location("storage_backend_images_service", caminho)
+    images_service = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(images_service)
+
+    for chave in CHAVES + ["cat/a-b.png", "cat/a/b.png", "cat/a0.png", "cat/ab/c.png", "cat/é.png", "cat/Z.png", "outra/x.png"]:
+        arquivo = tmp_path / chave
+        arquivo.parent.mkdir(parents=True, exist_ok=True)
+        arquivo.write_bytes(b"x")
+    (tmp_path / "cat" / ".oculto").mkdir()
+    (tmp_path / "cat" / ".oculto" / "x.png").write_bytes(b"x")
+    api, servico = ArmazenamentoLocal(str(tmp_path)), images_service.ArmazenamentoLocal(str(tmp_path))
+
+    todas = list(api.listar(""))
+    assert todas == sorted(todas)
+    for lote in (1000, 2, 1):
+        monkeypatch.setattr(storage_backend, "LOTE_LISTAGEM", lote)
+        monkeypatch.setattr(images_service, "LOTE_LISTAGEM", lote)
+        for prefixo in ("", "cat/", "cat/a", "cat/ab/", "cat/ab/cd/x_", "nada/"):
+            for depois_de in ("", "cat/a.png", "cat/ab", "cat/ab/cd/x.png", "cat/zz"):
+                for limite in (None, 1, 3):
+                    assert list(api.listar(prefixo, depois_de, limite)) == list(servico.listar(prefixo, depois_de, limite))
+
+
+def test_s3_lista_e_remove(s3):
+    cliente, arquivos = s3
+    for chave in CHAVES:
+        cliente.put_object(Bucket="imagens", Key=f"uploads/{chave}", Body=b"xy")
+    cliente.put_object(Bucket="imagens", Key="outro-servico/cat/a.png", Body=b"x")
+
+    assert list(arquivos.listar("cat/")) == CHAVES
+    assert list(arquivos.listar("cat/", "cat/ab/cd/x.png", 2)) == CHAVES[3:5]
+    assert arquivos.metadados("cat/a.png").tamanho == 2
+    assert arquivos.metadados("cat/nada.png") is None
+
+    arquivos.remover("cat/a.png")
+    arquivos.remover("cat/a.png")  # Idempotente
+    assert arquivos.metadados("cat/a.png") is None
+
+
+# A limpeza das órfãs com o bucket no lugar do diretório upload
+def test_limpeza_no_s3(s3, tmp_path, monkeypatch):
+    cliente, arquivos = s3
+    monkeypatch.chdir(tmp_path)
+    engine = create_engine(f"sqlite:///{tmp_path / 'celery.db'}")
+    Base.metadata.create_all(engine)
+    SessionLocal = sessionmaker(bind=engine, autoflush=False)
+
+    usada, orfa = "a" * 64, "b" * 64
+    with SessionLocal() as session:
+        session.add(Livro(titulo="A", autor="B", quantidade_disponivel=1, isbn="1", image_url=f"{BASE}/book_cover/aa/aa/{usada}.png"))
+        session.commit()
+    for chave in [f"aa/aa/{usada}.png", f"aa/aa/{usada}_150.webp", f"bb/bb/{orfa}.png", f"bb/bb/{orfa}_150.webp"]:
+        cliente.put_object(Bucket="imagens", Key=f"uploads/book_cover/{chave}", Body=b"x")
+
+    # Enviados agora: ainda dentro da carência
+    with SessionLocal() as session:
+        assert orphan_images.limpar_categoria(session, arquivos, "book_cover", "") == (0, "")
+
+    monkeypatch.setattr(orphan_images, "ORPHAN_GRACE_SECONDS", -60)
+    monkeypatch.setattr(orphan_images, "ORPHAN_FILES_PER_RUN", 3)
+    with SessionLocal() as session:
+        removidos, cursor = orphan_images.limpar_categoria(session, arquivos, "book_cover", "")
+        assert (removidos, cursor) == (1, f"bb/bb/{orfa}.png")
+        assert orphan_images.limpar_categoria(session, arquivos, "book_cover", cursor) == (1, "")
+
+    assert list(arquivos.listar("book_cover/")) == [f"book_cover/aa/aa/{usada}.png", f"book_cover/aa/aa/{usada}_150.webp"]
+    engine.dispose()
@@ -0,0 +1,131 @@
+import struct
+
+import numpy as np
+import pytest
+
+from app.services.scripts.generate_synthetic_data import (
+    COLUNAS_EMPRESTIMO,
+    EPOCA_POSTGRES,
+    MICROS_POR_DIA,
+    amostrar,
+    carregar_emprestimos,
+    cdf_zipf,
+    copy_binario_emprestimos,
+    gerar_emprestimos,
+    gerar_livros,
+    rng_do_lote,
+)
+
+REFERENCIA = np.datetime64("2025-01-01T00:00:00", "us")
+
+
+def emprestimos(semente: int, total: int = 5000) -> dict:
+    rng = rng_do_lote(semente, 3, 0)
+    ids_usuarios = np.arange(1, 301)
+    ids_livros = np.arange(1, 1001)
+    return gerar_emprestimos(
+        rng_do_lote(semente, 4, 0), 1, total,
+        ids_usuarios, cdf_zipf(len(ids_usuarios), 0.8, rng),
+        ids_livros, cdf_zipf(len(ids_livros), 1.05, rng),
+        REFERENCIA, anos=2,
+    )
+
+
+def ler_copy_binario(dados: bytes) -> list:
+    """Decodifica o formato binário do COPY (apenas os tipos usados nos empréstimos)."""
+    assert dados[:11] == b"PGCOPY\n\xff\r\n\x00"
+    posicao = 19  # Assinatura + flags + tamanho da extensão
+    linhas = []
+    while True:
+        (campos,) = struct.unpack_from(">h", dados, posicao)
+        posicao += 2
+        if campos == -1:
+            break
+        linha = []
+        for coluna in range(campos):
+            (tamanho,) = struct.unpack_from(">i", dados, posicao)
+            valor = dados[posicao + 4:posicao + 4 + tamanho]
+            texto = COLUNAS_EMPRESTIMO[coluna] == "status"
+            linha.append(valor.decode() if texto else int.from_bytes(valor, "big", signed=True))
+            posicao += 4 + tamanho
+        linhas.append(linha)
+    assert posicao == len(dados)
+    return linhas
+
+
+# Mesma semente, mesmos dados; sementes diferentes, dados diferentes
+def test_geracao_deterministica():
+    primeira, segunda = emprestimos(7), emprestimos(7)
+    assert all(np.array_equal(primeira[coluna], segunda[coluna]) for coluna in primeira)
+    assert not np.array_equal(primeira["livro_id"], emprestimos(8)["livro_id"])
+    assert gerar_livros(rng_do_lote(7, 1, 0), 1, 50, None) == gerar_livros(rng_do_lote(7, 1, 0), 1, 50, None)
+
+
+# Poucos livros concentram boa parte dos empréstimos, mas não na ordem dos ids
+def test_popularidade_concentrada():
+    rng = np.random.default_rng(1)
+    indices = amostrar(cdf_zipf(1000, 1.05, rng), 100_000, rng)
+    contagem = np.sort(np.bincount(indices, minlength=1000))[::-1]
+    assert contagem[:10].sum() > 0.3 * len(indices)
+    assert contagem[-500:].sum() < 0.1 * len(indices)
+    assert np.argmax(np.bincount(indices)) != 0
+
+
+# Datas e status coerentes com a data de referência
+def test_status_dos_emprestimos():
+    dados = emprestimos(3)
+    agora = (REFERENCIA - EPOCA_POSTGRES).astype(np.int64)
+    duracao = (dados["data_devolucao"] - dados["data_emprestimo"]) // MICROS_POR_DIA
+    assert np.array_equal(duracao, 7 * (1 + dados["numero_renovacoes"]))
+    assert (dados["data_emprestimo"] <= agora).all()
+    no_prazo = dados["data_devolucao"] >= agora
+    assert (dados["status"][no_prazo] == 0).all()  # Ativo
+    assert {0, 1, 2} == set(dados["status"][~no_prazo])  # Vencidos: ativos, devolvidos e atrasados
+
+
+# O COPY binário contém exatamente as linhas geradas, com os valores certos
+def test_copy_binario():
+    dados = emprestimos(5, total=200)
+    linhas = ler_copy_binario(copy_binario_emprestimos(dados))
+    assert len(linhas) == 200
+    assert all(len(linha) == len(COLUNAS_EMPRESTIMO) for linha in linhas)
+
+    por_id = {linha[0]: linha for linha in linhas}
+    nomes_status = ["Ativo", "Devolvido", "Atrasado"]
+    for i in (0, 57, 199):
+        assert por_id[int(dados["id"][i])] == [
+            int(dados["id"][i]), int(dados["usuario_id"][i]), int(dados["livro_id"][i]),
+            int(dados["data_emprestimo"][i]), int(dados["data_devolucao"][i]),
+            int(dados["numero_renovacoes"][i]), nomes_status[dados["status"][i]],
+        ]
+
+
+class ConexaoFalhaNoCopy:
+    """Conexão asyncpg falsa cujo COPY falha; guarda os comandos executados."""
+
+    def __init__(self):
+        self.comandos = []
+
+    async def fetch(self, sql):
+        return [{"id": i} for i in range(1, 11)]
+
+    async def fetchval(self, sql):
+        return 0
+
+    async def execute(self, sql):
+        self.comandos.append(sql)
+
+    async def copy_to_table(self, *args, **kwargs):
+        raise ConnectionResetError("conexão perdida no meio do COPY")
+
+
+# Se a carga falhar no meio, os índices removidos de emprestimo são recriados mesmo assim
+@pytest.mark.asyncio
+async def test_carga_com_erro_recria_os_indices():
+    conn = ConexaoFalhaNoCopy()
+    with pytest.raises(ConnectionResetError):
+        await carregar_emprestimos(conn, 100, 50, 1, REFERENCIA, 1, manter_indices=False)
+
+    removidos = [sql for sql in conn.comandos if sql.strip().startswith("DROP INDEX")]
+    recriados = [sql for sql in conn.comandos if sql.strip().startswith("CREATE INDEX")]
+    assert removidos and len(recriados) == len(removidos)
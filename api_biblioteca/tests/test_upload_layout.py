@@ -0,0 +1,62 @@
+import os
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from app.models.__all_models import Base
+from app.models.book import Livro
+from app.models.policy_group import GrupoPolitica
+from app.models.user import Usuario
+from app.services.celery.orphan_images import fragmento
+from app.services.scripts.migrate_upload_layout import migrar
+
+BASE = "http://images_service:8000/files"
+
+
+def test_fragmento_igual_ao_do_images_service():
+    # Nomes endereçados pelo conteúdo usam o próprio hash; nomes antigos, o hash do nome
+    assert fragmento("ab12" + "0" * 60 + ".png") == "ab/12"
+    assert fragmento("ab12" + "0" * 60 + "_300.avif") == "ab/12"
+    assert fragmento("3f2a9c.jpg") == fragmento("3f2a9c_150.webp")
+
+
+# Move original e miniaturas para ab/cd/ e reescreve só as URLs do layout antigo
+def test_migracao_move_arquivos_e_reescreve_urls(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    engine = create_engine(f"sqlite:///{tmp_path / 'migracao.db'}")
+    Base.metadata.create_all(engine)
+    SessionLocal = sessionmaker(bind=engine, autoflush=False)
+
+    capas = tmp_path / "upload" / "book_cover"
+    perfis = tmp_path / "upload" / "profile"
+    capas.mkdir(parents=True)
+    perfis.mkdir(parents=True)
+    for nome in ["capa.png", "capa_150.webp", "outra.jpg"]:
+        (capas / nome).write_bytes(b"x")
+    (perfis / "foto.jpg").write_bytes(b"x")
+
+    with SessionLocal() as session:
+        session.add(GrupoPolitica(nome="cliente"))
+        session.add_all([
+            Livro(titulo="A", autor="B", quantidade_disponivel=1, isbn="1", image_url=f"{BASE}/book_cover/capa.png"),
+            Livro(titulo="C", autor="D", quantidade_disponivel=1, isbn="2", image_url=f"{BASE}/book_cover/sumiu.png"),
+            Livro(titulo="E", autor="F", quantidade_disponivel=1, isbn="3", image_url="http://cdn.antigo/capa.png"),
+        ])
+        session.add(Usuario(nome="U", email="u@t.com", senha_hash="x", grupo_politica="cliente", profile_picture_url=f"{BASE}/profile/foto.jpg"))
+        session.commit()
+
+        resultado = migrar(session, lote=1)
+
+        assert resultado == {"profile": {"arquivos": 1, "urls": 1}, "book_cover": {"arquivos": 3, "urls": 1}}
+        assert [entrada.name for entrada in os.scandir(capas) if entrada.is_file()] == []
+        assert sorted(os.listdir(capas / fragmento("capa.png"))) == ["capa.png", "capa_150.webp"]
+        assert session.execute(select(Livro.image_url).order_by(Livro.id)).scalars().all() == [
+            f"{BASE}/book_cover/{fragmento('capa.png')}/capa.png",
+            f"{BASE}/book_cover/sumiu.png",  # Arquivo inexistente: a URL fica como estava
+            "http://cdn.antigo/capa.png",
+        ]
+        assert session.execute(select(Usuario.profile_picture_url)).scalar_one() == f"{BASE}/profile/{fragmento('foto.jpg')}/foto.jpg"
+
+        # Executar de novo não muda nada
+        assert migrar(session) == {"profile": {"arquivos": 0, "urls": 0}, "book_cover": {"arquivos": 0, "urls": 0}}
+    engine.dispose()
@@ -0,0 +1,141 @@
+import importlib
+
+import dotenv
+import pytest
+from sqlalchemy.future import select
+
+from app.models.book import Livro as LivroModel
+from app.models.user import Usuario as UsuarioModel
+from app.services import upload_tickets
+from app.services.images_client import API_KEY
+
+
+async def criar_livro(async_session, image_url=None):
+    livro = LivroModel(
+        id=1,
+        titulo="1984",
+        autor="George Orwell",
+        quantidade_disponivel=1,
+        isbn="9788535902771",
+        image_url=image_url,
+    )
+    async_session.add(livro)
+    await async_session.commit()
+    return livro
+
+
+def test_ticket_assinado_e_verificado():
+    emitido = upload_tickets.emitir_ticket(1, "livro", 7)
+    payload = upload_tickets.verificar_ticket(emitido["ticket"])
+    assert (payload["sub"], payload["cat"], payload["tipo"], payload["id"]) == (1, "book_cover", "livro", 7)
+
+    # Trocar o destino invalida a assinatura
+    _, assinatura = emitido["ticket"].split(".")
+    outro = upload_tickets.emitir_ticket(1, "livro", 8)["ticket"].split(".")[0]
+    with pytest.raises(ValueError):
+        upload_tickets.verificar_ticket(f"{outro}.{assinatura}")
+
+
+def test_ticket_expirado(monkeypatch):
+    monkeypatch.setattr(upload_tickets, "UPLOAD_TICKET_TTL_SECONDS", -10)
+    ticket = upload_tickets.emitir_ticket(1, "usuario", 1)["ticket"]
+    with pytest.raises(ValueError):
+        upload_tickets.verificar_ticket(ticket)
+    assert upload_tickets.verificar_ticket(ticket, tolerancia=60)["id"] == 1
+
+
+# Assinatura com caracteres não ASCII: recusada como inválida, sem TypeError do compare_digest
+@pytest.mark.asyncio
+async def test_ticket_nao_ascii(client):
+    with pytest.raises(ValueError):
+        upload_tickets.verificar_ticket("abc.déf")
+    callback = {"ticket": "abc.déf", "file_url": "http://images_service:8000/files/profile/x.png"}
+    response = await client.post("/images/callback", json=callback, headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 403
+
+
+# Ticket emitido pela API e callback do images_service gravando a URL na capa do livro
+@pytest.mark.asyncio
+async def test_upload_direto_da_capa(client, admin_auth_headers, async_session, monkeypatch):
+    await criar_livro(async_session, image_url="http://images_service:8000/files/book_cover/antiga.png")
+    liberadas = []
+
+    async def fake_liberar(file_url):
+        liberadas.append(file_url)
+
+    monkeypatch.setattr("app.routers.files.cliente_imagens.liberar", fake_liberar)
+
+    response = await client.post("/images/book_cover/1/upload-ticket", headers=admin_auth_headers)
+    assert response.status_code == 200
+    emitido = response.json()
+    assert emitido["category"] == "book_cover"
+    assert emitido["upload_url"].endswith("/upload/direct")
+
+    nova = "http://images_service:8000/files/book_cover/nova.png"
+    callback = {"ticket": emitido["ticket"], "file_url": nova}
+    assert (await client.post("/images/callback", json=callback, headers={"X-API-KEY": "errada"})).status_code == 401
+    response = await client.post("/images/callback", json=callback, headers={"X-API-KEY": API_KEY})
+    assert response.status_code == 200
+
+    livro = (await client.get("/livros/1", headers=admin_auth_headers)).json()
+    assert livro["image_url"] == nova
+    assert liberadas == ["http://images_service:8000/files/book_cover/antiga.png"]
+
+    # O mesmo ticket não grava outra imagem (replay do callback)
+    repetido = {"ticket": emitido["ticket"], "file_url": "http://images_service:8000/files/book_cover/outra.png"}
+    response = await client.post("/images/callback", json=repetido, headers={"X-API-KEY": API_KEY})
+    assert (response.status_code, response.json()["detail"]) == (409, "Ticket de upload já utilizado")
+    assert (await client.get("/livros/1", headers=admin_auth_headers)).json()["image_url"] == nova
+    assert len(liberadas) == 1
+
+    # A URL precisa ser da categoria do ticket
+    outra_categoria = {"ticket": emitido["ticket"], "file_url": "http://images_service:8000/files/profile/x.png"}
+    assert (await client.post("/images/callback", json=outra_categoria, headers={"X-API-KEY": API_KEY})).status_code == 400
+
+
+# Um cliente só recebe ticket para a própria foto, e nunca para capas de livros
+@pytest.mark.asyncio
+async def test_ticket_exige_permissao(client, client_auth_headers, async_session):
+    await criar_livro(async_session)
+    cliente = (await async_session.execute(
+        select(UsuarioModel).where(UsuarioModel.email == "cliente@biblioteca.com")
+    )).scalar_one()
+    admin = (await async_session.execute(
+        select(UsuarioModel).where(UsuarioModel.email == "admin@biblioteca.com")
+    )).scalar_one()
+
+    response = await client.post(f"/images/profile/{cliente.id}/upload-ticket", headers=client_auth_headers)
+    assert response.status_code == 200
+    assert upload_tickets.verificar_ticket(response.json()["ticket"])["sub"] == cliente.id
+    assert (await client.post(f"/images/profile/{admin.id}/upload-ticket", headers=client_auth_headers)).status_code == 403
+    assert (await client.post("/images/book_cover/1/upload-ticket", headers=client_auth_headers)).status_code == 403
+
+
+# O callback confere de novo a permissão de quem pediu o ticket: retirada depois da emissão, recusa
+@pytest.mark.asyncio
+async def test_callback_exige_permissao_atual(client, admin_auth_headers, async_session):
+    await criar_livro(async_session)
+    ticket = (await client.post("/images/book_cover/1/upload-ticket", headers=admin_auth_headers)).json()["ticket"]
+
+    admin = (await async_session.execute(
+        select(UsuarioModel).where(UsuarioModel.email == "admin@biblioteca.com")
+    )).scalar_one()
+    admin.grupo_politica = "cliente"
+    await async_session.commit()
+
+    callback = {"ticket": ticket, "file_url": "http://images_service:8000/files/book_cover/nova.png"}
+    response = await client.post("/images/callback", json=callback, headers={"X-API-KEY": API_KEY})
+    assert (response.status_code, response.json()["detail"]) == (403, "Sem permissão para enviar esta imagem")
+    assert (await async_session.get(LivroModel, 1)).image_url is None
+
+
+# Sem UPLOAD_TICKET_SECRET (nem no .env) o módulo não carrega, em vez de assinar com uma chave padrão
+def test_sem_chave_de_tickets_nao_inicia(monkeypatch):
+    monkeypatch.delenv("UPLOAD_TICKET_SECRET")
+    monkeypatch.setattr(dotenv, "load_dotenv", lambda *args, **kwargs: False)
+    try:
+        with pytest.raises(ValueError, match="UPLOAD_TICKET_SECRET"):
+            importlib.reload(upload_tickets)
+    finally:
+        monkeypatch.undo()
+        importlib.reload(upload_tickets)
@@ -243,4 +243,24 @@ async def test_delete_non_existent_user_fails(client: AsyncClient, token_admin):
     response = await client.delete(f"/usuarios/{usuario_id_inexistente}", headers=headers)
 
     assert response.status_code == status.HTTP_404_NOT_FOUND, f"Erro inesperado: {response.json()}"
-    assert response.json()["detail"] == "Usuário não encontrado."
\ No newline at end of file
+    assert response.json()["detail"] == "Usuário não encontrado."
+
+
+@pytest.mark.asyncio
+async def test_list_users_query_budget(client: AsyncClient, token_admin, orcamento_consultas):
+    """A listagem de usuários deve usar um único SELECT"""
+    headers = {"Authorization": f"Bearer {token_admin}"}
+
+    with orcamento_consultas(1):
+        response = await client.get("/usuarios/", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.asyncio
+async def test_list_users_same_format_as_response_model(client: AsyncClient, token_admin):
+    """A listagem serializada direto das linhas deve ter o mesmo formato do response_model"""
+    headers = {"Authorization": f"Bearer {token_admin}"}
+
+    usuarios = (await client.get("/usuarios/", headers=headers)).json()
+    detalhe = (await client.get(f"/usuarios/{usuarios[0]['id']}", headers=headers)).json()
+    assert usuarios[0] == detalhe
@@ -0,0 +1,73 @@
+import pytest
+from httpx import AsyncClient
+from fastapi import status
+from sqlalchemy import text
+
+from app.database import EstatisticasPool, criar_engine
+from app.services.query_counter import contar_consultas
+from app.services.security import cache_permissoes
+from app.services.scripts.populate_policy_group_permission import permissoes_cliente
+from app.services.warmup import aquecer_pool, consultas_quentes
+
+
+# A segunda emissão de token do mesmo grupo não consulta o banco
+@pytest.mark.asyncio
+async def test_cache_permissoes_evita_consulta(async_session):
+    with contar_consultas() as contador:
+        primeira = await cache_permissoes.obter("cliente", async_session)
+    assert contador.comandos == 1
+
+    with contar_consultas() as contador:
+        segunda = await cache_permissoes.obter("cliente", async_session)
+    assert contador.comandos == 0
+    assert sorted(segunda) == sorted(primeira) == sorted(permissoes_cliente)
+
+
+# O aquecimento carrega todos os grupos em uma única consulta
+@pytest.mark.asyncio
+async def test_carregar_todas_as_permissoes(async_session):
+    with contar_consultas() as contador:
+        grupos = await cache_permissoes.carregar_todos(async_session)
+        permissoes = await cache_permissoes.obter("cliente", async_session)
+    assert grupos == 2
+    assert contador.comandos == 1
+    assert sorted(permissoes) == sorted(permissoes_cliente)
+
+
+# Associar uma permissão ao grupo invalida o cache
+@pytest.mark.asyncio
+async def test_cache_invalidado_ao_associar_permissao(client: AsyncClient, admin_auth_headers, async_session):
+    assert "admin.read" not in await cache_permissoes.obter("cliente", async_session)
+
+    response = await client.post(
+        "/grupo_politica_permissoes/",
+        json={"grupo_politica_nome": "cliente", "permissao_namespace": "admin.read"},
+        headers=admin_auth_headers,
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    assert "admin.read" in await cache_permissoes.obter("cliente", async_session)
+
+
+# As consultas aquecidas são válidas no banco (compilam e executam sem erro)
+@pytest.mark.asyncio
+async def test_consultas_quentes_executam(async_session):
+    for consulta in consultas_quentes():
+        await async_session.execute(consulta)
+
+
+# O aquecimento deixa no pool até DB_POOL_SIZE conexões abertas e ociosas
+@pytest.mark.asyncio
+async def test_aquecer_pool_abre_conexoes(tmp_path):
+    estatisticas = EstatisticasPool()
+    engine = criar_engine(f"sqlite+aiosqlite:///{tmp_path / 'aquecimento.db'}", estatisticas, pool_size=3)
+
+    with contar_consultas() as contador:
+        conexoes = await aquecer_pool(engine, 5, [text("SELECT 1")])
+
+    assert conexoes == 3
+    assert contador.comandos == 3
+    dados = estatisticas.snapshot()
+    assert dados["checkouts"] == 3
+    assert dados["ociosas"] == 3
+    assert dados["em_uso"] == 0
+    await engine.dispose()
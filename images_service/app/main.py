@@ -1,12 +1,39 @@
 # main.py
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
-from app.routers import uploads
+from app.routers import files, uploads
+from app.services.derivatives import encerrar_executor
+from app.services.upload_tickets import encerrar_cliente
+
+
+# Ao encerrar, espera os derivados em andamento e fecha o pool de processos e as conexões do callback
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    encerrar_executor()
+    await encerrar_cliente()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# O front-end envia as imagens direto para cá (/upload/direct), com o ticket emitido pela API
+origins = [origem.strip() for origem in os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",") if origem.strip()]
 
-app = FastAPI()
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=origins,
+    allow_methods=["POST"],
+    allow_headers=["X-Upload-Ticket", "X-Content-SHA256"],
+)
 
 app.include_router(uploads.router)
+# Antes do StaticFiles: escolhe a miniatura e o formato pelo tamanho pedido e pelo Accept
+app.include_router(files.router)
 
 # Rota para servir os arquivos estáticos (imagens)
 app.mount("/files", StaticFiles(directory="upload"), name="files")
@@ -0,0 +1,53 @@
+from fastapi import APIRouter, HTTPException, Header, Query, status
+from fastapi.concurrency import run_in_threadpool
+
+from app.routers.uploads import arquivos
+from app.services.content_store import fragmento, nome_do_relativo
+from app.services.derivatives import variantes
+from app.services.image_response import RespostaImagem
+
+router = APIRouter()
+
+
+def abrir_imagem(image_category: str, relativo: str, size: int, accept: str) -> tuple:
+    # Escolha da variante e abertura do arquivo em uma única ida à thread: abre a primeira variante
+    # que existir (no S3, um GET por tentativa em vez de um HEAD e um GET)
+    original = f"{image_category}/{relativo}"
+    if "/" not in relativo and not arquivos.existe(original):
+        # URL do layout antigo (direto na categoria) de um arquivo já movido para ab/cd/ pela migração
+        original = f"{image_category}/{fragmento(relativo)}/{relativo}"
+    for chave, media_type in variantes(original, size, accept):
+        try:
+            return (original, chave, media_type, *arquivos.abrir(chave))
+        except FileNotFoundError:
+            continue
+    raise FileNotFoundError(original)
+
+
+# Registrada antes do StaticFiles em /files: sem `size` serve o original, como antes; com `size`
+# serve a miniatura do menor tamanho que cobre o pedido, no melhor formato aceito pelo cliente.
+# Aceita o layout atual (/files/<categoria>/ab/cd/<arquivo>) e o antigo (/files/<categoria>/<arquivo>)
+@router.api_route("/files/{image_category}/{relativo:path}", methods=["GET", "HEAD"])
+async def servir_imagem(
+    image_category: str,
+    relativo: str,
+    size: int = Query(None, gt=0, description="Lado máximo desejado, em pixels"),
+    accept: str = Header(None),
+):
+    try:
+        if image_category.startswith(".") or "/" in image_category or "\\" in image_category:
+            raise ValueError(image_category)
+        nome_do_relativo(relativo)  # `nome` ou `ab/cd/nome`, sem `..` nem arquivos ocultos
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Imagem não encontrada")
+
+    try:
+        original, chave, media_type, objeto, conteudo = await run_in_threadpool(abrir_imagem, image_category, relativo, size, accept)
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Imagem não encontrada")
+
+    # Com `size` a resposta varia com o Accept (caches não podem misturar os formatos) e, enquanto
+    # a miniatura não fica pronta, o original servido no lugar não pode ficar em cache por um ano
+    headers = {"Vary": "Accept"} if size else {}
+    imutavel = not size or chave != original
+    return RespostaImagem(objeto, media_type, conteudo, imutavel=imutavel, headers=headers)
@@ -1,6 +1,15 @@
 import os
-import uuid
-from fastapi import APIRouter, UploadFile, File, HTTPException, Header, status
+import re
+import httpx
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Header, Request, status
+from fastapi.concurrency import run_in_threadpool
+
+from app.services.content_store import ArmazenamentoConteudo, nome_do_relativo
+from app.services.derivatives import derivados_prontos, processar_derivados
+from app.services.image_validation import EXTENSOES, inspecionar_imagem, tipo_por_assinatura
+from app.services.storage_backend import criar_backend
+from app.services.streaming_upload import descartar, receber_upload
+from app.services.upload_tickets import notificar_api, verificar_ticket
 
 router = APIRouter()
 
@@ -13,44 +22,170 @@ UPLOAD_DIR = "upload"
 # Garante que o diretório base exista
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# Onde os arquivos ficam: o próprio UPLOAD_DIR ou um bucket S3 (STORAGE_BACKEND)
+arquivos = criar_backend(UPLOAD_DIR)
+
+# Uploads em andamento (no backend local, no mesmo sistema de arquivos dos destinos, para o rename ser atômico)
+TMP_DIR = arquivos.diretorio_temporario
+
 ALLOWED_EXTENSIONS = {'.png', '.jpg', '.jpeg'}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5 MB
+SHA256_VALIDO = re.compile(r"[0-9a-f]{64}")
+
+# Arquivos nomeados pelo SHA-256 do conteúdo (com a extensão do tipo detectado), com contagem de referências
+armazenamento = ArmazenamentoConteudo(UPLOAD_DIR, set(EXTENSOES.values()), arquivos)
 
-@router.post("/upload")
+# O corpo é lido em streaming pelo receber_upload; o schema documenta o campo esperado
+CORPO_UPLOAD = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "properties": {"file": {"type": "string", "format": "binary"}},
+            "required": ["file"],
+        }}},
+    }
+}
+
+@router.post("/upload", openapi_extra=CORPO_UPLOAD)
 async def upload(
-    file: UploadFile = File(...),
+    request: Request,
+    background_tasks: BackgroundTasks,
     x_api_key: str = Header(..., alias="X-API-KEY"),
-    image_category: str = Header(...)
+    image_category: str = Header(...),
+    # Hash informado pelo cliente: se o conteúdo já existe, responde sem ler o corpo
+    x_content_sha256: str = Header(None, alias="X-Content-SHA256"),
 ):
     # Verifica a API key
     if x_api_key != API_KEY:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="API Key inválida")
+    if not image_category or image_category.startswith(".") or "/" in image_category or "\\" in image_category:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Categoria inválida")
+    return await armazenar_upload(request, background_tasks, image_category, x_content_sha256)
+
+
+# Upload direto do navegador, autorizado por um ticket assinado pela api_biblioteca (que define
+# a categoria e a entidade); a API é avisada pelo callback e grava a URL no livro ou no usuário
+@router.post("/upload/direct", openapi_extra=CORPO_UPLOAD)
+async def upload_direto(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    x_upload_ticket: str = Header(..., alias="X-Upload-Ticket"),
+    x_content_sha256: str = Header(None, alias="X-Content-SHA256"),
+):
+    # Conferido antes de ler o corpo: sem ticket válido, nenhum byte é gravado
+    try:
+        ticket = verificar_ticket(x_upload_ticket)
+    except (ValueError, KeyError):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Ticket de upload inválido ou expirado")
+
+    image_category = ticket["cat"]
+    resposta = await armazenar_upload(request, background_tasks, image_category, x_content_sha256)
+
+    # Só uma recusa da API (4xx) libera a referência. Um timeout, uma conexão perdida ou um 5xx
+    # podem chegar depois de a API gravar a URL: a imagem fica, e se a URL não foi gravada a
+    # limpeza das órfãs da api_biblioteca remove o arquivo depois
+    try:
+        callback = await notificar_api(x_upload_ticket, resposta["file_url"])
+    except httpx.HTTPError as e:
+        print(f"Erro no callback do upload de {resposta['filename']}: {e}")
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="API indisponível para registrar a imagem")
+    if callback.status_code >= 500:
+        print(f"Erro {callback.status_code} no callback do upload de {resposta['filename']}")
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="API indisponível para registrar a imagem")
+    if callback.status_code != 200:
+        await run_in_threadpool(armazenamento.liberar, image_category, resposta["filename"])
+        try:
+            detalhe = callback.json().get("detail")
+        except ValueError:
+            detalhe = None
+        raise HTTPException(status_code=callback.status_code, detail=detalhe or "Imagem não registrada pela API")
+    return resposta
+
+
+async def armazenar_upload(
+    request: Request, background_tasks: BackgroundTasks, image_category: str, x_content_sha256: str
+) -> dict:
+    """Recebe, valida e publica a imagem na categoria; agenda as miniaturas."""
+    if x_content_sha256 is not None:
+        x_content_sha256 = x_content_sha256.lower()
+        if not SHA256_VALIDO.fullmatch(x_content_sha256):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="X-Content-SHA256 inválido")
+        nome, imagem = await run_in_threadpool(reaproveitar_imagem, image_category, x_content_sha256)
+        if nome:
+            return resposta_upload(image_category, nome, imagem)
     
-    # Verifica a extensão
-    extension = os.path.splitext(file.filename)[1].lower()
-    if extension not in ALLOWED_EXTENSIONS:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Tipo de arquivo não permitido")
+    # Grava em um temporário enquanto recebe, validando extensão, tamanho (aborta ao passar de 5 MB)
+    # e a assinatura do conteúdo (um arquivo renomeado é recusado já nos primeiros bytes)
+    recebido = await receber_upload(request, TMP_DIR, MAX_FILE_SIZE, ALLOWED_EXTENSIONS, identificar=tipo_por_assinatura)
+    if x_content_sha256 is not None and x_content_sha256 != recebido.sha256:
+        await run_in_threadpool(descartar, recebido.caminho_temporario)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Conteúdo não confere com o X-Content-SHA256")
     
-    # Lê os bytes para verificar o tamanho
-    contents = await file.read()
-    if len(contents) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Tamanho máximo de 5 MB excedido")
+    # Dimensões lidas só do cabeçalho, em uma thread: recusa bombas de descompressão antes de
+    # qualquer decodificação (a das miniaturas inclusive)
+    try:
+        imagem = await run_in_threadpool(inspecionar_imagem, recebido.caminho_temporario)
+    except BaseException:
+        await run_in_threadpool(descartar, recebido.caminho_temporario)
+        raise
     
-    # Gera um nome único para o arquivo mantendo a extensão original
-    unique_name = f"{uuid.uuid4().hex}{extension}"
-    category_path = os.path.join(UPLOAD_DIR, image_category)
-    os.makedirs(category_path, exist_ok=True)
-    file_path = os.path.join(category_path, unique_name)
+    # Nome endereçado pelo conteúdo: o mesmo arquivo sempre tem o mesmo nome (e a mesma URL),
+    # com a extensão do tipo detectado, não a do nome enviado
+    unique_name = f"{recebido.sha256}{EXTENSOES[imagem['content_type']]}"
     
-    # Salva o arquivo no sistema de arquivos
+    # Publica o arquivo completo no destino, em <categoria>/ab/cd/ (ou reaproveita o existente)
     try:
-        with open(file_path, "wb") as f:
-            f.write(contents)
-    except Exception as e:
+        relativo = await run_in_threadpool(
+            armazenamento.adicionar, image_category, unique_name, recebido.caminho_temporario, imagem["content_type"]
+        )
+    except Exception as e:  # OSError no disco local; erros do boto3 no S3
+        await run_in_threadpool(descartar, recebido.caminho_temporario)
         raise HTTPException(status_code=500, detail=f"Erro ao salvar arquivo: {e}")
+    chave = armazenamento.chave(image_category, relativo)
+    
+    # Miniaturas e variantes WebP/AVIF são geradas depois da resposta, em outro processo
+    if not await run_in_threadpool(derivados_prontos, arquivos, chave):
+        background_tasks.add_task(processar_derivados, arquivos, chave)
     
-    # Monta a URL para acesso ao arquivo.
-    file_url = f"http://images_service:8000/files/{image_category}/{unique_name}"
+    return resposta_upload(image_category, relativo, imagem)
+
+
+def reaproveitar_imagem(image_category: str, sha256: str) -> tuple:
+    """Caminho e dados da imagem já armazenada com esse hash (ou (None, None)); executado em uma thread."""
+    relativo = armazenamento.reaproveitar(image_category, sha256)
+    if relativo is None:
+        return None, None
+    try:
+        with arquivos.arquivo_local(armazenamento.chave(image_category, relativo)) as caminho:
+            return relativo, inspecionar_imagem(caminho)
+    except BaseException:
+        armazenamento.liberar(image_category, relativo)  # Arquivo anterior à validação e inválido
+        raise
+
+
+def resposta_upload(image_category: str, relativo: str, imagem: dict) -> dict:
+    # Monta a URL para acesso ao arquivo (`ab/cd/<nome>`; `<nome>` nos arquivos do layout antigo)
+    file_url = f"http://images_service:8000/files/{image_category}/{relativo}"
     
-    return {"filename": unique_name, "file_url": file_url, "category": image_category}
+    # Tipo e dimensões detectados no conteúdo ({"content_type", "width", "height"})
+    return {"filename": relativo, "file_url": file_url, "category": image_category, **imagem}
 
+
+# Libera uma referência ao arquivo; o arquivo e as miniaturas são apagados na última
+@router.delete("/files/{image_category}/{relativo:path}")
+async def liberar_imagem(
+    image_category: str,
+    relativo: str,
+    x_api_key: str = Header(..., alias="X-API-KEY"),
+):
+    if x_api_key != API_KEY:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="API Key inválida")
+    try:
+        if image_category.startswith("."):
+            raise ValueError(image_category)
+        nome_do_relativo(relativo)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Imagem não encontrada")
+    restantes = await run_in_threadpool(armazenamento.liberar, image_category, relativo)
+    return {"filename": relativo, "category": image_category, "references": restantes}
@@ -0,0 +1,151 @@
+"""
+Armazenamento endereçado pelo conteúdo, com contagem de referências.
+
+Cada imagem é gravada na categoria como `<sha256><extensão>`: o mesmo arquivo enviado de novo
+(a mesma capa em várias edições, um retry de upload) aponta para o arquivo existente em vez de
+duplicar os bytes. As referências ficam em um SQLite ao lado dos uploads; o lock de escrita do
+SQLite serializa, entre processos, a publicação de um arquivo e a remoção da última referência,
+então um upload nunca recebe a URL de um arquivo que está sendo apagado.
+
+Os arquivos ficam em dois níveis de subdiretórios pelo prefixo do hash,
+`<categoria>/ab/cd/abcd...<extensão>` (as miniaturas junto do original), para nenhum diretório
+crescer demais. Arquivos do layout antigo, direto na categoria, continuam sendo encontrados até
+serem movidos pela migração (api_biblioteca: app.services.scripts.migrate_upload_layout). As
+referências são contadas pelo nome do arquivo, qualquer que seja o diretório.
+
+Os arquivos são gravados pelo backend de armazenamento (storage_backend). Com um backend
+compartilhado entre nós (S3), um SQLite local não enxerga as referências gravadas pelos outros nós:
+a contagem é desligada, a última referência não apaga o arquivo e a remoção fica para a limpeza das
+órfãs da api_biblioteca, que confere as URLs no banco (e poupa os arquivos reenviados há pouco).
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+from contextlib import contextmanager
+
+HASH_HEX = re.compile(r"[0-9a-f]{64}")
+FRAGMENTO = re.compile(r"[0-9a-f]{2}/[0-9a-f]{2}")
+
+
+def nome_original(arquivo: str) -> str:
+    """Nome (sem extensão) da imagem original; as miniaturas são <nome>_<tamanho>.<formato>."""
+    return re.sub(r"_\d+$", "", os.path.splitext(arquivo)[0])
+
+
+def fragmento(nome: str) -> str:
+    """Subdiretórios do arquivo (`ab/cd`): o início do hash do conteúdo (ou do nome, nos nomes antigos)."""
+    raiz = nome_original(nome)
+    digest = raiz if HASH_HEX.fullmatch(raiz) else hashlib.sha256(raiz.encode()).hexdigest()
+    return f"{digest[:2]}/{digest[2:4]}"
+
+
+def nome_do_relativo(relativo: str) -> str:
+    """Nome do arquivo a partir do caminho na categoria (`nome` ou `ab/cd/nome`); ValueError se inválido."""
+    diretorio, _, nome = relativo.rpartition("/")
+    if not nome or nome.startswith(".") or (diretorio and (not FRAGMENTO.fullmatch(diretorio) or diretorio != fragmento(nome))):
+        raise ValueError(relativo)
+    return nome
+
+
+class ArmazenamentoConteudo:
+    def __init__(self, diretorio: str, extensoes: set, backend):
+        self.diretorio = diretorio
+        self.extensoes = extensoes
+        self.backend = backend
+        self.contar_referencias = not backend.compartilhado
+        # Em um diretório oculto: a rota /files não serve categorias que começam com ponto
+        os.makedirs(os.path.join(diretorio, ".meta"), exist_ok=True)
+        self.caminho_banco = os.path.join(diretorio, ".meta", "referencias.sqlite3")
+        with self._transacao() as conn:
+            if conn is not None:
+                conn.execute("CREATE TABLE IF NOT EXISTS referencias (chave TEXT PRIMARY KEY, contagem INTEGER NOT NULL)")
+
+    @contextmanager
+    def _transacao(self):
+        if not self.contar_referencias:
+            yield None
+            return
+        conn = sqlite3.connect(self.caminho_banco, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("BEGIN IMMEDIATE")  # Lock de escrita desde o início da transação
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def chave(self, categoria: str, relativo: str) -> str:
+        """Chave do arquivo no backend."""
+        return f"{categoria}/{relativo}"
+
+    def localizar(self, categoria: str, nome: str) -> str:
+        """Caminho relativo à categoria onde o arquivo está: `ab/cd/nome` ou, no layout antigo, `nome`. None se não existe."""
+        for relativo in (f"{fragmento(nome)}/{nome}", nome):
+            if self.backend.existe(self.chave(categoria, relativo)):
+                return relativo
+        return None
+
+    def _incrementar(self, conn, chave: str) -> int:
+        if conn is None:
+            return None
+        return conn.execute(
+            "INSERT INTO referencias (chave, contagem) VALUES (?, 1) "
+            "ON CONFLICT(chave) DO UPDATE SET contagem = contagem + 1 RETURNING contagem",
+            (chave,),
+        ).fetchone()[0]
+
+    def reaproveitar(self, categoria: str, sha256: str) -> str:
+        """Conta mais uma referência ao arquivo com esse hash, se já existir; retorna o caminho relativo ou None."""
+        with self._transacao() as conn:
+            for extensao in sorted(self.extensoes):
+                nome = f"{sha256}{extensao}"
+                relativo = self.localizar(categoria, nome)
+                if relativo:
+                    self._incrementar(conn, f"{categoria}/{nome}")
+                    self.backend.tocar(self.chave(categoria, relativo))  # Reenviado agora: não é candidato a órfão
+                    return relativo
+        return None
+
+    def adicionar(self, categoria: str, nome: str, caminho_temporario: str, media_type: str = None) -> str:
+        """Publica o temporário como `nome` e conta a referência; retorna o caminho relativo à categoria."""
+        with self._transacao() as conn:
+            self._incrementar(conn, f"{categoria}/{nome}")
+            relativo = self.localizar(categoria, nome)
+            if relativo:
+                os.unlink(caminho_temporario)  # Mesmo conteúdo: descarta a cópia recebida
+                self.backend.tocar(self.chave(categoria, relativo))
+                return relativo
+            relativo = f"{fragmento(nome)}/{nome}"
+            self.backend.publicar(self.chave(categoria, relativo), caminho_temporario, media_type)
+        return relativo
+
+    def liberar(self, categoria: str, relativo: str) -> int:
+        """Remove uma referência; na última, apaga o arquivo e as miniaturas. Retorna as restantes.
+
+        Sem contagem (backend compartilhado), não apaga nada e retorna None: a limpeza das órfãs remove
+        o arquivo quando nenhuma URL o referenciar mais.
+        """
+        nome = nome_do_relativo(relativo)
+        chave = f"{categoria}/{nome}"
+        if not self.contar_referencias:
+            return None
+        with self._transacao() as conn:
+            linha = conn.execute(
+                "UPDATE referencias SET contagem = contagem - 1 WHERE chave = ? RETURNING contagem", (chave,)
+            ).fetchone()
+            restantes = linha[0] if linha else 0  # Arquivos anteriores à contagem têm uma única referência
+            if restantes > 0:
+                return restantes
+            conn.execute("DELETE FROM referencias WHERE chave = ?", (chave,))
+            # Nos dois layouts: a migração pode ter movido o arquivo depois da URL ser gravada
+            for relativo in (f"{fragmento(nome)}/{nome}", nome):
+                original = self.chave(categoria, relativo)
+                for arquivo in [original, *self.backend.listar(f"{os.path.splitext(original)[0]}_")]:
+                    self.backend.remover(arquivo)
+        return 0
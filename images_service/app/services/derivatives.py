@@ -0,0 +1,154 @@
+"""
+Derivados das imagens enviadas: miniaturas em tamanhos configurados e variantes WebP/AVIF.
+
+Cada tamanho de THUMBNAIL_SIZES (lado máximo em px) é gerado em todos os formatos de
+DERIVATIVE_FORMATS e também no formato do original (JPEG/PNG), para clientes que não aceitam
+os formatos modernos. Os derivados ficam ao lado do original, como `<nome>_<tamanho>.<formato>`.
+
+A geração usa CPU (decodificar e recodificar a imagem), então roda em um pool de processos e
+não segura a resposta do upload: até ficarem prontos, o original é servido no lugar. Os arquivos
+são lidos e gravados pelo backend de armazenamento (storage_backend), que vai junto para o pool.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from dotenv import load_dotenv
+
+from app.services.storage_backend import descartar, novo_temporario
+
+load_dotenv()
+
+THUMBNAIL_SIZES = sorted(int(tamanho) for tamanho in os.getenv("THUMBNAIL_SIZES", "150,300,600").split(",") if tamanho)
+DERIVATIVE_FORMATS = [formato.strip() for formato in os.getenv("DERIVATIVE_FORMATS", "avif,webp").split(",") if formato.strip()]
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(os.cpu_count() or 1)))
+
+TIPOS = {
+    "avif": "image/avif",
+    "webp": "image/webp",
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+}
+
+# Parâmetros do Pillow por formato: qualidade x tempo de codificação
+OPCOES_SALVAR = {
+    "avif": {"format": "AVIF", "quality": 60, "speed": 8},
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+    "jpg": {"format": "JPEG", "quality": 85, "optimize": True, "progressive": True},
+    "jpeg": {"format": "JPEG", "quality": 85, "optimize": True, "progressive": True},
+    "png": {"format": "PNG", "optimize": True},
+}
+
+_executor = None
+
+
+def chave_derivado(chave_original: str, tamanho: int, formato: str) -> str:
+    raiz, _ = os.path.splitext(chave_original)
+    return f"{raiz}_{tamanho}.{formato}"
+
+
+def derivados_prontos(backend, chave_original: str) -> bool:
+    # Uma listagem pelo prefixo em vez de uma consulta por derivado (no S3, uma requisição)
+    existentes = set(backend.listar(f"{os.path.splitext(chave_original)[0]}_"))
+    return all(
+        chave_derivado(chave_original, tamanho, formato) in existentes
+        for tamanho in THUMBNAIL_SIZES for formato in formatos_de(chave_original)
+    )
+
+
+def formatos_de(chave_original: str) -> list:
+    """Formatos gerados para o original, do preferido ao de compatibilidade."""
+    original = os.path.splitext(chave_original)[1].lstrip(".").lower()
+    return DERIVATIVE_FORMATS + ([original] if original not in DERIVATIVE_FORMATS else [])
+
+
+def gerar_derivados(backend, chave_original: str) -> list:
+    """Gera todos os derivados do original (executado em um processo do pool); retorna as chaves."""
+    from PIL import Image, ImageOps  # Importado só nos processos do pool
+
+    gerados = []
+    with backend.arquivo_local(chave_original) as caminho_original, Image.open(caminho_original) as imagem:
+        # JPEG: decodifica direto em escala reduzida (bem mais barato que decodificar tudo e reduzir)
+        imagem.draft("RGB", (THUMBNAIL_SIZES[-1], THUMBNAIL_SIZES[-1]))
+        imagem = ImageOps.exif_transpose(imagem)
+        if imagem.mode not in ("RGB", "RGBA"):
+            imagem = imagem.convert("RGBA" if "transparency" in imagem.info or imagem.mode in ("LA", "PA") else "RGB")
+
+        # Do maior para o menor: cada miniatura parte da anterior, já reduzida
+        atual = imagem
+        for tamanho in reversed(THUMBNAIL_SIZES):
+            atual = atual.copy()
+            atual.thumbnail((tamanho, tamanho), Image.Resampling.LANCZOS)
+            for formato in formatos_de(chave_original):
+                quadro = atual.convert("RGB") if formato in ("jpg", "jpeg") and atual.mode == "RGBA" else atual
+                destino = chave_derivado(chave_original, tamanho, formato)
+                # Gravado em um temporário e publicado completo: nunca serve um derivado incompleto
+                temporario = novo_temporario(backend.diretorio_temporario)
+                try:
+                    quadro.save(temporario, **OPCOES_SALVAR[formato])
+                    backend.publicar(destino, temporario, TIPOS[formato])
+                except BaseException:
+                    descartar(temporario)
+                    raise
+                gerados.append(destino)
+    return gerados
+
+
+def executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return _executor
+
+
+def encerrar_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+async def processar_derivados(backend, chave_original: str):
+    """Gera os derivados no pool de processos; falhas não afetam o original já publicado."""
+    try:
+        await asyncio.get_running_loop().run_in_executor(executor(), gerar_derivados, backend, chave_original)
+    except Exception as e:
+        print(f"Erro ao gerar derivados de {chave_original}: {e}")
+
+
+def aceita(accept: str, tipo: str) -> bool:
+    """Se o cabeçalho Accept aceita o tipo explicitamente (q > 0); curingas não contam."""
+    for item in (accept or "").split(","):
+        partes = [parte.strip() for parte in item.split(";")]
+        if partes[0].lower() != tipo:
+            continue
+        for parametro in partes[1:]:
+            nome, _, valor = parametro.partition("=")
+            if nome.strip() == "q":
+                try:
+                    return float(valor) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+def variantes(chave_original: str, tamanho: int, accept: str) -> list:
+    """Arquivos que atendem o tamanho pedido e o Accept, do melhor ao original: [(chave, media type)].
+
+    Usa o menor tamanho configurado que cobre o pedido (ou o maior de todos) e os formatos aceitos
+    pelo cliente. Quem serve usa o primeiro que existir: sem derivado pronto, o original.
+    """
+    tipo_original = TIPOS.get(os.path.splitext(chave_original)[1].lstrip(".").lower(), "application/octet-stream")
+    if not tamanho or not THUMBNAIL_SIZES:
+        return [(chave_original, tipo_original)]
+
+    escolhido = next((t for t in THUMBNAIL_SIZES if t >= tamanho), THUMBNAIL_SIZES[-1])
+    candidatas = [
+        (chave_derivado(chave_original, escolhido, formato), TIPOS[formato])
+        for formato in formatos_de(chave_original)
+        if formato not in DERIVATIVE_FORMATS or aceita(accept, TIPOS[formato])
+    ]
+    return candidatas + [(chave_original, tipo_original)]
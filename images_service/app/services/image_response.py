@@ -0,0 +1,165 @@
+"""
+Resposta ASGI para servir as imagens enviadas, que nunca mudam depois de publicadas.
+
+- ETag forte: o SHA-256 do nome para arquivos endereçados pelo conteúdo; para os demais
+  (miniaturas e nomes antigos), derivado do tamanho e do mtime em nanossegundos.
+- Cache-Control imutável por um ano; o fallback para o original enquanto a miniatura não
+  fica pronta usa um cache curto, senão o navegador guardaria o original por um ano.
+- 304 para If-None-Match/If-Modified-Since e Range de um intervalo (com If-Range); pedidos
+  com vários intervalos recebem o arquivo inteiro, como o RFC 9110 permite.
+- Envio zero-copy (sendfile) quando o servidor ASGI oferece a extensão
+  `http.response.zerocopysend`; sem ela, arquivos pequenos (a maioria das miniaturas) são
+  abertos, lidos e fechados em uma única ida à thread (storage_backend) e os grandes são lidos
+  com os.pread. No S3, os objetos grandes são repassados em blocos, conforme chegam.
+"""
+
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+from starlette.concurrency import iterate_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import Response
+
+from app.services.storage_backend import Objeto
+
+load_dotenv()
+
+CACHE_IMUTAVEL = "public, max-age=31536000, immutable"
+CACHE_PROVISORIO = os.getenv("IMAGES_FALLBACK_CACHE_CONTROL", "public, max-age=60")
+TAMANHO_BLOCO = 256 * 1024
+
+NOME_ENDERECADO = re.compile(r"[0-9a-f]{64}\.[a-z]+")
+INTERVALO = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+def etag_de(objeto: Objeto) -> str:
+    nome = objeto.chave.rpartition("/")[2]
+    if NOME_ENDERECADO.fullmatch(nome):
+        return f'"{nome.split(".")[0]}"'
+    return f'"{objeto.mtime_ns:x}-{objeto.tamanho:x}"'
+
+
+def nao_modificado(headers, etag: str, objeto: Objeto) -> bool:
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        etags = {valor.strip().removeprefix("W/") for valor in if_none_match.split(",")}
+        return "*" in etags or etag in etags
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(objeto.mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def intervalo_pedido(headers, etag: str, tamanho: int):
+    """(início, fim exclusivo) do Range de um intervalo; None para o arquivo inteiro; ValueError se insatisfazível."""
+    valor = headers.get("range")
+    if not valor or "," in valor:
+        return None
+    if_range = headers.get("if-range")
+    if if_range is not None and if_range.strip() != etag:
+        return None  # O arquivo do cliente é outro: envia o inteiro
+    encontrado = INTERVALO.fullmatch(valor.strip())
+    if not encontrado or encontrado.groups() == ("", ""):
+        return None
+    inicio, fim = encontrado.groups()
+    if inicio == "":
+        inicio, fim = max(tamanho - int(fim), 0), tamanho  # Últimos N bytes
+    else:
+        inicio, fim = int(inicio), min(int(fim) + 1, tamanho) if fim else tamanho
+    if inicio >= tamanho or inicio >= fim:
+        raise ValueError
+    return inicio, fim
+
+
+class RespostaImagem(Response):
+    """Resposta de um arquivo imutável já aberto pelo backend (ETag, 304, Range e envio zero-copy).
+
+    `conteudo`: os bytes, um descritor de arquivo (fechado ao final) ou um corpo com
+    `blocos(inicio, fim)` e `fechar()`, como o CorpoS3.
+    """
+
+    def __init__(self, objeto: Objeto, media_type: str, conteudo, imutavel: bool = True, headers: dict = None):
+        self.objeto = objeto
+        self.media_type = media_type
+        self.conteudo = conteudo
+        self.imutavel = imutavel
+        self.extra_headers = headers or {}
+        self.status_code = 200
+        self.background = None
+
+    async def __call__(self, scope, receive, send):
+        descritor = self.conteudo if isinstance(self.conteudo, int) else None
+        try:
+            await self._responder(scope, send, Headers(scope=scope), self.objeto, self.conteudo, descritor)
+        finally:
+            if descritor is not None:
+                os.close(descritor)
+            elif not isinstance(self.conteudo, bytes):
+                await run_in_threadpool(self.conteudo.fechar)
+        if self.background is not None:
+            await self.background()
+
+    async def _responder(self, scope, send, pedido, objeto, conteudo, descritor):
+        tamanho = objeto.tamanho
+        etag = etag_de(objeto)
+        headers = {
+            **self.extra_headers,
+            "etag": etag,
+            "last-modified": formatdate(objeto.mtime, usegmt=True),
+            "cache-control": CACHE_IMUTAVEL if self.imutavel else CACHE_PROVISORIO,
+            "accept-ranges": "bytes",
+        }
+
+        if nao_modificado(pedido, etag, objeto):
+            await self._enviar_cabecalhos(send, 304, headers)
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        try:
+            intervalo = intervalo_pedido(pedido, etag, tamanho)
+        except ValueError:
+            headers["content-range"] = f"bytes */{tamanho}"
+            headers["content-length"] = "0"
+            await self._enviar_cabecalhos(send, 416, headers)
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        inicio, fim = intervalo or (0, tamanho)
+        headers["content-type"] = self.media_type
+        headers["content-length"] = str(fim - inicio)
+        if intervalo:
+            headers["content-range"] = f"bytes {inicio}-{fim - 1}/{tamanho}"
+        await self._enviar_cabecalhos(send, 206 if intervalo else 200, headers)
+
+        if scope["method"] == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+        elif isinstance(conteudo, bytes):
+            await send({"type": "http.response.body", "body": conteudo[inicio:fim]})
+        elif descritor is None:
+            async for bloco in iterate_in_threadpool(conteudo.blocos(inicio, fim)):
+                await send({"type": "http.response.body", "body": bloco, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        elif "http.response.zerocopysend" in scope.get("extensions", {}):
+            await send({"type": "http.response.zerocopysend", "file": descritor, "offset": inicio, "count": fim - inicio})
+        else:
+            while inicio < fim:
+                bloco = await run_in_threadpool(os.pread, descritor, min(TAMANHO_BLOCO, fim - inicio), inicio)
+                if not bloco:
+                    break
+                inicio += len(bloco)
+                await send({"type": "http.response.body", "body": bloco, "more_body": inicio < fim})
+            if inicio < fim:  # Arquivo truncado durante o envio
+                await send({"type": "http.response.body", "body": b""})
+
+    async def _enviar_cabecalhos(self, send, status_code: int, headers: dict):
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [(nome.lower().encode("latin-1"), valor.encode("latin-1")) for nome, valor in headers.items()],
+        })
@@ -0,0 +1,66 @@
+"""
+Validação do conteúdo das imagens enviadas, sem confiar na extensão do nome.
+
+- O tipo é identificado pelos primeiros bytes (assinatura PNG ou JPEG), já durante o
+  recebimento: um arquivo renomeado é recusado antes de ser gravado em disco.
+- As dimensões vêm só do cabeçalho (IHDR do PNG, marcador SOF do JPEG), lido pelo Pillow
+  sem decodificar os pixels; imagens acima de IMAGE_MAX_PIXELS são recusadas antes de
+  qualquer decodificação completa (bombas de descompressão).
+
+inspecionar_imagem faz I/O e é chamada em uma thread do pool (run_in_threadpool).
+"""
+
+import os
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+
+load_dotenv()
+
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(40_000_000)))  # 40 megapixels
+
+# Assinatura (magic bytes) -> media type; os formatos do Pillow correspondentes ficam em FORMATOS
+ASSINATURAS = {
+    b"\x89PNG\r\n\x1a\n": "image/png",
+    b"\xff\xd8\xff": "image/jpeg",
+}
+TAMANHO_ASSINATURA = max(len(assinatura) for assinatura in ASSINATURAS)
+FORMATOS = {"image/png": "PNG", "image/jpeg": "JPEG"}
+EXTENSOES = {"image/png": ".png", "image/jpeg": ".jpg"}
+
+
+def tipo_por_assinatura(inicio: bytes) -> str:
+    """Media type identificado pelos primeiros bytes; None se não for um formato aceito."""
+    for assinatura, media_type in ASSINATURAS.items():
+        if inicio.startswith(assinatura):
+            return media_type
+    return None
+
+
+def erro_imagem(detalhe: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detalhe)
+
+
+def inspecionar_imagem(caminho: str) -> dict:
+    """Tipo e dimensões lidos do cabeçalho do arquivo: {"content_type", "width", "height"}."""
+    from PIL import Image, UnidentifiedImageError
+
+    with open(caminho, "rb") as arquivo:
+        media_type = tipo_por_assinatura(arquivo.read(TAMANHO_ASSINATURA))
+        if media_type is None:
+            raise erro_imagem("Conteúdo não é uma imagem PNG ou JPEG")
+        arquivo.seek(0)
+        try:
+            # O Image.open só lê o cabeçalho: os pixels não são decodificados
+            with Image.open(arquivo, formats=[FORMATOS[media_type]]) as imagem:
+                largura, altura = imagem.size
+        except Image.DecompressionBombError:
+            raise erro_imagem(f"Imagem excede o limite de {IMAGE_MAX_PIXELS} pixels")
+        except (UnidentifiedImageError, SyntaxError, OSError):
+            raise erro_imagem("Imagem corrompida")
+
+    if largura <= 0 or altura <= 0:
+        raise erro_imagem("Imagem corrompida")
+    if largura * altura > IMAGE_MAX_PIXELS:
+        raise erro_imagem(f"Imagem de {largura}x{altura} excede o limite de {IMAGE_MAX_PIXELS} pixels")
+    return {"content_type": media_type, "width": largura, "height": altura}
@@ -0,0 +1,345 @@
+"""
+Backends de armazenamento dos arquivos das imagens, escolhidos por STORAGE_BACKEND:
+
+- local: o diretório upload, como antes (compartilhado por volume com o worker do Celery);
+- s3: um bucket S3 compatível (AWS S3, MinIO...). Nenhum nó do images_service depende de um
+  volume compartilhado, então o serviço pode rodar com várias réplicas atrás de um balanceador.
+
+Os dois expõem a mesma interface, com chaves relativas ao diretório upload
+(`<categoria>/ab/cd/<arquivo>`); a api_biblioteca tem a parte da interface usada pela limpeza
+das órfãs (app.services.storage_backend: metadados, listar e remover). No S3, arquivos acima de
+S3_MULTIPART_THRESHOLD são enviados em partes de S3_PART_SIZE (upload multipart), lidas do
+temporário uma de cada vez: a memória por envio fica limitada a uma parte.
+"""
+
+import heapq
+import itertools
+import os
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+S3_BUCKET = os.getenv("S3_BUCKET", "")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None  # Vazio: AWS; no MinIO, http://minio:9000
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+S3_KEY_PREFIX = os.getenv("S3_KEY_PREFIX", "")
+S3_MULTIPART_THRESHOLD = int(os.getenv("S3_MULTIPART_THRESHOLD", str(8 * 1024 * 1024)))
+S3_PART_SIZE = max(int(os.getenv("S3_PART_SIZE", str(8 * 1024 * 1024))), 5 * 1024 * 1024)  # Mínimo do S3
+S3_MAX_CONNECTIONS = int(os.getenv("S3_MAX_CONNECTIONS", "20"))
+
+LIMITE_LEITURA_UNICA = 256 * 1024  # Arquivos até esse tamanho são lidos de uma vez
+TAMANHO_BLOCO = 256 * 1024
+LOTE_LISTAGEM = 1000
+
+# Um cliente do S3 por processo (os do pool de derivados criam o seu); clientes do boto3 são
+# thread-safe, mas não sobrevivem a um fork
+_clientes = {}
+_lock_clientes = threading.Lock()
+
+
+class Objeto:
+    """Metadados de um arquivo armazenado."""
+
+    def __init__(self, chave: str, tamanho: int, mtime_ns: int):
+        self.chave = chave
+        self.tamanho = tamanho
+        self.mtime_ns = mtime_ns
+
+    @property
+    def mtime(self) -> float:
+        return self.mtime_ns / 1e9
+
+
+def novo_temporario(diretorio: str, sufixo: str = ".part") -> str:
+    os.makedirs(diretorio, exist_ok=True)
+    descritor, caminho = tempfile.mkstemp(dir=diretorio, prefix="arquivo-", suffix=sufixo)
+    os.fchmod(descritor, 0o644)  # O mkstemp cria com 0600; o arquivo publicado precisa ser legível
+    os.close(descritor)
+    return caminho
+
+
+def descartar(caminho: str):
+    try:
+        os.unlink(caminho)
+    except FileNotFoundError:
+        pass
+
+
+class ArmazenamentoLocal:
+    """Arquivos em um diretório local; os temporários ficam nele também (rename atômico)."""
+
+    compartilhado = False  # Um único sistema de arquivos: a contagem de referências em SQLite vale para todos
+
+    def __init__(self, diretorio: str):
+        self.diretorio = diretorio
+        self.diretorio_temporario = os.path.join(diretorio, ".tmp")
+        os.makedirs(self.diretorio_temporario, exist_ok=True)
+
+    def caminho(self, chave: str) -> str:
+        return os.path.join(self.diretorio, chave)
+
+    def metadados(self, chave: str) -> Objeto:
+        """Tamanho e mtime do arquivo; None se não existe."""
+        try:
+            resultado_stat = os.stat(self.caminho(chave))
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        if not stat.S_ISREG(resultado_stat.st_mode):
+            return None
+        return Objeto(chave, resultado_stat.st_size, resultado_stat.st_mtime_ns)
+
+    def existe(self, chave: str) -> bool:
+        return self.metadados(chave) is not None
+
+    def tocar(self, chave: str):
+        os.utime(self.caminho(chave))
+
+    def publicar(self, chave: str, caminho_local: str, media_type: str = None):
+        """Move o arquivo local (do diretório temporário) para a chave, substituindo o existente."""
+        destino = self.caminho(chave)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        os.replace(caminho_local, destino)
+
+    def abrir(self, chave: str) -> tuple:
+        """(Objeto, conteúdo): os bytes, para arquivos pequenos, ou o descritor aberto. FileNotFoundError se não existe."""
+        try:
+            descritor = os.open(self.caminho(chave), os.O_RDONLY)
+        except (IsADirectoryError, NotADirectoryError):
+            raise FileNotFoundError(chave)
+        try:
+            resultado_stat = os.fstat(descritor)
+            if not stat.S_ISREG(resultado_stat.st_mode):
+                raise FileNotFoundError(chave)
+            objeto = Objeto(chave, resultado_stat.st_size, resultado_stat.st_mtime_ns)
+            if objeto.tamanho <= LIMITE_LEITURA_UNICA:
+                conteudo = os.pread(descritor, objeto.tamanho, 0)
+                os.close(descritor)
+                return objeto, conteudo
+        except BaseException:
+            os.close(descritor)
+            raise
+        return objeto, descritor
+
+    @contextmanager
+    def arquivo_local(self, chave: str):
+        """Caminho local com o conteúdo da chave (aqui, o próprio arquivo)."""
+        caminho = self.caminho(chave)
+        if not os.path.isfile(caminho):
+            raise FileNotFoundError(chave)
+        yield caminho
+
+    def remover(self, chave: str):
+        descartar(self.caminho(chave))
+
+    def listar(self, prefixo: str, depois_de: str = "", limite: int = None):
+        """Chaves que começam com `prefixo`, depois de `depois_de`, em ordem (como o ListObjectsV2 do S3).
+
+        Lê os diretórios sob demanda, no máximo LOTE_LISTAGEM entradas de cada vez, e não abre os
+        subdiretórios que ficam inteiros antes de `depois_de`.
+        """
+        diretorio, _, inicio = prefixo.rpartition("/")
+        return itertools.islice(self._percorrer(f"{diretorio}/" if diretorio else "", inicio, depois_de), limite)
+
+    def _percorrer(self, base: str, inicio: str, depois_de: str):
+        caminho = os.path.join(self.diretorio, base)
+        ultima = ""
+        while True:
+            try:
+                with os.scandir(caminho) as entradas:
+                    lote = heapq.nsmallest(LOTE_LISTAGEM, self._entradas(entradas, base, inicio, depois_de, ultima))
+            except (FileNotFoundError, NotADirectoryError):
+                return
+            for ordem, diretorio in lote:
+                if diretorio:
+                    yield from self._percorrer(base + ordem, "", depois_de)
+                else:
+                    yield base + ordem
+            if len(lote) < LOTE_LISTAGEM:
+                return
+            ultima = lote[-1][0]
+
+    def _entradas(self, entradas, base: str, inicio: str, depois_de: str, ultima: str):
+        # Subdiretórios entram como `nome/`, a posição das suas chaves na ordem lexicográfica
+        for entrada in entradas:
+            if entrada.name.startswith(".") or not entrada.name.startswith(inicio):
+                continue
+            if entrada.is_dir(follow_symlinks=False):
+                ordem = f"{entrada.name}/"
+                # Todas as chaves do subdiretório vêm antes do cursor
+                if depois_de and base + ordem < depois_de and not depois_de.startswith(base + ordem):
+                    continue
+            elif entrada.is_file(follow_symlinks=False):
+                ordem = entrada.name
+                if base + ordem <= depois_de:
+                    continue
+            else:
+                continue
+            if ordem > ultima:
+                yield ordem, ordem.endswith("/")
+
+
+class CorpoS3:
+    """Corpo de um objeto grande do S3, enviado em blocos conforme a resposta é escrita."""
+
+    def __init__(self, armazenamento, chave: str, corpo, tamanho: int):
+        self.armazenamento = armazenamento
+        self.chave = chave
+        self.corpo = corpo
+        self.tamanho = tamanho
+
+    def blocos(self, inicio: int, fim: int):
+        if (inicio, fim) != (0, self.tamanho):
+            # Range: pede ao S3 só o intervalo, em vez de descartar o início do corpo já aberto
+            self.corpo.close()
+            self.corpo = self.armazenamento.obter(self.chave, Range=f"bytes={inicio}-{fim - 1}")["Body"]
+        yield from self.corpo.iter_chunks(TAMANHO_BLOCO)
+
+    def fechar(self):
+        self.corpo.close()
+
+
+def _nao_encontrado(erro) -> bool:
+    return erro.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+
+class ArmazenamentoS3:
+    """Objetos em um bucket S3 compatível; os temporários ficam em um diretório local do nó."""
+
+    compartilhado = True  # Vários nós gravam no mesmo bucket: uma contagem local de referências não vale
+
+    def __init__(self, bucket: str, prefixo: str, diretorio_temporario: str, endpoint_url: str = None, regiao: str = None):
+        if not bucket:
+            raise ValueError("S3_BUCKET não configurado")
+        self.bucket = bucket
+        self.prefixo = prefixo
+        self.diretorio_temporario = diretorio_temporario
+        self.endpoint_url = endpoint_url
+        self.regiao = regiao
+        os.makedirs(diretorio_temporario, exist_ok=True)
+
+    def cliente(self):
+        chave_cliente = (os.getpid(), self.endpoint_url, self.regiao)
+        with _lock_clientes:
+            if chave_cliente not in _clientes:
+                import boto3  # Só é necessário com STORAGE_BACKEND=s3
+                from botocore.config import Config
+
+                _clientes[chave_cliente] = boto3.session.Session().client(
+                    "s3", endpoint_url=self.endpoint_url, region_name=self.regiao,
+                    config=Config(max_pool_connections=S3_MAX_CONNECTIONS),
+                )
+            return _clientes[chave_cliente]
+
+    def _chamar(self, operacao: str, chave: str, **parametros):
+        """Chama a operação do S3 na chave; FileNotFoundError se o objeto não existe."""
+        from botocore.exceptions import ClientError
+
+        try:
+            return getattr(self.cliente(), operacao)(Bucket=self.bucket, Key=self.prefixo + chave, **parametros)
+        except ClientError as e:
+            if _nao_encontrado(e):
+                raise FileNotFoundError(chave) from e
+            raise
+
+    def obter(self, chave: str, **parametros) -> dict:
+        return self._chamar("get_object", chave, **parametros)
+
+    def metadados(self, chave: str) -> Objeto:
+        try:
+            cabecalho = self._chamar("head_object", chave)
+        except FileNotFoundError:
+            return None
+        return Objeto(chave, cabecalho["ContentLength"], int(cabecalho["LastModified"].timestamp()) * 10**9)
+
+    def existe(self, chave: str) -> bool:
+        return self.metadados(chave) is not None
+
+    def tocar(self, chave: str):
+        # O S3 não tem utime: copiar o objeto sobre ele mesmo renova o LastModified
+        cabecalho = self._chamar("head_object", chave)
+        self._chamar(
+            "copy_object", chave,
+            CopySource={"Bucket": self.bucket, "Key": self.prefixo + chave},
+            MetadataDirective="REPLACE",
+            ContentType=cabecalho.get("ContentType", "binary/octet-stream"),
+            Metadata=cabecalho.get("Metadata", {}),
+        )
+
+    def publicar(self, chave: str, caminho_local: str, media_type: str = None):
+        """Envia o arquivo local para a chave (em partes, se for grande) e apaga a cópia local."""
+        extras = {"ContentType": media_type} if media_type else {}
+        if os.path.getsize(caminho_local) <= S3_MULTIPART_THRESHOLD:
+            with open(caminho_local, "rb") as arquivo:
+                self._chamar("put_object", chave, Body=arquivo, **extras)
+        else:
+            self._enviar_em_partes(chave, caminho_local, extras)
+        descartar(caminho_local)
+
+    def _enviar_em_partes(self, chave: str, caminho_local: str, extras: dict):
+        upload_id = self._chamar("create_multipart_upload", chave, **extras)["UploadId"]
+        try:
+            partes = []
+            with open(caminho_local, "rb") as arquivo:
+                while bloco := arquivo.read(S3_PART_SIZE):
+                    numero = len(partes) + 1
+                    resposta = self._chamar("upload_part", chave, UploadId=upload_id, PartNumber=numero, Body=bloco)
+                    partes.append({"ETag": resposta["ETag"], "PartNumber": numero})
+            self._chamar("complete_multipart_upload", chave, UploadId=upload_id, MultipartUpload={"Parts": partes})
+        except BaseException:
+            # Partes de um upload não concluído ficam cobradas no bucket até serem abortadas
+            self._chamar("abort_multipart_upload", chave, UploadId=upload_id)
+            raise
+
+    def abrir(self, chave: str) -> tuple:
+        """(Objeto, conteúdo): os bytes, para objetos pequenos, ou um CorpoS3. FileNotFoundError se não existe."""
+        resposta = self.obter(chave)
+        objeto = Objeto(chave, resposta["ContentLength"], int(resposta["LastModified"].timestamp()) * 10**9)
+        if objeto.tamanho <= LIMITE_LEITURA_UNICA:
+            try:
+                return objeto, resposta["Body"].read()
+            finally:
+                resposta["Body"].close()
+        return objeto, CorpoS3(self, chave, resposta["Body"], objeto.tamanho)
+
+    @contextmanager
+    def arquivo_local(self, chave: str):
+        """Baixa o objeto para um temporário local, apagado ao sair do bloco."""
+        caminho = novo_temporario(self.diretorio_temporario, os.path.splitext(chave)[1])
+        try:
+            corpo = self.obter(chave)["Body"]
+            try:
+                with open(caminho, "wb") as arquivo:
+                    for bloco in corpo.iter_chunks(TAMANHO_BLOCO):
+                        arquivo.write(bloco)
+            finally:
+                corpo.close()
+            yield caminho
+        finally:
+            descartar(caminho)
+
+    def remover(self, chave: str):
+        self._chamar("delete_object", chave)  # Idempotente: remover um objeto inexistente não é erro
+
+    def listar(self, prefixo: str, depois_de: str = "", limite: int = None):
+        """Chaves que começam com `prefixo`, depois de `depois_de`, em ordem; páginas de até mil chaves."""
+        parametros = {"Bucket": self.bucket, "Prefix": self.prefixo + prefixo}
+        if depois_de:
+            parametros["StartAfter"] = self.prefixo + depois_de
+        paginas = self.cliente().get_paginator("list_objects_v2").paginate(**parametros)
+        chaves = (objeto["Key"][len(self.prefixo):] for pagina in paginas for objeto in pagina.get("Contents", []))
+        return itertools.islice(chaves, limite)
+
+
+def criar_backend(diretorio: str):
+    """Backend configurado em STORAGE_BACKEND; `diretorio` guarda os arquivos (local) ou só os temporários (s3)."""
+    if STORAGE_BACKEND == "s3":
+        return ArmazenamentoS3(S3_BUCKET, S3_KEY_PREFIX, os.path.join(diretorio, ".tmp"), S3_ENDPOINT_URL, S3_REGION)
+    if STORAGE_BACKEND != "local":
+        raise ValueError(f"STORAGE_BACKEND inválido: {STORAGE_BACKEND} (use local ou s3)")
+    return ArmazenamentoLocal(diretorio)
@@ -0,0 +1,187 @@
+"""
+Recebe o upload (multipart/form-data) em streaming direto para o disco.
+
+O corpo da requisição é lido em blocos e entregue ao parser incremental do python-multipart.
+Os bytes do campo do arquivo são acumulados até TAMANHO_BLOCO_ESCRITA e gravados por uma thread,
+então o event loop não espera o disco e a memória usada por upload fica limitada a um bloco,
+qualquer que seja o tamanho do arquivo. O upload é abortado assim que passa do limite e o arquivo
+é gravado em um temporário, que só é movido para o destino (rename atômico) depois de completo.
+O SHA-256 do conteúdo é calculado na mesma thread, enquanto o arquivo é gravado, e o tipo do
+conteúdo pode ser identificado pelos primeiros bytes, antes da primeira escrita.
+"""
+
+import hashlib
+import os
+import tempfile
+
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+TAMANHO_BLOCO_ESCRITA = 256 * 1024  # Bytes acumulados antes de cada escrita em disco
+MARGEM_MULTIPART = 16 * 1024  # Delimitadores e cabeçalhos das partes, além do arquivo em si
+TAMANHO_INICIO = 16  # Bytes do início do arquivo entregues a `identificar`
+
+
+class ArquivoRecebido:
+    """Arquivo já gravado em um temporário, pronto para ser publicado."""
+
+    def __init__(self, caminho_temporario: str, extensao: str, tamanho: int, sha256: str, media_type: str = None):
+        self.caminho_temporario = caminho_temporario
+        self.extensao = extensao
+        self.tamanho = tamanho
+        self.sha256 = sha256
+        self.media_type = media_type
+
+
+class LeitorMultipart:
+    """Acompanha as partes do multipart e acumula os bytes do campo do arquivo."""
+
+    def __init__(self, boundary: bytes, campo: str):
+        self.campo = campo.encode()
+        self.nome_arquivo = None  # Nome original enviado pelo cliente
+        self.tamanho = 0
+        self.pendente = bytearray()
+        self.concluido = False
+        self._no_campo = False
+        self._cabecalhos = {}
+        self._nome_cabecalho = b""
+        self._valor_cabecalho = b""
+        self.parser = MultipartParser(boundary, {
+            "on_part_begin": self._inicio_parte,
+            "on_header_field": self._campo_cabecalho,
+            "on_header_value": self._valor_do_cabecalho,
+            "on_header_end": self._fim_cabecalho,
+            "on_headers_finished": self._fim_cabecalhos,
+            "on_part_data": self._dados,
+            "on_part_end": self._fim_parte,
+        })
+
+    def _inicio_parte(self):
+        self._cabecalhos = {}
+        self._no_campo = False
+
+    def _campo_cabecalho(self, dados: bytes, inicio: int, fim: int):
+        self._nome_cabecalho += dados[inicio:fim]
+
+    def _valor_do_cabecalho(self, dados: bytes, inicio: int, fim: int):
+        self._valor_cabecalho += dados[inicio:fim]
+
+    def _fim_cabecalho(self):
+        self._cabecalhos[self._nome_cabecalho.lower()] = self._valor_cabecalho
+        self._nome_cabecalho = self._valor_cabecalho = b""
+
+    def _fim_cabecalhos(self):
+        _, opcoes = parse_options_header(self._cabecalhos.get(b"content-disposition"))
+        if opcoes.get(b"name") == self.campo and b"filename" in opcoes and not self.concluido:
+            self._no_campo = True
+            self.nome_arquivo = opcoes[b"filename"].decode("utf-8", "replace")
+
+    def _dados(self, dados: bytes, inicio: int, fim: int):
+        if self._no_campo:
+            self.pendente += dados[inicio:fim]
+            self.tamanho += fim - inicio
+
+    def _fim_parte(self):
+        if self._no_campo:
+            self._no_campo = False
+            self.concluido = True
+
+
+def descartar(caminho: str):
+    try:
+        os.unlink(caminho)
+    except FileNotFoundError:
+        pass
+
+
+def _abrir_temporario(diretorio: str):
+    os.makedirs(diretorio, exist_ok=True)
+    descritor, caminho = tempfile.mkstemp(dir=diretorio, prefix="upload-", suffix=".part")
+    os.fchmod(descritor, 0o644)  # O mkstemp cria com 0600; o arquivo publicado precisa ser legível
+    return os.fdopen(descritor, "wb"), caminho
+
+
+def _gravar(arquivo, sha256, dados: bytearray):
+    sha256.update(dados)  # O hashlib libera o GIL em blocos grandes
+    arquivo.write(dados)
+
+
+def _finalizar(arquivo):
+    arquivo.flush()
+    os.fsync(arquivo.fileno())  # O conteúdo precisa estar no disco antes do rename
+    arquivo.close()
+
+
+def _abortar(arquivo, caminho: str):
+    if arquivo is not None:
+        arquivo.close()
+        descartar(caminho)
+
+
+async def receber_upload(
+    request: Request, diretorio_temporario: str, tamanho_maximo: int, extensoes_permitidas: set, campo: str = "file",
+    identificar=None,
+) -> ArquivoRecebido:
+    """Grava o campo `campo` do corpo multipart em um temporário, validando extensão e tamanho.
+
+    `identificar(inicio)` recebe os primeiros bytes do arquivo e retorna o media type, ou None para
+    recusar o upload antes de gravar qualquer byte.
+    """
+    erro_tamanho = HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST, detail=f"Tamanho máximo de {tamanho_maximo // (1024 * 1024)} MB excedido"
+    )
+    tipo, opcoes = parse_options_header(request.headers.get("content-type"))
+    if tipo != b"multipart/form-data" or not opcoes.get(b"boundary"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Envie o arquivo como multipart/form-data")
+
+    # Recusa antes de ler o corpo quando o tamanho declarado já passa do limite
+    limite_corpo = tamanho_maximo + MARGEM_MULTIPART
+    declarado = request.headers.get("content-length")
+    if declarado and declarado.isdigit() and int(declarado) > limite_corpo:
+        raise erro_tamanho
+
+    leitor = LeitorMultipart(opcoes[b"boundary"], campo)
+    arquivo = caminho = extensao = media_type = None
+    sha256 = hashlib.sha256()
+    lidos = 0
+    try:
+        async for bloco in request.stream():
+            lidos += len(bloco)
+            if lidos > limite_corpo:  # Corpo sem Content-Length (chunked) ou com partes extras
+                raise erro_tamanho
+            leitor.parser.write(bloco)
+            if leitor.tamanho > tamanho_maximo:
+                raise erro_tamanho
+
+            if leitor.nome_arquivo is not None and arquivo is None:
+                extensao = os.path.splitext(leitor.nome_arquivo)[1].lower()
+                if extensao not in extensoes_permitidas:
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Tipo de arquivo não permitido")
+                arquivo, caminho = await run_in_threadpool(_abrir_temporario, diretorio_temporario)
+
+            if identificar and arquivo is not None and media_type is None and (
+                len(leitor.pendente) >= TAMANHO_INICIO or leitor.concluido
+            ):
+                media_type = identificar(bytes(leitor.pendente[:TAMANHO_INICIO]))
+                if media_type is None:
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Conteúdo não corresponde a um tipo permitido")
+
+            if arquivo is not None and (len(leitor.pendente) >= TAMANHO_BLOCO_ESCRITA or leitor.concluido):
+                dados, leitor.pendente = leitor.pendente, bytearray()
+                await run_in_threadpool(_gravar, arquivo, sha256, dados)
+        leitor.parser.finalize()
+
+        if not leitor.concluido:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Campo '{campo}' ausente ou incompleto")
+        await run_in_threadpool(_finalizar, arquivo)
+        return ArquivoRecebido(caminho, extensao, leitor.tamanho, sha256.hexdigest(), media_type)
+    except BaseException as e:
+        # Qualquer falha descarta o temporário, inclusive o cliente desconectando no meio do envio
+        _abortar(arquivo, caminho)
+        if isinstance(e, MultipartParseError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Corpo multipart inválido")
+        if isinstance(e, OSError):
+            raise HTTPException(status_code=500, detail=f"Erro ao salvar arquivo: {e}")
+        raise
@@ -0,0 +1,69 @@
+"""
+Tickets de upload direto emitidos pela api_biblioteca.
+
+O navegador envia a imagem direto para cá com um ticket assinado pela API (HMAC-SHA256 com a
+chave compartilhada UPLOAD_TICKET_SECRET), que define a categoria e a entidade de destino. O
+ticket é conferido localmente, antes de ler o corpo; depois de armazenar a imagem, a API é
+avisada pelo callback e grava a URL no livro ou no usuário.
+
+Formato: <payload JSON em base64url>.<HMAC do payload em base64url>
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+API_KEY = os.getenv("API_KEY", "CHAVE_SECRETA_PADRAO")
+UPLOAD_TICKET_SECRET = os.getenv("UPLOAD_TICKET_SECRET")
+# Com uma chave padrão, qualquer um que a conhecesse assinaria tickets: sem a variável o serviço não sobe
+if not UPLOAD_TICKET_SECRET:
+    raise ValueError("A variável de ambiente UPLOAD_TICKET_SECRET não foi configurada no arquivo .env")
+API_CALLBACK_URL = os.getenv("API_CALLBACK_URL", "http://api_biblioteca:8000/images/callback")
+API_CALLBACK_TIMEOUT = float(os.getenv("API_CALLBACK_TIMEOUT", "10"))
+
+_client = None
+
+
+def _assinatura(corpo: str) -> str:
+    digest = hmac.new(UPLOAD_TICKET_SECRET.encode(), corpo.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def verificar_ticket(ticket: str) -> dict:
+    """Payload do ticket; ValueError se a assinatura não confere ou se já expirou."""
+    corpo, _, assinatura = ticket.partition(".")
+    # Comparados como bytes: o compare_digest recusa str com caracteres não ASCII (TypeError)
+    if not assinatura or not hmac.compare_digest(assinatura.encode(), _assinatura(corpo).encode()):
+        raise ValueError("Ticket com assinatura inválida")
+    payload = json.loads(base64.urlsafe_b64decode(corpo + "=" * (-len(corpo) % 4)))
+    if payload["exp"] < time.time():
+        raise ValueError("Ticket expirado")
+    return payload
+
+
+def cliente() -> httpx.AsyncClient:
+    # Um cliente por worker: as conexões com a API são reaproveitadas entre os callbacks
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(timeout=API_CALLBACK_TIMEOUT, headers={"X-API-KEY": API_KEY})
+    return _client
+
+
+async def encerrar_cliente():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def notificar_api(ticket: str, file_url: str) -> httpx.Response:
+    """Callback para a API gravar a URL na entidade do ticket."""
+    return await cliente().post(API_CALLBACK_URL, json={"ticket": ticket, "file_url": file_url})
@@ -0,0 +1,199 @@
+"""
+Vazão do serviço de imagens ao servir muitas imagens pequenas (miniaturas).
+
+Gera N imagens pequenas (10 mil por padrão) em um diretório temporário, no formato dos
+uploads (`upload/<categoria>/ab/cd/<sha256>.png`), sobe o serviço com uvicorn e mede, com
+clientes em laço fechado e conexões keep-alive:
+
+    completo      GET sem cabeçalhos condicionais (200 com o corpo)
+    revalidacao   GET com If-None-Match da ETag já conhecida (304 sem corpo)
+    intervalo     GET com Range dos primeiros 1024 bytes (206)
+
+O mesmo diretório é servido também pelo StaticFiles puro (`--servidor static`), a forma
+anterior de servir /files, para comparação. Reporta req/s, MB/s e latências p50/p95/p99.
+
+Uso (em /images_service):
+    python -m benchmarks.serving
+    python -m benchmarks.serving --imagens 10000 --segundos 10 --concorrencia 32 --servidor app static
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import socket
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+import httpx
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.staticfiles import StaticFiles
+
+from app.services.content_store import fragmento
+
+DIRETORIO_SERVICO = Path(__file__).resolve().parents[1]
+CATEGORIA = "book_cover"
+
+SERVIDORES = {
+    "app": "app.main:app",
+    "static": "benchmarks.serving:app_static",
+}
+CENARIOS = ("completo", "revalidacao", "intervalo")
+
+# Linha de base: o StaticFiles montado em /files, sem a rota de imagens na frente
+app_static = Starlette(routes=[Mount("/files", StaticFiles(directory="upload", check_dir=False))])
+
+
+def png(largura: int, altura: int, rng: random.Random) -> bytes:
+    """PNG RGB com ruído (não comprime bem, como uma miniatura real de alguns KB)."""
+    def bloco(tipo: bytes, dados: bytes) -> bytes:
+        return struct.pack(">I", len(dados)) + tipo + dados + struct.pack(">I", zlib.crc32(tipo + dados))
+
+    linhas = b"".join(b"\x00" + rng.randbytes(largura * 3) for _ in range(altura))
+    cabecalho = struct.pack(">IIBBBBB", largura, altura, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + bloco(b"IHDR", cabecalho) + bloco(b"IDAT", zlib.compress(linhas, 1)) + bloco(b"IEND", b"")
+
+
+def gerar_imagens(diretorio: str, total: int, semente: int) -> list:
+    """Grava as imagens como uploads endereçados pelo conteúdo (em ab/cd/); retorna os caminhos na categoria."""
+    rng = random.Random(semente)
+    relativos = []
+    for _ in range(total):
+        dados = png(rng.randint(24, 48), rng.randint(24, 48), rng)
+        nome = f"{hashlib.sha256(dados).hexdigest()}.png"
+        relativo = f"{fragmento(nome)}/{nome}"
+        destino = os.path.join(diretorio, "upload", CATEGORIA, relativo)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        with open(destino, "wb") as arquivo:
+            arquivo.write(dados)
+        relativos.append(relativo)
+    return relativos
+
+
+def porta_livre() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def aguardar_servidor(url: str, caminho: str, limite: float = 30):
+    async with httpx.AsyncClient() as client:
+        inicio = time.monotonic()
+        while time.monotonic() - inicio < limite:
+            try:
+                if (await client.get(f"{url}{caminho}")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Servidor não respondeu em {limite:.0f}s")
+
+
+async def coletar_etags(client: httpx.AsyncClient, caminhos: list) -> dict:
+    etags = {}
+    for inicio in range(0, len(caminhos), 100):
+        lote = caminhos[inicio:inicio + 100]
+        respostas = await asyncio.gather(*(client.head(caminho) for caminho in lote))
+        etags.update((caminho, resposta.headers["etag"]) for caminho, resposta in zip(lote, respostas))
+    return etags
+
+
+async def medir(url: str, cenario: str, caminhos: list, etags: dict, segundos: float, concorrencia: int, semente: int) -> dict:
+    latencias = []
+    erros = 0
+    total_bytes = 0
+    esperado = {"completo": 200, "revalidacao": 304, "intervalo": 206}[cenario]
+    limites = httpx.Limits(max_connections=concorrencia, max_keepalive_connections=concorrencia)
+
+    async with httpx.AsyncClient(base_url=url, limits=limites, timeout=30) as client:
+        fim = time.perf_counter() + segundos
+
+        async def usuario(indice: int):
+            nonlocal erros, total_bytes
+            rng = random.Random(semente + indice)
+            while time.perf_counter() < fim:
+                caminho = rng.choice(caminhos)
+                headers = {}
+                if cenario == "revalidacao":
+                    headers["if-none-match"] = etags[caminho]
+                elif cenario == "intervalo":
+                    headers["range"] = "bytes=0-1023"
+                inicio = time.perf_counter()
+                try:
+                    response = await client.get(caminho, headers=headers)
+                except httpx.HTTPError:
+                    erros += 1
+                    continue
+                latencias.append(time.perf_counter() - inicio)
+                total_bytes += len(response.content)
+                if response.status_code != esperado:
+                    erros += 1
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(usuario(indice) for indice in range(concorrencia)))
+        duracao = time.perf_counter() - inicio
+
+    percentis = statistics.quantiles(latencias, n=100, method="inclusive") if len(latencias) > 1 else [0] * 99
+    return {
+        "req_s": len(latencias) / duracao,
+        "mb_s": total_bytes / duracao / 1e6,
+        "p50_ms": percentis[49] * 1000,
+        "p95_ms": percentis[94] * 1000,
+        "p99_ms": percentis[98] * 1000,
+        "erros": erros,
+    }
+
+
+async def executar(args):
+    with tempfile.TemporaryDirectory() as diretorio:
+        inicio = time.perf_counter()
+        relativos = gerar_imagens(diretorio, args.imagens, args.semente)
+        tamanho_medio = sum(os.path.getsize(os.path.join(diretorio, "upload", CATEGORIA, relativo)) for relativo in relativos) / len(relativos)
+        print(f"{len(relativos)} imagens geradas em {time.perf_counter() - inicio:.1f}s (média de {tamanho_medio / 1024:.1f} KB)")
+        caminhos = [f"/files/{CATEGORIA}/{relativo}" for relativo in relativos]
+
+        print(f"\n{'servidor':<10}{'cenário':<13}{'req/s':>9}{'MB/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'erros':>7}")
+        for servidor in args.servidor:
+            porta = porta_livre()
+            url = f"http://127.0.0.1:{porta}"
+            ambiente = {**os.environ, "PYTHONPATH": str(DIRETORIO_SERVICO)}
+            processo = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", SERVIDORES[servidor], "--port", str(porta), "--log-level", "warning", "--no-access-log"],
+                cwd=diretorio, env=ambiente,
+            )
+            try:
+                await aguardar_servidor(url, caminhos[0])
+                async with httpx.AsyncClient(base_url=url) as client:
+                    etags = await coletar_etags(client, caminhos)
+                for cenario in args.cenarios:
+                    r = await medir(url, cenario, caminhos, etags, args.segundos, args.concorrencia, args.semente)
+                    print(
+                        f"{servidor:<10}{cenario:<13}{r['req_s']:>9.0f}{r['mb_s']:>8.1f}"
+                        f"{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}{r['erros']:>7}"
+                    )
+            finally:
+                processo.terminate()
+                processo.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--imagens", type=int, default=10_000)
+    parser.add_argument("--segundos", type=float, default=10)
+    parser.add_argument("--concorrencia", type=int, default=32)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--servidor", nargs="+", choices=SERVIDORES, default=list(SERVIDORES))
+    parser.add_argument("--cenarios", nargs="+", choices=CENARIOS, default=list(CENARIOS))
+    asyncio.run(executar(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
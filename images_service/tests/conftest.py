@@ -0,0 +1,63 @@
+import io
+import os
+import tempfile
+
+# Os routers criam o diretório upload (relativo ao diretório atual) ao serem importados: os testes
+# rodam em um diretório temporário, sem tocar nos uploads de desenvolvimento
+os.chdir(tempfile.mkdtemp(prefix="images-service-testes-"))
+os.environ["STORAGE_BACKEND"] = "local"
+os.environ["API_KEY"] = "chave-de-teste"
+os.environ["UPLOAD_TICKET_SECRET"] = "segredo-de-teste"
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.main import app
+from app.routers import files, uploads
+from app.services.content_store import ArmazenamentoConteudo
+from app.services.image_validation import EXTENSOES
+from app.services.storage_backend import ArmazenamentoLocal
+
+API_KEY = os.environ["API_KEY"]
+
+
+@pytest.fixture
+def derivados_agendados(monkeypatch):
+    """Chaves mandadas para o pool de derivados; nos testes nada é gerado em outro processo."""
+    agendados = []
+
+    async def agendar(backend, chave):
+        agendados.append(chave)
+
+    monkeypatch.setattr(uploads, "processar_derivados", agendar)
+    return agendados
+
+
+# Um diretório upload novo por teste, usado pelas rotas de upload e de leitura
+@pytest.fixture
+def armazenamento(tmp_path, monkeypatch, derivados_agendados):
+    arquivos = ArmazenamentoLocal(str(tmp_path / "upload"))
+    conteudo = ArmazenamentoConteudo(arquivos.diretorio, set(EXTENSOES.values()), arquivos)
+    monkeypatch.setattr(uploads, "arquivos", arquivos)
+    monkeypatch.setattr(uploads, "TMP_DIR", arquivos.diretorio_temporario)
+    monkeypatch.setattr(uploads, "armazenamento", conteudo)
+    monkeypatch.setattr(files, "arquivos", arquivos)
+    return conteudo
+
+
+@pytest.fixture
+def client(armazenamento):
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def imagem():
+    """Fábrica de imagens: imagem(formato="PNG", largura=32, altura=24, cor=(200, 30, 30)) -> bytes."""
+    def criar(formato: str = "PNG", largura: int = 32, altura: int = 24, cor: tuple = (200, 30, 30)) -> bytes:
+        saida = io.BytesIO()
+        Image.new("RGB", (largura, altura), cor).save(saida, format=formato)
+        return saida.getvalue()
+
+    return criar
@@ -0,0 +1,95 @@
+import hashlib
+import os
+
+from tests.conftest import API_KEY
+
+CABECALHOS = {"X-API-KEY": API_KEY, "image-category": "book_cover"}
+
+
+def enviar(client, dados: bytes, **headers):
+    return client.post("/upload", files={"file": ("capa.png", dados, "image/png")}, headers={**CABECALHOS, **headers})
+
+
+def liberar(client, relativo: str):
+    return client.delete(f"/files/book_cover/{relativo}", headers={"X-API-KEY": API_KEY})
+
+
+def arquivos_na_categoria(armazenamento) -> list:
+    return list(armazenamento.backend.listar("book_cover/"))
+
+
+# O mesmo conteúdo enviado de novo aponta para o mesmo arquivo, com mais uma referência
+def test_upload_identico_reaproveita_o_arquivo(client, armazenamento, imagem):
+    png = imagem()
+    primeiro = enviar(client, png).json()
+    segundo = enviar(client, png).json()
+
+    assert segundo == primeiro
+    assert arquivos_na_categoria(armazenamento) == [f"book_cover/{primeiro['filename']}"]
+    assert liberar(client, primeiro["filename"]).json()["references"] == 1
+
+
+# Com o hash de um conteúdo já armazenado, responde sem ler o corpo (que aqui nem é multipart)
+def test_x_content_sha256_conhecido_dispensa_o_corpo(client, armazenamento, imagem):
+    png = imagem()
+    enviado = enviar(client, png).json()
+    sha256 = hashlib.sha256(png).hexdigest()
+
+    response = client.post(
+        "/upload", content=b"nao e multipart", headers={**CABECALHOS, "X-Content-SHA256": sha256.upper(), "Content-Type": "text/plain"}
+    )
+    assert response.status_code == 200
+    assert response.json() == enviado
+    assert liberar(client, enviado["filename"]).json()["references"] == 1
+
+
+def test_x_content_sha256_que_nao_confere(client, armazenamento, imagem):
+    outro = hashlib.sha256(b"outro conteudo").hexdigest()
+
+    response = enviar(client, imagem(), **{"X-Content-SHA256": outro})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Conteúdo não confere com o X-Content-SHA256"
+    assert arquivos_na_categoria(armazenamento) == []
+    assert os.listdir(armazenamento.backend.diretorio_temporario) == []
+
+    response = enviar(client, imagem(), **{"X-Content-SHA256": "abc"})
+    assert (response.status_code, response.json()["detail"]) == (400, "X-Content-SHA256 inválido")
+
+
+# As referências sobem a cada upload e descem a cada DELETE; a última apaga o original e as miniaturas
+def test_contagem_e_remocao_na_ultima_referencia(client, armazenamento, imagem):
+    png = imagem()
+    relativo = enviar(client, png).json()["filename"]
+    for _ in range(2):
+        enviar(client, png)
+    original = f"book_cover/{relativo}"
+    raiz = os.path.splitext(original)[0]
+    for miniatura in (f"{raiz}_150.webp", f"{raiz}_150.png", f"{raiz}_300.avif"):
+        with open(armazenamento.backend.caminho(miniatura), "wb") as arquivo:
+            arquivo.write(b"miniatura")
+
+    assert [liberar(client, relativo).json()["references"] for _ in range(2)] == [2, 1]
+    assert len(arquivos_na_categoria(armazenamento)) == 4
+
+    assert liberar(client, relativo).json() == {"filename": relativo, "category": "book_cover", "references": 0}
+    assert arquivos_na_categoria(armazenamento) == []
+
+
+# Arquivo do layout antigo (direto na categoria, sem contagem): uma única referência
+def test_liberar_arquivo_do_layout_antigo(client, armazenamento):
+    os.makedirs(armazenamento.backend.caminho("book_cover"), exist_ok=True)
+    for nome in ("antiga.png", "antiga_150.webp", "antigas.png"):
+        with open(armazenamento.backend.caminho(f"book_cover/{nome}"), "wb") as arquivo:
+            arquivo.write(b"x")
+
+    assert liberar(client, "antiga.png").json()["references"] == 0
+    assert arquivos_na_categoria(armazenamento) == ["book_cover/antigas.png"]
+
+
+def test_liberar_exige_api_key_e_caminho_valido(client, armazenamento, imagem):
+    relativo = enviar(client, imagem()).json()["filename"]
+
+    assert client.delete(f"/files/book_cover/{relativo}", headers={"X-API-KEY": "errada"}).status_code == 401
+    assert liberar(client, f"00/00/{relativo.rpartition('/')[2]}").status_code == 404
+    assert liberar(client, ".meta/referencias.sqlite3").status_code == 404
+    assert arquivos_na_categoria(armazenamento) == [f"book_cover/{relativo}"]
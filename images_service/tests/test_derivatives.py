@@ -0,0 +1,77 @@
+import os
+
+import pytest
+from PIL import Image
+
+from app.services import derivatives
+from app.services.derivatives import aceita, derivados_prontos, gerar_derivados, variantes
+from app.services.storage_backend import ArmazenamentoLocal
+
+
+@pytest.fixture(autouse=True)
+def configuracao(monkeypatch):
+    # Independente do THUMBNAIL_SIZES/DERIVATIVE_FORMATS do ambiente
+    monkeypatch.setattr(derivatives, "THUMBNAIL_SIZES", [150, 300, 600])
+    monkeypatch.setattr(derivatives, "DERIVATIVE_FORMATS", ["avif", "webp"])
+
+
+@pytest.mark.parametrize("accept, esperado", [
+    ("image/webp", True),
+    ("text/html, IMAGE/WEBP;q=0.8", True),
+    ("image/webp; q=0.001", True),
+    ("image/webp;q=0", False),
+    ("image/webp;q=0.0, image/avif", False),
+    ("image/webp;q=abc", False),
+    ("image/*", False),
+    ("*/*;q=1", False),
+    ("image/avif", False),
+    ("", False),
+    (None, False),
+])
+def test_aceita(accept, esperado):
+    assert aceita(accept, "image/webp") is esperado
+
+
+# Menor tamanho que cobre o pedido; formatos modernos aceitos primeiro, depois o do original e o original
+def test_variantes_em_ordem_de_preferencia():
+    original = "cat/ab/cd/capa.jpg"
+    assert variantes(original, None, "image/avif,image/webp") == [(original, "image/jpeg")]
+    assert variantes(original, 200, "image/avif,image/webp,*/*") == [
+        ("cat/ab/cd/capa_300.avif", "image/avif"),
+        ("cat/ab/cd/capa_300.webp", "image/webp"),
+        ("cat/ab/cd/capa_300.jpg", "image/jpeg"),
+        (original, "image/jpeg"),
+    ]
+    assert variantes(original, 150, "image/webp,image/avif;q=0") == [
+        ("cat/ab/cd/capa_150.webp", "image/webp"),
+        ("cat/ab/cd/capa_150.jpg", "image/jpeg"),
+        (original, "image/jpeg"),
+    ]
+    # Acima do maior tamanho: o maior; sem formatos modernos no Accept, só o formato do original
+    assert variantes("cat/capa.png", 5000, "image/*") == [("cat/capa_600.png", "image/png"), ("cat/capa.png", "image/png")]
+
+
+def test_variantes_sem_tamanhos_configurados(monkeypatch):
+    monkeypatch.setattr(derivatives, "THUMBNAIL_SIZES", [])
+    assert variantes("cat/capa.png", 150, "image/webp") == [("cat/capa.png", "image/png")]
+
+
+@pytest.mark.parametrize("modo, formato, extensao", [("RGB", "JPEG", "jpg"), ("RGBA", "PNG", "png"), ("P", "PNG", "png")])
+def test_gerar_derivados_em_todos_os_tamanhos_e_formatos(tmp_path, modo, formato, extensao):
+    backend = ArmazenamentoLocal(str(tmp_path))
+    chave = f"book_cover/ab/cd/capa.{extensao}"
+    os.makedirs(os.path.dirname(backend.caminho(chave)))
+    Image.new(modo, (800, 400)).save(backend.caminho(chave), format=formato)
+    assert not derivados_prontos(backend, chave)
+
+    gerados = gerar_derivados(backend, chave)
+
+    esperados = {f"book_cover/ab/cd/capa_{tamanho}.{saida}" for tamanho in (150, 300, 600) for saida in ("avif", "webp", extensao)}
+    assert set(gerados) == esperados
+    assert set(backend.listar("book_cover/ab/cd/capa_")) == esperados
+    assert derivados_prontos(backend, chave)
+    for tamanho in (150, 300, 600):
+        for saida, nome_pillow in (("avif", "AVIF"), ("webp", "WEBP"), (extensao, formato)):
+            with Image.open(backend.caminho(f"book_cover/ab/cd/capa_{tamanho}.{saida}")) as derivado:
+                assert (derivado.format, derivado.size) == (nome_pillow, (tamanho, tamanho // 2))
+    assert os.listdir(backend.diretorio_temporario) == []
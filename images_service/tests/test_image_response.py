@@ -0,0 +1,122 @@
+import hashlib
+import os
+from email.utils import formatdate
+
+import pytest
+
+from app.services.image_response import CACHE_IMUTAVEL, CACHE_PROVISORIO
+from app.services.storage_backend import LIMITE_LEITURA_UNICA
+
+
+def publicar(armazenamento, dados: bytes) -> str:
+    """Grava o arquivo no caminho endereçado pelo conteúdo e retorna a URL."""
+    sha256 = hashlib.sha256(dados).hexdigest()
+    relativo = f"{sha256[:2]}/{sha256[2:4]}/{sha256}.png"
+    caminho = armazenamento.backend.caminho(f"book_cover/{relativo}")
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, "wb") as arquivo:
+        arquivo.write(dados)
+    return f"/files/book_cover/{relativo}"
+
+
+# Arquivos pequenos são lidos de uma vez; os grandes são enviados pelo descritor, em blocos
+@pytest.fixture(params=[1000, 3 * LIMITE_LEITURA_UNICA + 7], ids=["pequeno", "grande"])
+def dados(request):
+    return os.urandom(request.param)
+
+
+def test_etag_forte_e_304(client, armazenamento, dados):
+    url = publicar(armazenamento, dados)
+    response = client.get(url)
+    etag = response.headers["etag"]
+
+    assert response.status_code == 200 and response.content == dados
+    assert etag == f'"{hashlib.sha256(dados).hexdigest()}"'
+    assert response.headers["cache-control"] == CACHE_IMUTAVEL
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["accept-ranges"] == "bytes"
+
+    for if_none_match in (etag, f'"outra", W/{etag}', "*"):
+        nao_modificado = client.get(url, headers={"If-None-Match": if_none_match})
+        assert (nao_modificado.status_code, nao_modificado.content) == (304, b"")
+        assert nao_modificado.headers["etag"] == etag
+    assert client.get(url, headers={"If-None-Match": '"outra"'}).status_code == 200
+
+    ultima_modificacao = response.headers["last-modified"]
+    assert client.get(url, headers={"If-Modified-Since": ultima_modificacao}).status_code == 304
+    assert client.get(url, headers={"If-Modified-Since": formatdate(0, usegmt=True)}).status_code == 200
+    assert client.get(url, headers={"If-Modified-Since": "ontem"}).status_code == 200
+    # If-None-Match tem precedência sobre If-Modified-Since
+    assert client.get(url, headers={"If-None-Match": '"outra"', "If-Modified-Since": ultima_modificacao}).status_code == 200
+
+
+def test_intervalos(client, armazenamento, dados):
+    url = publicar(armazenamento, dados)
+    tamanho = len(dados)
+
+    def pedir(intervalo, **headers):
+        return client.get(url, headers={"Range": intervalo, **headers})
+
+    response = pedir("bytes=-100")  # Últimos 100 bytes
+    assert (response.status_code, response.content) == (206, dados[-100:])
+    assert response.headers["content-range"] == f"bytes {tamanho - 100}-{tamanho - 1}/{tamanho}"
+    assert response.headers["content-length"] == "100"
+
+    assert pedir(f"bytes=-{tamanho * 2}").content == dados
+    response = pedir("bytes=100-")  # Até o fim
+    assert (response.status_code, response.content) == (206, dados[100:])
+    assert response.headers["content-range"] == f"bytes 100-{tamanho - 1}/{tamanho}"
+    assert pedir("bytes=10-19").content == dados[10:20]
+    assert pedir(f"bytes=10-{tamanho * 2}").content == dados[10:]
+
+    response = pedir(f"bytes={tamanho}-")
+    assert (response.status_code, response.content) == (416, b"")
+    assert response.headers["content-range"] == f"bytes */{tamanho}"
+
+    # If-Range de outra versão e vários intervalos: o arquivo inteiro, com 200
+    etag = client.head(url).headers["etag"]
+    assert pedir("bytes=0-9", **{"If-Range": etag}).status_code == 206
+    response = pedir("bytes=0-9", **{"If-Range": '"outra"'})
+    assert (response.status_code, response.content) == (200, dados)
+    response = pedir("bytes=0-1,5-6")
+    assert (response.status_code, response.content) == (200, dados)
+    assert "content-range" not in response.headers
+    assert pedir("linhas=0-9").content == dados
+
+
+def test_head(client, armazenamento, dados):
+    url = publicar(armazenamento, dados)
+
+    response = client.head(url)
+    assert (response.status_code, response.content) == (200, b"")
+    assert response.headers["content-length"] == str(len(dados))
+    assert response.headers["etag"] == f'"{hashlib.sha256(dados).hexdigest()}"'
+
+    response = client.head(url, headers={"Range": "bytes=-10"})
+    assert (response.status_code, response.content) == (206, b"")
+    assert response.headers["content-length"] == "10"
+
+
+# Enquanto a miniatura não fica pronta, o original servido no lugar tem cache curto
+def test_cache_provisorio_sem_miniatura(client, armazenamento):
+    url = publicar(armazenamento, b"original")
+
+    response = client.get(f"{url}?size=150", headers={"Accept": "image/webp"})
+    assert (response.status_code, response.content) == (200, b"original")
+    assert response.headers["cache-control"] == CACHE_PROVISORIO
+    assert response.headers["vary"] == "Accept"
+
+    miniatura = armazenamento.backend.caminho(url.removeprefix("/files/").replace(".png", "_150.webp"))
+    with open(miniatura, "wb") as arquivo:
+        arquivo.write(b"miniatura")
+    response = client.get(f"{url}?size=150", headers={"Accept": "image/webp"})
+    assert (response.content, response.headers["content-type"]) == (b"miniatura", "image/webp")
+    assert response.headers["cache-control"] == CACHE_IMUTAVEL
+    assert response.headers["vary"] == "Accept"
+    assert response.headers["etag"] != client.get(url).headers["etag"]
+
+
+def test_imagem_inexistente(client, armazenamento):
+    assert client.get(f"/files/book_cover/{'0' * 64}.png").status_code == 404
+    assert client.get("/files/book_cover/../segredo.png").status_code == 404
+    assert client.get("/files/.meta/referencias.sqlite3").status_code == 404
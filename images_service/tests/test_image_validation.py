@@ -0,0 +1,103 @@
+import os
+import struct
+import zlib
+
+import pytest
+from fastapi import HTTPException
+from PIL import ImageFile
+
+from app.services.image_validation import IMAGE_MAX_PIXELS, inspecionar_imagem, tipo_por_assinatura
+from tests.conftest import API_KEY
+
+
+def png_declarado(largura: int, altura: int) -> bytes:
+    """PNG só com o cabeçalho declarando as dimensões (e um IDAT qualquer, que nunca é decodificado)."""
+    def chunk(tipo: bytes, dados: bytes) -> bytes:
+        return struct.pack(">I", len(dados)) + tipo + dados + struct.pack(">I", zlib.crc32(tipo + dados))
+
+    ihdr = struct.pack(">IIBBBBB", largura, altura, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", zlib.compress(b"\0" * 64)) + chunk(b"IEND", b"")
+
+
+def inspecionar(tmp_path, dados: bytes) -> dict:
+    caminho = tmp_path / "imagem"
+    caminho.write_bytes(dados)
+    return inspecionar_imagem(str(caminho))
+
+
+def enviar(client, dados: bytes, nome: str = "capa.png"):
+    return client.post(
+        "/upload", files={"file": (nome, dados, "image/png")}, headers={"X-API-KEY": API_KEY, "image-category": "book_cover"}
+    )
+
+
+@pytest.fixture
+def sem_decodificar(monkeypatch):
+    # Qualquer decodificação dos pixels falha o teste: só o cabeçalho pode ser lido
+    def load(self):
+        raise AssertionError("pixels decodificados")
+
+    monkeypatch.setattr(ImageFile.ImageFile, "load", load)
+
+
+def test_tipo_por_assinatura(imagem):
+    assert tipo_por_assinatura(imagem("PNG")[:16]) == "image/png"
+    assert tipo_por_assinatura(imagem("JPEG")[:16]) == "image/jpeg"
+    assert tipo_por_assinatura(b"GIF89a") is None
+    assert tipo_por_assinatura(b"") is None
+
+
+def test_dimensoes_e_tipo_reportados(client, armazenamento, imagem, sem_decodificar):
+    response = enviar(client, imagem("PNG", 40, 30))
+    assert response.status_code == 200
+    assert {chave: response.json()[chave] for chave in ("content_type", "width", "height")} == {
+        "content_type": "image/png", "width": 40, "height": 30,
+    }
+
+    # O tipo vem do conteúdo: um JPEG enviado como .png é gravado como .jpg
+    response = enviar(client, imagem("JPEG", 64, 48))
+    assert response.status_code == 200
+    assert (response.json()["content_type"], response.json()["width"], response.json()["height"]) == ("image/jpeg", 64, 48)
+    assert response.json()["filename"].endswith(".jpg")
+
+
+# Um arquivo renomeado é recusado pelos primeiros bytes, antes de ser gravado
+def test_arquivo_renomeado(client, armazenamento, tmp_path):
+    response = enviar(client, b"%PDF-1.7 nao e imagem" * 10)
+    assert (response.status_code, response.json()["detail"]) == (400, "Conteúdo não corresponde a um tipo permitido")
+    assert list(armazenamento.backend.listar("book_cover/")) == []
+
+    with pytest.raises(HTTPException) as erro:
+        inspecionar(tmp_path, b"GIF89a" + b"\0" * 32)
+    assert (erro.value.status_code, erro.value.detail) == (400, "Conteúdo não é uma imagem PNG ou JPEG")
+
+
+@pytest.mark.parametrize("dados", [
+    b"\x89PNG\r\n\x1a\n" + b"lixo" * 16,
+    b"\xff\xd8\xff" + b"lixo" * 16,
+    png_declarado(0, 10),
+], ids=["png", "jpeg", "png-sem-largura"])
+def test_imagem_que_nao_decodifica(client, armazenamento, tmp_path, dados):
+    with pytest.raises(HTTPException) as erro:
+        inspecionar(tmp_path, dados)
+    assert (erro.value.status_code, erro.value.detail) == (400, "Imagem corrompida")
+
+    response = enviar(client, dados)
+    assert (response.status_code, response.json()["detail"]) == (400, "Imagem corrompida")
+    assert list(armazenamento.backend.listar("book_cover/")) == []
+    assert os.listdir(armazenamento.backend.diretorio_temporario) == []
+
+
+# Bomba de descompressão: recusada pelo cabeçalho, sem decodificar nenhum pixel
+@pytest.mark.parametrize("largura, altura", [(50000, 50000), (7000, 7000)])
+def test_dimensoes_acima_do_limite(client, armazenamento, tmp_path, sem_decodificar, largura, altura):
+    assert largura * altura > IMAGE_MAX_PIXELS
+    with pytest.raises(HTTPException) as erro:
+        inspecionar(tmp_path, png_declarado(largura, altura))
+    assert erro.value.status_code == 400
+    assert f"excede o limite de {IMAGE_MAX_PIXELS} pixels" in erro.value.detail
+
+    response = enviar(client, png_declarado(largura, altura))
+    assert response.status_code == 400
+    assert list(armazenamento.backend.listar("book_cover/")) == []
+    assert os.listdir(armazenamento.backend.diretorio_temporario) == []
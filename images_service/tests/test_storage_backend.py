@@ -0,0 +1,163 @@
+import os
+import time
+
+import pytest
+
+from app.services import storage_backend
+from app.services.storage_backend import LIMITE_LEITURA_UNICA, ArmazenamentoS3, CorpoS3
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def s3(tmp_path, monkeypatch):
+    moto = pytest.importorskip("moto")
+    import boto3
+
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "teste")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "teste")
+    monkeypatch.setattr(storage_backend, "_clientes", {})  # O cliente do mock não pode ser reaproveitado
+    with moto.mock_aws():
+        cliente = boto3.client("s3", region_name="us-east-1")
+        cliente.create_bucket(Bucket="imagens")
+        yield cliente, ArmazenamentoS3("imagens", "uploads/", str(tmp_path / "tmp"), regiao="us-east-1")
+
+
+def temporario(arquivos, dados: bytes) -> str:
+    caminho = storage_backend.novo_temporario(arquivos.diretorio_temporario)
+    with open(caminho, "wb") as arquivo:
+        arquivo.write(dados)
+    return caminho
+
+
+def conteudo(cliente, chave: str) -> bytes:
+    return cliente.get_object(Bucket="imagens", Key=f"uploads/{chave}")["Body"].read()
+
+
+def test_publicar_em_uma_requisicao(s3):
+    cliente, arquivos = s3
+    caminho = temporario(arquivos, b"imagem")
+
+    arquivos.publicar("cat/ab/cd/x.png", caminho, "image/png")
+    assert conteudo(cliente, "cat/ab/cd/x.png") == b"imagem"
+    assert cliente.head_object(Bucket="imagens", Key="uploads/cat/ab/cd/x.png")["ContentType"] == "image/png"
+    assert not os.path.exists(caminho)
+    assert arquivos.existe("cat/ab/cd/x.png") and arquivos.metadados("cat/ab/cd/x.png").tamanho == 6
+
+
+# Com MAX_FILE_SIZE de 5 MB, os uploads nunca passam do limite padrão de 8 MB (e as partes têm no mínimo
+# 5 MB): o envio em partes só é usado com um S3_MULTIPART_THRESHOLD menor, então o teste baixa o limite
+def test_publicar_em_partes(s3, monkeypatch):
+    cliente, arquivos = s3
+    monkeypatch.setattr(storage_backend, "S3_MULTIPART_THRESHOLD", 1 * MB)
+    monkeypatch.setattr(storage_backend, "S3_PART_SIZE", 5 * MB)
+    dados = os.urandom(11 * MB)
+
+    arquivos.publicar("cat/grande.png", temporario(arquivos, dados), "image/png")
+    cabecalho = cliente.head_object(Bucket="imagens", Key="uploads/cat/grande.png")
+    assert cabecalho["ETag"].endswith('-3"')  # Três partes: 5 + 5 + 1 MB
+    assert cabecalho["ContentType"] == "image/png"
+    assert conteudo(cliente, "cat/grande.png") == dados
+    assert cliente.list_multipart_uploads(Bucket="imagens").get("Uploads", []) == []
+
+
+# Uma parte falhando aborta o upload: nenhuma parte fica cobrada no bucket e o objeto não aparece
+def test_falha_no_envio_em_partes_aborta_o_upload(s3, monkeypatch):
+    cliente, arquivos = s3
+    monkeypatch.setattr(storage_backend, "S3_MULTIPART_THRESHOLD", 1 * MB)
+    monkeypatch.setattr(storage_backend, "S3_PART_SIZE", 5 * MB)
+    enviar_parte = arquivos.cliente().upload_part
+    enviadas = []
+
+    def falhar_na_segunda(**parametros):
+        enviadas.append(parametros["PartNumber"])
+        if parametros["PartNumber"] == 2:
+            raise ConnectionError("conexão perdida")
+        return enviar_parte(**parametros)
+
+    monkeypatch.setattr(arquivos.cliente(), "upload_part", falhar_na_segunda)
+    caminho = temporario(arquivos, os.urandom(11 * MB))
+
+    with pytest.raises(ConnectionError):
+        arquivos.publicar("cat/grande.png", caminho, "image/png")
+    assert enviadas == [1, 2]
+    assert cliente.list_multipart_uploads(Bucket="imagens").get("Uploads", []) == []
+    assert not arquivos.existe("cat/grande.png")
+    assert os.path.exists(caminho)  # Quem chamou decide: o upload descarta o temporário
+
+
+def test_abrir_objeto_pequeno_e_grande(s3):
+    cliente, arquivos = s3
+    pequeno, grande = b"p" * LIMITE_LEITURA_UNICA, os.urandom(LIMITE_LEITURA_UNICA + 1000)
+    cliente.put_object(Bucket="imagens", Key="uploads/cat/p.png", Body=pequeno)
+    cliente.put_object(Bucket="imagens", Key="uploads/cat/g.png", Body=grande)
+
+    objeto, dados = arquivos.abrir("cat/p.png")
+    assert (objeto.chave, objeto.tamanho, dados) == ("cat/p.png", len(pequeno), pequeno)
+
+    objeto, corpo = arquivos.abrir("cat/g.png")
+    assert isinstance(corpo, CorpoS3) and objeto.tamanho == len(grande)
+    assert b"".join(corpo.blocos(0, len(grande))) == grande
+    corpo.fechar()
+
+    with pytest.raises(FileNotFoundError):
+        arquivos.abrir("cat/nada.png")
+
+
+# Range: o corpo já aberto é trocado por um GET só do intervalo
+def test_corpo_s3_pede_so_o_intervalo(s3, monkeypatch):
+    cliente, arquivos = s3
+    dados = os.urandom(LIMITE_LEITURA_UNICA * 2)
+    cliente.put_object(Bucket="imagens", Key="uploads/cat/g.png", Body=dados)
+    pedidos = []
+    obter = arquivos.obter
+
+    def registrar(chave, **parametros):
+        pedidos.append(parametros)
+        return obter(chave, **parametros)
+
+    monkeypatch.setattr(arquivos, "obter", registrar)
+    _, corpo = arquivos.abrir("cat/g.png")
+
+    assert b"".join(corpo.blocos(1000, len(dados))) == dados[1000:]
+    assert b"".join(corpo.blocos(len(dados) - 10, len(dados))) == dados[-10:]
+    corpo.fechar()
+    assert pedidos == [{}, {"Range": f"bytes=1000-{len(dados) - 1}"}, {"Range": f"bytes={len(dados) - 10}-{len(dados) - 1}"}]
+
+
+# Reenviado: o LastModified é renovado, sem perder o ContentType nem os metadados
+def test_tocar(s3):
+    cliente, arquivos = s3
+    cliente.put_object(Bucket="imagens", Key="uploads/cat/x.png", Body=b"x", ContentType="image/png", Metadata={"origem": "teste"})
+    antes = arquivos.metadados("cat/x.png").mtime
+    time.sleep(1.1)  # O LastModified do S3 tem resolução de segundos
+
+    arquivos.tocar("cat/x.png")
+    cabecalho = cliente.head_object(Bucket="imagens", Key="uploads/cat/x.png")
+    assert arquivos.metadados("cat/x.png").mtime > antes
+    assert (cabecalho["ContentType"], cabecalho["Metadata"]) == ("image/png", {"origem": "teste"})
+    assert conteudo(cliente, "cat/x.png") == b"x"
+    with pytest.raises(FileNotFoundError):
+        arquivos.tocar("cat/nada.png")
+
+
+def test_arquivo_local(s3):
+    cliente, arquivos = s3
+    dados = os.urandom(storage_backend.TAMANHO_BLOCO * 2 + 10)
+    cliente.put_object(Bucket="imagens", Key="uploads/cat/x.png", Body=dados)
+
+    with arquivos.arquivo_local("cat/x.png") as caminho:
+        assert caminho.endswith(".png") and os.path.dirname(caminho) == arquivos.diretorio_temporario
+        with open(caminho, "rb") as arquivo:
+            assert arquivo.read() == dados
+    assert not os.path.exists(caminho)
+
+    # Apagado também quando o bloco falha ou o objeto não existe
+    with pytest.raises(RuntimeError):
+        with arquivos.arquivo_local("cat/x.png") as caminho:
+            raise RuntimeError
+    assert not os.path.exists(caminho)
+    with pytest.raises(FileNotFoundError):
+        with arquivos.arquivo_local("cat/nada.png"):
+            pass
+    assert os.listdir(arquivos.diretorio_temporario) == []
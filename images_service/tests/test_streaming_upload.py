@@ -0,0 +1,166 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import ClientDisconnect, Request
+
+from app.routers import uploads
+from app.services import streaming_upload
+from app.services.image_validation import tipo_por_assinatura
+from app.services.streaming_upload import MARGEM_MULTIPART, receber_upload
+from tests.conftest import API_KEY
+
+LIMITE = "limite-de-teste"
+EXTENSOES = {".png", ".jpg", ".jpeg"}
+
+
+def corpo_multipart(conteudo: bytes, nome_arquivo: str = "capa.png", campo: str = "file") -> bytes:
+    cabecalho = (
+        f"--{LIMITE}\r\n"
+        f'Content-Disposition: form-data; name="{campo}"; filename="{nome_arquivo}"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n"
+    )
+    return cabecalho.encode() + conteudo + f"\r\n--{LIMITE}--\r\n".encode()
+
+
+def requisicao(blocos: list, content_length: int = None, desconectar: bool = False) -> tuple:
+    """Request com o corpo entregue em `blocos` (sem Content-Length: como um corpo chunked) e as mensagens não lidas."""
+    mensagens = [{"type": "http.request", "body": bloco, "more_body": True} for bloco in blocos]
+    mensagens.append({"type": "http.disconnect"} if desconectar else {"type": "http.request", "body": b"", "more_body": False})
+
+    async def receive():
+        return mensagens.pop(0)
+
+    headers = [(b"content-type", f"multipart/form-data; boundary={LIMITE}".encode())]
+    if content_length is not None:
+        headers.append((b"content-length", str(content_length).encode()))
+    return Request({"type": "http", "method": "POST", "path": "/upload", "headers": headers}, receive), mensagens
+
+
+def receber(request, diretorio, tamanho_maximo: int = 1024):
+    return asyncio.run(receber_upload(request, str(diretorio), tamanho_maximo, EXTENSOES, identificar=tipo_por_assinatura))
+
+
+def em_blocos(dados: bytes, tamanho: int) -> list:
+    return [dados[i:i + tamanho] for i in range(0, len(dados), tamanho)]
+
+
+def test_recebe_em_blocos_e_calcula_o_hash(tmp_path, imagem):
+    png = imagem()
+    request, _ = requisicao(em_blocos(corpo_multipart(png), 7))
+
+    recebido = receber(request, tmp_path)
+    assert (recebido.extensao, recebido.media_type, recebido.tamanho) == (".png", "image/png", len(png))
+    assert recebido.sha256 == hashlib.sha256(png).hexdigest()
+    with open(recebido.caminho_temporario, "rb") as arquivo:
+        assert arquivo.read() == png
+
+
+# O Content-Length declarado acima do limite recusa o upload antes de ler o corpo
+def test_recusa_pelo_content_length(tmp_path):
+    request, mensagens = requisicao([corpo_multipart(b"\x89PNG\r\n\x1a\n")], content_length=1024 + MARGEM_MULTIPART + 1)
+
+    with pytest.raises(HTTPException) as erro:
+        receber(request, tmp_path)
+    assert erro.value.status_code == 400 and erro.value.detail.endswith("excedido")
+    assert len(mensagens) == 2  # Nenhum bloco lido
+
+
+# Sem Content-Length (chunked), o corpo é contado enquanto chega: partes extras também contam
+def test_recusa_corpo_chunked_acima_do_limite(tmp_path, imagem):
+    extra = f"--{LIMITE}\r\nContent-Disposition: form-data; name=\"extra\"\r\n\r\n".encode() + b"x" * 64 * 1024
+    corpo = corpo_multipart(imagem()).removesuffix(f"--{LIMITE}--\r\n".encode()) + extra
+    request, mensagens = requisicao(em_blocos(corpo, 4096))
+
+    with pytest.raises(HTTPException) as erro:
+        receber(request, tmp_path)
+    assert erro.value.status_code == 400
+    assert mensagens  # Abortado antes do fim do corpo
+    assert os.listdir(tmp_path) == []
+
+
+# Passou de 5 MB: aborta no bloco que passou do limite e não deixa o temporário para trás
+def test_aborta_acima_de_5_mb_sem_temporario(tmp_path):
+    corpo = corpo_multipart(b"\x89PNG\r\n\x1a\n" + b"\0" * (8 * 1024 * 1024))
+    request, mensagens = requisicao(em_blocos(corpo, 256 * 1024))
+
+    with pytest.raises(HTTPException) as erro:
+        receber(request, tmp_path, uploads.MAX_FILE_SIZE)
+    assert (erro.value.status_code, erro.value.detail) == (400, "Tamanho máximo de 5 MB excedido")
+    assert len(mensagens) > 8  # Uns 3 MB nem chegaram a ser lidos
+    assert os.listdir(tmp_path) == []
+
+
+def test_campo_file_ausente(tmp_path):
+    corpo = f'--{LIMITE}\r\nContent-Disposition: form-data; name="titulo"\r\n\r\ncapa\r\n--{LIMITE}--\r\n'.encode()
+    request, _ = requisicao([corpo])
+
+    with pytest.raises(HTTPException) as erro:
+        receber(request, tmp_path)
+    assert (erro.value.status_code, erro.value.detail) == (400, "Campo 'file' ausente ou incompleto")
+
+
+def test_extensao_nao_permitida(tmp_path, imagem):
+    request, _ = requisicao([corpo_multipart(imagem(), "capa.gif")])
+
+    with pytest.raises(HTTPException) as erro:
+        receber(request, tmp_path)
+    assert (erro.value.status_code, erro.value.detail) == (400, "Tipo de arquivo não permitido")
+    assert os.listdir(tmp_path) == []
+
+
+# O cliente desconectando no meio do envio descarta o temporário já criado
+def test_cliente_desconectado_descarta_o_temporario(tmp_path, monkeypatch):
+    criados = []
+    abrir = streaming_upload._abrir_temporario
+
+    def abrir_e_registrar(diretorio):
+        arquivo, caminho = abrir(diretorio)
+        criados.append(caminho)
+        return arquivo, caminho
+
+    monkeypatch.setattr(streaming_upload, "_abrir_temporario", abrir_e_registrar)
+    corpo = corpo_multipart(b"\x89PNG\r\n\x1a\n" + b"\0" * 512)
+    request, _ = requisicao([corpo[:300]], desconectar=True)
+
+    with pytest.raises(ClientDisconnect):
+        receber(request, tmp_path)
+    assert len(criados) == 1 and not os.path.exists(criados[0])
+    assert os.listdir(tmp_path) == []
+
+
+def test_upload_publicado(client, armazenamento, derivados_agendados, imagem):
+    png = imagem(largura=40, altura=30)
+    sha256 = hashlib.sha256(png).hexdigest()
+
+    response = client.post(
+        "/upload", files={"file": ("foto.png", png, "image/png")},
+        headers={"X-API-KEY": API_KEY, "image-category": "profile"},
+    )
+    assert response.status_code == 200
+    relativo = f"{sha256[:2]}/{sha256[2:4]}/{sha256}.png"
+    assert response.json() == {
+        "filename": relativo,
+        "file_url": f"http://images_service:8000/files/profile/{relativo}",
+        "category": "profile",
+        "content_type": "image/png",
+        "width": 40,
+        "height": 30,
+    }
+    with open(armazenamento.backend.caminho(f"profile/{relativo}"), "rb") as arquivo:
+        assert arquivo.read() == png
+    assert os.listdir(uploads.TMP_DIR) == []
+    assert derivados_agendados == [f"profile/{relativo}"]
+
+
+# Pela rota: o Content-Length acima de 5 MB é recusado com a mensagem do limite
+def test_upload_acima_de_5_mb(client):
+    response = client.post(
+        "/upload", files={"file": ("foto.png", b"\x89PNG\r\n\x1a\n" + b"\0" * uploads.MAX_FILE_SIZE, "image/png")},
+        headers={"X-API-KEY": API_KEY, "image-category": "profile"},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Tamanho máximo de 5 MB excedido"
+    assert os.listdir(uploads.TMP_DIR) == []
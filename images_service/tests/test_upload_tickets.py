@@ -0,0 +1,100 @@
+import base64
+import importlib
+import json
+import time
+
+import dotenv
+import httpx
+import pytest
+
+from app.routers import uploads
+from app.services import upload_tickets
+
+
+def emitir(**payload) -> str:
+    """Ticket assinado como a api_biblioteca assina."""
+    payload = {"sub": 1, "cat": "profile", "tipo": "usuario", "id": 1, "exp": int(time.time()) + 300, "jti": "abc", **payload}
+    corpo = base64.urlsafe_b64encode(json.dumps(payload).encode()).rstrip(b"=").decode()
+    return f"{corpo}.{upload_tickets._assinatura(corpo)}"
+
+
+def enviar(client, ticket, dados: bytes):
+    return client.post("/upload/direct", files={"file": ("foto.png", dados, "image/png")}, headers={"X-Upload-Ticket": ticket})
+
+
+def test_verificar_ticket():
+    ticket = emitir(id=7)
+    assert upload_tickets.verificar_ticket(ticket)["id"] == 7
+
+    corpo, _, assinatura = ticket.partition(".")
+    for invalido in (corpo, f"{corpo}.", f"{corpo}x.{assinatura}", "abc.déf", emitir(exp=int(time.time()) - 1)):
+        try:
+            upload_tickets.verificar_ticket(invalido)
+        except ValueError:
+            continue
+        raise AssertionError(f"ticket aceito: {invalido}")
+
+
+# Recusado antes de ler o corpo; um cabeçalho não ASCII é um ticket inválido, não um erro 500
+def test_upload_direto_com_ticket_invalido(client, armazenamento, imagem):
+    for ticket in ("abc.def", "abc.déf".encode("latin-1"), emitir(exp=int(time.time()) - 1)):
+        response = enviar(client, ticket, imagem())
+        assert (response.status_code, response.json()["detail"]) == (403, "Ticket de upload inválido ou expirado")
+    assert list(armazenamento.backend.listar("profile/")) == []
+
+
+def test_upload_direto_chama_o_callback(client, armazenamento, imagem, monkeypatch):
+    chamadas = []
+
+    async def notificar_api(ticket, file_url):
+        chamadas.append((ticket, file_url))
+        return httpx.Response(200, json={})
+
+    monkeypatch.setattr(uploads, "notificar_api", notificar_api)
+    ticket = emitir(cat="book_cover", tipo="livro")
+
+    response = enviar(client, ticket, imagem())
+    assert response.status_code == 200
+    assert response.json()["category"] == "book_cover"
+    assert chamadas == [(ticket, response.json()["file_url"])]
+
+
+# Recusado pela API (ticket já usado, sem permissão...): a referência à imagem é liberada
+def test_upload_direto_recusado_pela_api(client, armazenamento, imagem, monkeypatch):
+    async def notificar_api(ticket, file_url):
+        return httpx.Response(409, json={"detail": "Ticket de upload já utilizado"})
+
+    monkeypatch.setattr(uploads, "notificar_api", notificar_api)
+
+    response = enviar(client, emitir(), imagem())
+    assert (response.status_code, response.json()["detail"]) == (409, "Ticket de upload já utilizado")
+    assert list(armazenamento.backend.listar("profile/")) == []
+
+
+# Timeout ou 5xx: a API pode já ter gravado a URL, então a imagem não é apagada
+def test_upload_direto_sem_resposta_da_api_mantem_a_imagem(client, armazenamento, imagem, monkeypatch):
+    respostas = [httpx.ReadTimeout("sem resposta"), httpx.Response(504, text="gateway timeout")]
+
+    async def notificar_api(ticket, file_url):
+        resposta = respostas.pop(0)
+        if isinstance(resposta, Exception):
+            raise resposta
+        return resposta
+
+    monkeypatch.setattr(uploads, "notificar_api", notificar_api)
+    for _ in range(2):
+        response = enviar(client, emitir(), imagem())
+        assert (response.status_code, response.json()["detail"]) == (502, "API indisponível para registrar a imagem")
+    assert len(list(armazenamento.backend.listar("profile/"))) == 1
+
+
+# Sem UPLOAD_TICKET_SECRET (nem no .env) o módulo não carrega, em vez de assinar com uma chave padrão
+def test_sem_chave_de_tickets_nao_inicia(monkeypatch):
+    monkeypatch.delenv("UPLOAD_TICKET_SECRET")
+    monkeypatch.setattr(dotenv, "load_dotenv", lambda *args, **kwargs: False)
+    try:
+        with pytest.raises(ValueError, match="UPLOAD_TICKET_SECRET"):
+            importlib.reload(upload_tickets)
+    finally:
+        monkeypatch.undo()
+        importlib.reload(upload_tickets)